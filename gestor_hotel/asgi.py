@@ -3,6 +3,10 @@ ASGI config for gestor_hotel project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Servir con uvicorn (ver README):
+    uvicorn gestor_hotel.asgi:application --workers 4
+Los pedidos ASGI usan las vistas async de HOTEL_URLCONF_ASGI (gestor_hotel/urls_asgi.py).
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
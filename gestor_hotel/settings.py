@@ -42,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'hotel.middleware.RutasAsgi',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -78,6 +79,34 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Las transacciones toman el bloqueo de escritura al empezar: la validación de
+            # solapamiento y el INSERT de una reserva no se intercalan con otra escritura.
+            'transaction_mode': 'IMMEDIATE',
+            # Segundos que una escritura espera el bloqueo antes de fallar con "database is locked"
+            'timeout': 20,
+            # Diarios de savepoints (Reserva.save() dentro de otra transacción) y tablas
+            # temporales en memoria, no en archivos temporales: cada reserva guardada escribe uno
+            'init_command': 'PRAGMA temp_store = MEMORY;',
+        },
+        # Base de pruebas en archivo: en memoria SQLite usa caché compartida, donde los
+        # bloqueos fallan al instante en vez de esperar `timeout`, y las pruebas de
+        # reservas concurrentes necesitan el comportamiento real.
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+    }
+}
+
+# Caché (en memoria por proceso; en producción conviene un backend compartido
+# como Redis o Memcached para que la caché de disponibilidad y sus contadores
+# sean comunes a todos los workers)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        # El default (300 entradas) no alcanza para las tarjetas de un listado de
+        # mil habitaciones más sus versiones: se desalojarían en cada pedido
+        'OPTIONS': {'MAX_ENTRIES': 50000},
     }
 }
 
@@ -90,6 +119,70 @@ EMAIL_HOST_USER = "rexmaxplay1@gmail.com"
 EMAIL_HOST_PASSWORD = "xnla mjkx ueck pibw"
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
+# Índice en memoria de reservas activas (hotel/indice_reservas.py).
+# Es local a cada proceso: los cambios hechos por otros procesos se ven
+# recién cuando vence el TTL (segundos) y el índice se recarga.
+HOTEL_INDICE_RESERVAS = False
+HOTEL_INDICE_RESERVAS_TTL = 300
+
+# Calendario de ocupación en bits (hotel/ocupacion.py), con el mismo esquema:
+# local a cada proceso, horizonte móvil desde hoy y recarga al vencer el TTL.
+HOTEL_CALENDARIO_OCUPACION = False
+HOTEL_CALENDARIO_OCUPACION_DIAS = 730
+HOTEL_CALENDARIO_OCUPACION_TTL = 300
+
+# Caché de resultados de búsqueda (hotel/cache_disponibilidad.py), invalidada
+# por versiones de (tipo, mes) en cada escritura de Reserva/Habitacion. Las versiones
+# viven en CACHES: con LocMem (una por proceso) sólo las sube el worker que escribe y
+# los demás siguen sirviendo el resultado viejo hasta que vence, así que el TTL queda
+# corto (segundos). Con un backend compartido (Redis, Memcached) puede subir a minutos.
+HOTEL_CACHE_DISPONIBILIDAD = True
+HOTEL_CACHE_DISPONIBILIDAD_TTL = 30
+
+# Portada precalculada (hotel/portada.py): habitaciones destacadas y tipos, y los
+# fragmentos HTML del template, invalidados por versión en escrituras relevantes.
+HOTEL_CACHE_PORTADA = True
+HOTEL_CACHE_PORTADA_TTL = 60
+
+# HTML de cada tarjeta de habitación en los listados (hotel/tarjetas.py), con la
+# versión de la habitación, de su tipo y una general en la clave del fragmento. Como en
+# la caché de disponibilidad, con LocMem las versiones son de cada worker: los demás
+# siguen mostrando la tarjeta vieja ("Sin reservas", "Reservar") hasta que vence, así
+# que el TTL es de segundos. Con un backend compartido puede ser de una hora.
+HOTEL_CACHE_TARJETAS = True
+HOTEL_CACHE_TARJETAS_TTL = 30
+
+# Motor de tarifas (hotel/tarifas.py): días del vector de precios por noche que se arma
+# desde hoy para cada tipo. Se cachea por proceso y cada uso compara la marca general de
+# MarcaCambio en la base, así un cambio de tarifas llega a todos los workers aunque la
+# caché sea LocMem. También es el horizonte de la API JSON: no cotiza entradas más allá.
+HOTEL_CACHE_TARIFAS = True
+HOTEL_TARIFAS_DIAS = 730
+
+# Cache-Control max-age (segundos) de las respuestas de la API JSON (hotel/api.py).
+HOTEL_API_MAX_AGE = 30
+
+# Despliegue ASGI (uvicorn, ver README): los pedidos ASGI usan este URLconf, con las
+# vistas async de búsqueda, disponibilidad y reserva (None: las mismas vistas síncronas).
+HOTEL_URLCONF_ASGI = 'gestor_hotel.urls_asgi'
+
+# Hilos del pool para trabajo bloqueante (hotel/segundo_plano.py): recálculos pesados
+# de las vistas async. Es por proceso; con 0 todo corre en el hilo del pedido.
+HOTEL_HILOS_BLOQUEANTES = 4
+
+# Bandeja de salida de correos (hotel/correos.py), que vacía `manage.py enviar_correos`:
+# correos por lote (una conexión SMTP), intentos antes de darlo por fallido y espera
+# base en segundos entre intentos (se duplica en cada fallo).
+HOTEL_CORREOS_LOTE = 50
+HOTEL_CORREOS_INTENTOS = 5
+HOTEL_CORREOS_ESPERA = 60
+
+# Resúmenes diarios de los reportes de ocupación (hotel/reportes.py), que recalcula
+# `manage.py actualizar_resumenes` cada noche: días hacia atrás desde la última corrida
+# (reservas tardías, cancelaciones) y días hacia adelante (lo ya reservado).
+HOTEL_RESUMENES_DIAS_RECIENTES = 30
+HOTEL_RESUMENES_DIAS_FUTUROS = 365
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -18,7 +18,7 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from django.contrib.auth import views as auth_views
-from hotel import views
+from hotel import api, views
 from django.contrib.auth.views import LogoutView
 
 urlpatterns = [
@@ -30,6 +30,7 @@ urlpatterns = [
     path('disponibles/<str:fecha_entrada>/<str:fecha_salida>/',
         views.habitaciones_disponibles,
         name='habitaciones_disponibles'),
+    path('calendario/<int:anio>/<int:mes>/', views.calendario_ocupacion, name='calendario_ocupacion'),
 
     # Rutas de habitaciones
     path('habitaciones/', views.lista_habitaciones, name='lista_habitaciones'),
@@ -40,12 +41,23 @@ urlpatterns = [
         views.hacer_reserva,
         name='hacer_reserva_con_fechas'),
     path('mis-reservas/', views.mis_reservas, name='mis_reservas'),
+    path('mis-reservas/pagina/', views.mis_reservas_pagina, name='mis_reservas_pagina'),
 
     # Gestión (admin)
     path('reservas/', views.gestionar_reservas, name='gestionar_reservas'),
     path('reserva/<int:reserva_id>/cambiar-estado/', views.cambiar_estado_reserva, name='cambiar_estado_reserva'),
     path('habitacion/<int:habitacion_id>/cambiar-estado/', views.cambiar_estado_habitacion, name='cambiar_estado_habitacion'),
     path('agregar-habitacion/', views.agregar_habitacion, name='agregar_habitacion'),
+    path('estadisticas/cache-disponibilidad/', views.estadisticas_cache_disponibilidad,
+        name='estadisticas_cache_disponibilidad'),
+    path('reportes/ocupacion/', views.reporte_ocupacion, name='reporte_ocupacion'),
+    path('reportes/ocupacion/datos/', views.reporte_ocupacion_datos, name='reporte_ocupacion_datos'),
+
+    # API JSON de sólo lectura (hotel/api.py)
+    path('api/v1/tipos/', api.tipos, name='api_tipos'),
+    path('api/v1/disponibilidad/', api.disponibilidad_rango, name='api_disponibilidad'),
+    path('api/v1/cotizacion/', api.cotizacion, name='api_cotizacion'),
+    path('api/v1/cotizaciones/', api.cotizaciones, name='api_cotizaciones'),
 
     # Autenticación
     path('registrarse/', views.registrarse, name='registrarse'),
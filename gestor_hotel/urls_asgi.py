@@ -0,0 +1,26 @@
+"""
+Rutas del despliegue ASGI: las mismas de urls.py (mismos caminos y nombres), pero la
+búsqueda, la disponibilidad y la reserva van a sus vistas async. Las activa
+hotel.middleware.RutasAsgi sólo para los pedidos ASGI (HOTEL_URLCONF_ASGI).
+"""
+from django.urls import URLPattern
+
+from hotel import api, views
+
+from . import urls
+
+VISTAS_ASYNC = {
+    'habitaciones_disponibles': views.ahabitaciones_disponibles,
+    'hacer_reserva': views.ahacer_reserva,
+    'hacer_reserva_con_fechas': views.ahacer_reserva,
+    'api_tipos': api.atipos,
+    'api_disponibilidad': api.adisponibilidad_rango,
+    'api_cotizacion': api.acotizacion,
+    'api_cotizaciones': api.acotizaciones,
+}
+
+urlpatterns = [
+    URLPattern(patron.pattern, VISTAS_ASYNC[patron.name], patron.default_args, patron.name)
+    if getattr(patron, 'name', None) in VISTAS_ASYNC else patron
+    for patron in urls.urlpatterns
+]
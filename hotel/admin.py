@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import TipoHabitacion, Habitacion, Reserva, PerfilUsuario
+from .models import TipoHabitacion, Habitacion, Reserva, PerfilUsuario, MarcaTarea, MarcaCambio, CorreoPendiente, Tarifa, DescuentoEstadia, ResumenDiario
+from . import correos
 
 @admin.register(TipoHabitacion)
 class TipoHabitacionAdmin(admin.ModelAdmin):
@@ -7,6 +8,19 @@ class TipoHabitacionAdmin(admin.ModelAdmin):
     list_filter = ['nombre']
     search_fields = ['nombre', 'descripcion']
 
+@admin.register(Tarifa)
+class TarifaAdmin(admin.ModelAdmin):
+    list_display = ['nombre', 'tipo', 'desde', 'hasta', 'dias_semana', 'precio_por_noche', 'porcentaje', 'prioridad', 'activa']
+    list_filter = ['activa', 'tipo']
+    search_fields = ['nombre']
+    ordering = ['prioridad', 'desde']
+
+@admin.register(DescuentoEstadia)
+class DescuentoEstadiaAdmin(admin.ModelAdmin):
+    list_display = ['nombre', 'tipo', 'noches_minimas', 'porcentaje', 'activo']
+    list_filter = ['activo', 'tipo']
+    ordering = ['noches_minimas']
+
 @admin.register(Habitacion)
 class HabitacionAdmin(admin.ModelAdmin):
     list_display = ['numero', 'tipo', 'piso', 'estado', 'fecha_creacion']
@@ -25,4 +39,33 @@ class ReservaAdmin(admin.ModelAdmin):
 @admin.register(PerfilUsuario)
 class PerfilUsuarioAdmin(admin.ModelAdmin):
     list_display = ['usuario', 'telefono', 'cedula']
-    search_fields = ['usuario__username', 'cedula', 'telefono']
\ No newline at end of file
+    search_fields = ['usuario__username', 'cedula', 'telefono']
+
+@admin.register(ResumenDiario)
+class ResumenDiarioAdmin(admin.ModelAdmin):
+    list_display = ['fecha', 'tipo', 'habitaciones', 'vendidas', 'ingresos', 'llegadas']
+    list_filter = ['tipo']
+    date_hierarchy = 'fecha'
+    ordering = ['fecha', 'tipo']
+
+@admin.register(MarcaTarea)
+class MarcaTareaAdmin(admin.ModelAdmin):
+    list_display = ['nombre', 'fecha', 'actualizada']
+
+@admin.register(MarcaCambio)
+class MarcaCambioAdmin(admin.ModelAdmin):
+    list_display = ['nombre', 'actualizada']
+    ordering = ['nombre']
+
+@admin.register(CorreoPendiente)
+class CorreoPendienteAdmin(admin.ModelAdmin):
+    list_display = ['id', 'destinatario', 'asunto', 'estado', 'intentos', 'proximo_intento', 'creado', 'enviado']
+    list_filter = ['estado']
+    search_fields = ['destinatario', 'asunto']
+    ordering = ['-creado']
+    actions = ['reintentar']
+
+    @admin.action(description='Reintentar los correos fallidos seleccionados')
+    def reintentar(self, request, queryset):
+        cantidad = correos.reintentar(queryset)
+        self.message_user(request, f'{cantidad} correos vuelven a la cola.')
@@ -0,0 +1,72 @@
+"""
+Trabajo que las señales dejan para cuando confirme la transacción, agrupado.
+
+Una transacción que guarda muchas reservas (una importación, un lote de escrituras)
+toca una y otra vez las mismas claves de versión, los mismos meses de MarcaCambio y las
+mismas habitaciones. `Pendientes` junta lo anotado por cada hilo y lo aplica una sola
+vez al confirmar: una escritura por clave y por transacción, no una por reserva.
+
+Cada anotación registra un callback on_commit (es barato); el primero en correr se lleva
+todo lo anotado y los demás lo encuentran vacío. Si la transacción se revierte, lo
+anotado se aplica con la próxima que confirme: aplicar de más sólo invalida de más.
+Fuera de una transacción on_commit corre en el momento, así que se aplica enseguida.
+Dentro de `agrupadas()` (Reserva.save) las anotaciones de todas las Pendientes comparten
+un solo callback, registrado al salir del bloque.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+
+_grupo = threading.local()
+
+
+@contextmanager
+def agrupadas():
+    """Un solo on_commit para lo que anoten todas las Pendientes dentro del bloque."""
+    if getattr(_grupo, 'tocadas', None) is not None:
+        yield
+        return
+    tocadas = _grupo.tocadas = {}
+    try:
+        yield
+    finally:
+        _grupo.tocadas = None
+        if tocadas:
+            def confirmar():
+                for pendientes in tocadas:
+                    pendientes._confirmar()
+
+            transaction.on_commit(confirmar)
+
+
+class Pendientes:
+    def __init__(self, aplicar):
+        self._aplicar = aplicar
+        self._local = threading.local()
+
+    def _actuales(self):
+        pendientes = getattr(self._local, 'pendientes', None)
+        if pendientes is None:
+            pendientes = self._local.pendientes = set()
+        return pendientes
+
+    def agregar(self, elementos):
+        """Anota los elementos para el commit. Devuelve los que no estaban ya anotados."""
+        pendientes = self._actuales()
+        nuevos = {elemento for elemento in elementos if elemento not in pendientes}
+        pendientes.update(nuevos)
+        tocadas = getattr(_grupo, 'tocadas', None)
+        if tocadas is None:
+            transaction.on_commit(self._confirmar)
+        else:
+            tocadas[self] = None
+        return nuevos
+
+    def _confirmar(self):
+        pendientes = self._actuales()
+        if not pendientes:
+            return
+        elementos = set(pendientes)
+        pendientes.clear()
+        self._aplicar(elementos)
@@ -0,0 +1,387 @@
+"""
+API JSON de sólo lectura, versionada, para canales de venta y el frontend:
+
+    GET /api/v1/tipos/
+    GET /api/v1/disponibilidad/?entrada=AAAA-MM-DD&salida=AAAA-MM-DD[&tipo=doble][&huespedes=2]
+    GET /api/v1/cotizacion/?habitacion=<id>&entrada=AAAA-MM-DD&salida=AAAA-MM-DD[&huespedes=2]
+    POST /api/v1/cotizaciones/  {"cotizaciones": [{"tipo": "doble" | "habitacion": <id>,
+                                 "entrada": ..., "salida": ..., "huespedes": 2}, ...]}
+
+Las filas salen de values_list (tuplas), sin instanciar modelos, y el JSON va compacto.
+Cada respuesta se guarda ya serializada en la caché bajo el sello de condicional.ultima()
+para su ventana de fechas (MarcaCambio), y lleva ETag, Last-Modified y Cache-Control
+público: un pedido repetido cuesta una consulta diminuta y un get de la caché, o un 304.
+Los errores de parámetros responden 400 con {"error": "..."}. Las entradas van de hoy al
+horizonte del plan de tarifas (HOTEL_TARIFAS_DIAS).
+
+Las cotizaciones en lote van por POST (el lote no entra en una URL) y no modifican nada,
+así que no piden token CSRF. Responden en el orden pedido; un elemento inválido trae su
+propio {"error": "..."} sin invalidar el resto. No se cachean: rara vez se repiten.
+
+Los `total` salen del plan de tarifas (tarifas.py) y `precio_por_noche` es el precio base
+del tipo; un cambio de tarifas marca la fila general de MarcaCambio y cambia el ETag.
+
+Cada endpoint tiene su versión async (atipos, adisponibilidad_rango, acotizacion), con
+las mismas respuestas y la misma caché, que es la que sirve el despliegue ASGI
+(gestor_hotel/urls_asgi.py).
+"""
+import hashlib
+import json
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import BooleanField, ExpressionWrapper
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from . import condicional, disponibilidad, segundo_plano, tarifas
+from .models import Habitacion, TipoHabitacion
+
+VERSION = 'v1'
+MAXIMO_NOCHES = 60
+MAXIMO_COTIZACIONES = 1000
+
+
+class ParametroInvalido(Exception):
+    pass
+
+
+def _max_age():
+    return getattr(settings, 'HOTEL_API_MAX_AGE', 30)
+
+
+def _como_fecha(valor, nombre):
+    if not valor:
+        raise ParametroInvalido(f'Falta el parámetro "{nombre}".')
+    try:
+        return date.fromisoformat(valor)
+    except (TypeError, ValueError):
+        raise ParametroInvalido(f'"{nombre}" debe tener el formato AAAA-MM-DD.')
+
+
+def _como_entero(valor, nombre, obligatorio=False):
+    if valor is None or valor == '':
+        if obligatorio:
+            raise ParametroInvalido(f'Falta el parámetro "{nombre}".')
+        return None
+    try:
+        numero = int(valor)
+    except (TypeError, ValueError):
+        raise ParametroInvalido(f'"{nombre}" debe ser un número entero.')
+    if numero < 1:
+        raise ParametroInvalido(f'"{nombre}" debe ser mayor que cero.')
+    return numero
+
+
+def _fecha(request, nombre):
+    return _como_fecha(request.GET.get(nombre), nombre)
+
+
+def _entero(request, nombre, obligatorio=False):
+    return _como_entero(request.GET.get(nombre), nombre, obligatorio)
+
+
+def _rango(request):
+    return _validar_rango(_fecha(request, 'entrada'), _fecha(request, 'salida'))
+
+
+def _validar_rango(entrada, salida):
+    hoy = date.today()
+    if entrada < hoy:
+        raise ParametroInvalido('La fecha de entrada no puede ser anterior a hoy.')
+    # Horizonte de reservas: el del plan de tarifas. Acota también el calendario que arma
+    # un lote de cotizaciones (de la primera entrada a la última salida)
+    limite = hoy + timedelta(days=tarifas.dias())
+    if entrada >= limite:
+        raise ParametroInvalido(f'La fecha de entrada debe ser anterior a {limite.isoformat()}.')
+    if entrada >= salida:
+        raise ParametroInvalido('La fecha de salida debe ser posterior a la de entrada.')
+    if (salida - entrada).days > MAXIMO_NOCHES:
+        raise ParametroInvalido(f'La estadía no puede superar {MAXIMO_NOCHES} noches.')
+    return entrada, salida
+
+
+def _validadores(request, marca):
+    """(etag, última modificación) de la respuesta, según la marca de su ventana."""
+    sello = int(marca.timestamp() * 1_000_000) if marca else 0
+    parametros = '&'.join(f'{k}={v}' for k, v in sorted(request.GET.items()))
+    firma = hashlib.md5(f'{request.path}?{parametros}'.encode()).hexdigest()[:16]
+    etag = f'"{VERSION}-{firma}-{date.today().isoformat()}-{sello}"'
+    return etag, marca.timestamp() if marca else None
+
+
+def _serializar(datos):
+    return json.dumps(datos, cls=DjangoJSONEncoder, separators=(',', ':'), ensure_ascii=False)
+
+
+def _encabezados(respuesta, etag, ultima_modificacion):
+    respuesta['ETag'] = etag
+    if ultima_modificacion:
+        respuesta['Last-Modified'] = http_date(ultima_modificacion)
+    patch_cache_control(respuesta, public=True, max_age=_max_age())
+    return respuesta
+
+
+def _respuesta(request, desde, hasta, calcular):
+    """
+    Respuesta JSON cacheable. `calcular()` devuelve los datos (o un JsonResponse de error)
+    y sólo se llama si la versión actual no está en la caché.
+    """
+    etag, ultima_modificacion = _validadores(request, condicional.ultima(desde, hasta))
+    respuesta = get_conditional_response(request, etag=etag, last_modified=ultima_modificacion)
+    if respuesta is None:
+        clave = f'api:{etag}'
+        cuerpo = cache.get(clave)
+        if cuerpo is None:
+            datos = calcular()
+            if isinstance(datos, HttpResponse):
+                return datos
+            cuerpo = _serializar(datos)
+            cache.set(clave, cuerpo, _max_age() * 10)
+        respuesta = HttpResponse(cuerpo, content_type='application/json')
+    return _encabezados(respuesta, etag, ultima_modificacion)
+
+
+async def _arespuesta(request, desde, hasta, calcular):
+    """_respuesta() para las vistas async: `calcular` es una corrutina."""
+    etag, ultima_modificacion = _validadores(request, await condicional.aultima(desde, hasta))
+    respuesta = get_conditional_response(request, etag=etag, last_modified=ultima_modificacion)
+    if respuesta is None:
+        clave = f'api:{etag}'
+        cuerpo = await cache.aget(clave)
+        if cuerpo is None:
+            datos = await calcular()
+            if isinstance(datos, HttpResponse):
+                return datos
+            cuerpo = _serializar(datos)
+            await cache.aset(clave, cuerpo, _max_age() * 10)
+        respuesta = HttpResponse(cuerpo, content_type='application/json')
+    return _encabezados(respuesta, etag, ultima_modificacion)
+
+
+def _error(mensaje, status=400):
+    return JsonResponse({'error': mensaje}, status=status)
+
+
+def _filas_tipos():
+    return TipoHabitacion.objects.order_by('precio_por_noche', 'nombre').values_list(
+        'id', 'nombre', 'descripcion', 'capacidad_maxima', 'precio_por_noche')
+
+
+def _datos_tipos(filas):
+    return {'tipos': [
+        {'id': pk, 'nombre': nombre, 'descripcion': descripcion,
+         'capacidad_maxima': capacidad, 'precio_por_noche': precio}
+        for pk, nombre, descripcion, capacidad, precio in filas
+    ]}
+
+
+@require_GET
+def tipos(request):
+    """Catálogo de tipos con precio por noche, del más barato al más caro."""
+    return _respuesta(request, None, None, lambda: _datos_tipos(_filas_tipos()))
+
+
+@require_GET
+async def atipos(request):
+    """tipos() con el ORM async."""
+    async def calcular():
+        return _datos_tipos([fila async for fila in _filas_tipos()])
+
+    return await _arespuesta(request, None, None, calcular)
+
+
+COLUMNAS_DISPONIBILIDAD = (
+    'id', 'numero', 'piso', 'tipo_id', 'tipo__nombre', 'tipo__capacidad_maxima', 'tipo__precio_por_noche')
+
+
+def _parametros_disponibilidad(request):
+    entrada, salida = _rango(request)
+    return entrada, salida, request.GET.get('tipo') or None, _entero(request, 'huespedes')
+
+
+def _datos_disponibilidad(entrada, salida, filas):
+    """`total` es el precio de la estadía según el plan de tarifas; `precio_por_noche`, el base."""
+    noches = (salida - entrada).days
+    tarifario = tarifas.tarifario()
+    por_tipo = {}
+    for pk, numero, piso, tipo_id, nombre, capacidad, precio in filas:
+        grupo = por_tipo.get(tipo_id)
+        if grupo is None:
+            grupo = por_tipo[tipo_id] = {
+                'id': tipo_id, 'nombre': nombre, 'capacidad_maxima': capacidad, 'precio_por_noche': precio,
+                'total': tarifario.total(tipo_id, entrada, salida), 'libres': 0, 'habitaciones': [],
+            }
+        grupo['libres'] += 1
+        grupo['habitaciones'].append([pk, numero, piso])
+    return {
+        'entrada': entrada, 'salida': salida, 'noches': noches,
+        'libres': sum(grupo['libres'] for grupo in por_tipo.values()),
+        'tipos': list(por_tipo.values()),
+    }
+
+
+@require_GET
+def disponibilidad_rango(request):
+    """Habitaciones libres para [entrada, salida), agrupadas por tipo con el total de la estadía."""
+    try:
+        entrada, salida, tipo, huespedes = _parametros_disponibilidad(request)
+    except ParametroInvalido as error:
+        return _error(str(error))
+
+    def calcular():
+        libres = disponibilidad.habitaciones_libres(entrada, salida, tipo, huespedes)
+        return _datos_disponibilidad(entrada, salida, libres.values_list(*COLUMNAS_DISPONIBILIDAD))
+
+    return _respuesta(request, entrada, salida, calcular)
+
+
+@require_GET
+async def adisponibilidad_rango(request):
+    """
+    disponibilidad_rango() async: los ids libres (calendario, caché de resultados o SQL)
+    se resuelven en el pool acotado y las filas se leen con el ORM async.
+    """
+    try:
+        entrada, salida, tipo, huespedes = _parametros_disponibilidad(request)
+    except ParametroInvalido as error:
+        return _error(str(error))
+
+    async def calcular():
+        libres = await segundo_plano.ejecutar(disponibilidad.habitaciones_libres, entrada, salida, tipo, huespedes)
+        filas = [fila async for fila in libres.values_list(*COLUMNAS_DISPONIBILIDAD)]
+        # El tarifario puede tener que armarse (consultas síncronas)
+        return await segundo_plano.ejecutar(_datos_disponibilidad, entrada, salida, filas)
+
+    return await _arespuesta(request, entrada, salida, calcular)
+
+
+def _parametros_cotizacion(request):
+    habitacion_id = _entero(request, 'habitacion', obligatorio=True)
+    entrada, salida = _rango(request)
+    return habitacion_id, entrada, salida, _entero(request, 'huespedes')
+
+
+def _fila_cotizacion(habitacion_id, entrada, salida):
+    return Habitacion.objects.filter(pk=habitacion_id).annotate(
+        libre=ExpressionWrapper(disponibilidad.condicion_libre(entrada, salida), output_field=BooleanField()),
+    ).values_list('numero', 'tipo_id', 'tipo__nombre', 'tipo__capacidad_maxima', 'tipo__precio_por_noche', 'libre')
+
+
+def _datos_cotizacion(fila, habitacion_id, entrada, salida, huespedes):
+    if fila is None:
+        return _error('La habitación no existe.', status=404)
+    numero, tipo_id, tipo, capacidad, precio, libre = fila
+    noches = (salida - entrada).days
+    if not libre:
+        motivo = 'no_disponible'
+    elif huespedes and huespedes > capacidad:
+        motivo = 'capacidad'
+    else:
+        motivo = None
+    return {
+        'habitacion': {'id': habitacion_id, 'numero': numero, 'tipo': tipo, 'capacidad_maxima': capacidad},
+        'entrada': entrada, 'salida': salida, 'noches': noches, 'huespedes': huespedes,
+        'precio_por_noche': precio, 'total': tarifas.cotizar(tipo_id, entrada, salida),
+        'disponible': motivo is None,
+        'motivo': motivo,
+    }
+
+
+@require_GET
+def cotizacion(request):
+    """Precio de una estadía en una habitación y si está libre para esas fechas."""
+    try:
+        habitacion_id, entrada, salida, huespedes = _parametros_cotizacion(request)
+    except ParametroInvalido as error:
+        return _error(str(error))
+
+    def calcular():
+        fila = _fila_cotizacion(habitacion_id, entrada, salida).first()
+        return _datos_cotizacion(fila, habitacion_id, entrada, salida, huespedes)
+
+    return _respuesta(request, entrada, salida, calcular)
+
+
+@require_GET
+async def acotizacion(request):
+    """cotizacion() con el ORM async."""
+    try:
+        habitacion_id, entrada, salida, huespedes = _parametros_cotizacion(request)
+    except ParametroInvalido as error:
+        return _error(str(error))
+
+    async def calcular():
+        fila = await _fila_cotizacion(habitacion_id, entrada, salida).afirst()
+        return await segundo_plano.ejecutar(_datos_cotizacion, fila, habitacion_id, entrada, salida, huespedes)
+
+    return await _arespuesta(request, entrada, salida, calcular)
+
+
+def _pedido_lote(elemento):
+    if not isinstance(elemento, dict):
+        raise ParametroInvalido('Cada cotización debe ser un objeto.')
+    entrada, salida = _validar_rango(_como_fecha(elemento.get('entrada'), 'entrada'),
+                                     _como_fecha(elemento.get('salida'), 'salida'))
+    habitacion = _como_entero(elemento.get('habitacion'), 'habitacion')
+    tipo = elemento.get('tipo') or None
+    if (habitacion is None) == (tipo is None):
+        raise ParametroInvalido('Indique "tipo" o "habitacion" (uno de los dos).')
+    return {'tipo': tipo, 'habitacion': habitacion, 'entrada': entrada, 'salida': salida,
+            'huespedes': _como_entero(elemento.get('huespedes'), 'huespedes')}
+
+
+def _parametros_lote(request):
+    """Lista con el pedido válido de cada elemento, o el mensaje de error si no lo es."""
+    try:
+        cuerpo = json.loads(request.body)
+    except ValueError:
+        raise ParametroInvalido('El cuerpo debe ser JSON.')
+    elementos = cuerpo.get('cotizaciones') if isinstance(cuerpo, dict) else None
+    if not isinstance(elementos, list):
+        raise ParametroInvalido('Falta la lista "cotizaciones".')
+    if len(elementos) > MAXIMO_COTIZACIONES:
+        raise ParametroInvalido(f'Se aceptan hasta {MAXIMO_COTIZACIONES} cotizaciones por pedido.')
+    pedidos = []
+    for elemento in elementos:
+        try:
+            pedidos.append(_pedido_lote(elemento))
+        except ParametroInvalido as error:
+            pedidos.append(str(error))
+    return pedidos
+
+
+def _respuesta_lote(pedidos):
+    validos = [pedido for pedido in pedidos if not isinstance(pedido, str)]
+    resultados = iter(disponibilidad.cotizar_lote(validos))
+    datos = {'cotizaciones': [
+        {'error': pedido} if isinstance(pedido, str) else next(resultados) for pedido in pedidos
+    ]}
+    return HttpResponse(_serializar(datos), content_type='application/json')
+
+
+@csrf_exempt
+@require_POST
+def cotizaciones(request):
+    """Disponibilidad y total de hasta MAXIMO_COTIZACIONES estadías, por tipo o por habitación."""
+    try:
+        pedidos = _parametros_lote(request)
+    except ParametroInvalido as error:
+        return _error(str(error))
+    return _respuesta_lote(pedidos)
+
+
+@csrf_exempt
+@require_POST
+async def acotizaciones(request):
+    """cotizaciones() async: el lote se resuelve en el pool acotado de segundo_plano."""
+    try:
+        pedidos = _parametros_lote(request)
+    except ParametroInvalido as error:
+        return _error(str(error))
+    return await segundo_plano.ejecutar(_respuesta_lote, pedidos)
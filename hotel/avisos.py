@@ -0,0 +1,104 @@
+"""
+Avisos por correo a los huéspedes, como tarea programada (comando `enviar_avisos`):
+
+- llegada: reservas confirmadas que entran en las próximas 48 horas (fecha_entrada entre
+  hoy y hoy + ANTICIPACION_LLEGADA), por el índice (estado, fecha_entrada);
+- salida: reservas confirmadas o completadas cuya fecha_salida ya pasó, dentro de
+  VENTANA_SALIDA (así la primera corrida no le escribe a todo el historial), por el
+  índice (estado, fecha_salida).
+
+Las reservas se recorren por lotes ordenados por (fecha, id), con paginación por clave:
+la memoria queda acotada por el tamaño del lote, haya 50 o 50.000 avisos. Cada lote, en
+una transacción: renderiza los mensajes con la plantilla (compilada una sola vez por
+corrida), los agrega a la bandeja de salida (correos.py) con un bulk_create y pone
+aviso_llegada / aviso_salida en las reservas con un UPDATE. Marca y correo se confirman
+juntos, así que una corrida repetida o interrumpida no duplica ni pierde avisos. Los
+envía el worker de correos, por lotes sobre una conexión SMTP reutilizada.
+"""
+from datetime import date, timedelta
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.template.loader import get_template
+from django.utils import timezone
+
+from . import correos
+from .models import Reserva
+
+ANTICIPACION_LLEGADA = timedelta(days=2)
+VENTANA_SALIDA = timedelta(days=7)
+LOTE = 500
+
+AVISOS = {
+    'llegada': {
+        'marca': 'aviso_llegada',
+        'fecha': 'fecha_entrada',
+        'plantilla': 'hotel/correos/aviso_llegada.txt',
+        'asunto': 'Te esperamos el {reserva.fecha_entrada:%d/%m/%Y} - Reserva #{reserva.id}',
+    },
+    'salida': {
+        'marca': 'aviso_salida',
+        'fecha': 'fecha_salida',
+        'plantilla': 'hotel/correos/aviso_salida.txt',
+        'asunto': 'Gracias por tu estadía - Reserva #{reserva.id}',
+    },
+}
+
+
+def pendientes(tipo, hoy=None):
+    """Reservas a las que les toca el aviso `tipo` ('llegada' o 'salida') y todavía no lo tienen."""
+    hoy = hoy or date.today()
+    if tipo == 'llegada':
+        reservas = Reserva.objects.filter(
+            estado='confirmada', fecha_entrada__gte=hoy, fecha_entrada__lte=hoy + ANTICIPACION_LLEGADA,
+            aviso_llegada__isnull=True,
+        )
+    else:
+        reservas = Reserva.objects.filter(
+            estado__in=('confirmada', 'completada'), fecha_salida__lt=hoy, fecha_salida__gte=hoy - VENTANA_SALIDA,
+            aviso_salida__isnull=True,
+        )
+    # Sin correo no hay a quién avisar
+    return reservas.exclude(cliente__email='')
+
+
+def _bloquear(reservas):
+    # Dos corridas a la vez no toman el mismo lote (en SQLite ya las serializa BEGIN IMMEDIATE)
+    if connection.features.has_select_for_update_skip_locked:
+        of = ('self',) if connection.features.has_select_for_update_of else ()
+        return reservas.select_for_update(skip_locked=True, of=of)
+    return reservas
+
+
+def encolar_avisos(tipo, hoy=None, tamano=LOTE):
+    """Encola el aviso `tipo` de todas las reservas pendientes. Devuelve cuántos encoló."""
+    aviso = AVISOS[tipo]
+    plantilla = get_template(aviso['plantilla'])
+    campo = aviso['fecha']
+    base = pendientes(tipo, hoy).select_related('cliente', 'habitacion').order_by(campo, 'pk')
+
+    total = 0
+    ultimo = None
+    while True:
+        lote = base
+        if ultimo:
+            lote = lote.filter(Q(**{f'{campo}__gt': ultimo[0]}) | Q(**{campo: ultimo[0], 'pk__gt': ultimo[1]}))
+        with transaction.atomic():
+            reservas = list(_bloquear(lote)[:tamano])
+            if not reservas:
+                return total
+            correos.encolar_varios(
+                (
+                    reserva.cliente.email,
+                    aviso['asunto'].format(reserva=reserva),
+                    plantilla.render({
+                        'reserva': reserva,
+                        'nombre': reserva.cliente.first_name or reserva.cliente.username,
+                    }),
+                )
+                for reserva in reservas
+            )
+            Reserva.objects.filter(pk__in=[reserva.pk for reserva in reservas]).update(
+                **{aviso['marca']: timezone.now()})
+        ultimo = (getattr(reservas[-1], campo), reservas[-1].pk)
+        total += len(reservas)
@@ -0,0 +1,177 @@
+"""
+Utilidades compartidas por los comandos benchmark_*.
+
+Los datos sintéticos se crean dentro de una transacción que se deshace al
+terminar, así que los benchmarks pueden correr contra la base de datos real
+sin dejar rastro. SMTPLocal es un servidor de correo de prueba (también lo
+usan los tests).
+"""
+import random
+import socketserver
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+
+from .models import Habitacion, Reserva, TipoHabitacion
+
+TIPOS_SINTETICOS = [
+    ('individual', Decimal('35000.00'), 1),
+    ('doble', Decimal('55000.00'), 2),
+    ('suite', Decimal('95000.00'), 2),
+    ('familiar', Decimal('75000.00'), 4),
+]
+
+
+class _Descartar(Exception):
+    pass
+
+
+@contextmanager
+def transaccion_descartable():
+    """Ejecuta el bloque dentro de una transacción que siempre se revierte."""
+    try:
+        with transaction.atomic():
+            yield
+            raise _Descartar()
+    except _Descartar:
+        pass
+
+
+def medir(funcion, repeticiones=5):
+    """Devuelve (milisegundos promedio, consultas por llamada, último resultado)."""
+    contador = [0]
+
+    def contar(execute, sql, params, many, context):
+        contador[0] += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(contar):
+        resultado = funcion()
+    n_consultas = contador[0]
+
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        resultado = funcion()
+    ms = (time.perf_counter() - inicio) * 1000 / repeticiones
+    return ms, n_consultas, resultado
+
+
+def crear_datos_sinteticos(n_habitaciones, reservas_por_habitacion=4, horizonte_dias=120, semilla=42):
+    """
+    Crea tipos, `n_habitaciones` habitaciones y reservas sin solapamiento por habitación
+    usando bulk_create. Devuelve la lista de habitaciones creadas.
+    """
+    rnd = random.Random(semilla)
+    tipos = []
+    for nombre, precio, capacidad in TIPOS_SINTETICOS:
+        tipo, _ = TipoHabitacion.objects.get_or_create(
+            nombre=nombre,
+            defaults={'precio_por_noche': precio, 'capacidad_maxima': capacidad},
+        )
+        tipos.append(tipo)
+
+    cliente, _ = User.objects.get_or_create(username='benchmark_cliente')
+
+    habitaciones = Habitacion.objects.bulk_create([
+        Habitacion(numero=f'B{i:06d}', tipo=tipos[i % len(tipos)], piso=i // 100 + 1)
+        for i in range(n_habitaciones)
+    ], batch_size=2000)
+    habitaciones = list(Habitacion.objects.filter(numero__startswith='B').select_related('tipo'))
+
+    hoy = date.today()
+    reservas = []
+    for habitacion in habitaciones:
+        dia = rnd.randint(0, 10)
+        for _ in range(reservas_por_habitacion):
+            noches = rnd.randint(1, 7)
+            entrada = hoy + timedelta(days=dia)
+            if dia + noches > horizonte_dias:
+                break
+            reservas.append(Reserva(
+                cliente=cliente,
+                habitacion=habitacion,
+                fecha_entrada=entrada,
+                fecha_salida=entrada + timedelta(days=noches),
+                numero_huespedes=1,
+                estado=rnd.choice(['pendiente', 'confirmada', 'confirmada', 'cancelada']),
+                precio_total=habitacion.tipo.precio_por_noche * noches,
+            ))
+            dia += noches + rnd.randint(0, 20)
+    Reserva.objects.bulk_create(reservas, batch_size=5000)
+    return habitaciones
+
+
+class _SesionSMTP(socketserver.StreamRequestHandler):
+    def _responder(self, linea):
+        self.wfile.write(f'{linea}\r\n'.encode())
+
+    def handle(self):
+        servidor = self.server.smtp
+        with servidor.candado:
+            servidor.conexiones += 1
+        time.sleep(servidor.demora)  # saludo (y lo que sería el TLS) de un servidor lejano
+        self._responder('220 localhost SMTP de prueba')
+        for linea in iter(self.rfile.readline, b''):
+            comando = linea.decode('utf-8', 'replace').strip().upper()
+            if comando.startswith(('EHLO', 'HELO')):
+                self._responder('250 localhost')
+            elif comando == 'DATA':
+                self._responder('354 Terminar con <CRLF>.<CRLF>')
+                datos = []
+                for renglon in iter(self.rfile.readline, b''):
+                    if renglon in (b'.\r\n', b'.\n'):
+                        break
+                    datos.append(renglon)
+                time.sleep(servidor.demora)
+                with servidor.candado:
+                    servidor.mensajes.append(b''.join(datos).decode('utf-8', 'replace'))
+                self._responder('250 Aceptado')
+            elif comando == 'QUIT':
+                self._responder('221 Chau')
+                return
+            else:  # MAIL, RCPT, RSET, NOOP
+                self._responder('250 OK')
+
+
+class _ServidorSMTP(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class SMTPLocal:
+    """
+    Servidor SMTP mínimo en 127.0.0.1 (puerto libre), en un hilo. Guarda los mensajes
+    recibidos y cuenta las conexiones; `demora` (segundos) se aplica al saludo y a cada
+    mensaje, para simular un servidor lento. Uso: `with SMTPLocal(demora=0.2) as smtp:`
+    y apuntar EMAIL_HOST/EMAIL_PORT a smtp.puerto.
+    """
+
+    def __init__(self, demora=0):
+        self.demora = demora
+        self.mensajes = []
+        self.conexiones = 0
+        self.candado = threading.Lock()
+
+    def __enter__(self):
+        self._servidor = _ServidorSMTP(('127.0.0.1', 0), _SesionSMTP)
+        self._servidor.smtp = self
+        self.puerto = self._servidor.server_address[1]
+        threading.Thread(target=self._servidor.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    def ajustes(self):
+        """Settings de correo para apuntar el backend SMTP de Django a este servidor."""
+        return {
+            'EMAIL_BACKEND': 'django.core.mail.backends.smtp.EmailBackend',
+            'EMAIL_HOST': '127.0.0.1', 'EMAIL_PORT': self.puerto,
+            'EMAIL_USE_TLS': False, 'EMAIL_HOST_USER': '', 'EMAIL_HOST_PASSWORD': '',
+        }
@@ -0,0 +1,233 @@
+"""
+Caché de resultados de disponibilidad con invalidación por versiones.
+
+Guarda los ids de habitaciones libres para cada (fecha_entrada, fecha_salida, tipo).
+La clave incluye la versión de cada ventana (tipo, mes) que toca la búsqueda y la
+versión general de cada tipo:
+
+- Una escritura de Reserva sube sólo las versiones (tipo de su habitación, mes) de los
+  meses que cubre la reserva (antes y después del cambio).
+- Una escritura de Habitacion sube la versión general de su tipo.
+
+Así una reserva nueva en marzo para una doble no invalida las búsquedas de suites ni
+las de julio. Las versiones se suben al escribir y otra vez al confirmar la transacción,
+y el hilo que escribe no usa la caché hasta confirmar, para no guardar datos sin commit.
+Cada versión se sube una vez por transacción (al_confirmar.py), aunque la toquen muchas
+reservas. Con la caché apagada (HOTEL_CACHE_DISPONIBILIDAD = False) no se sube nada.
+
+Las versiones viven en la caché de Django: si es por proceso (LocMem), una escritura
+sólo invalida en el worker que la hizo y en los demás el resultado vive hasta su TTL
+(HOTEL_CACHE_DISPONIBILIDAD_TTL, corto por eso; ver settings.py).
+
+Los contadores de aciertos/fallos viven en la misma caché (compartidos entre procesos
+si el backend lo es) y se consultan con `estadisticas()`.
+"""
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from .al_confirmar import Pendientes
+from .indice_reservas import CambiosSinConfirmar
+
+PREFIJO = 'disp'
+_cambios = CambiosSinConfirmar()
+
+
+def habilitado():
+    return getattr(settings, 'HOTEL_CACHE_DISPONIBILIDAD', True)
+
+
+def _ttl():
+    return getattr(settings, 'HOTEL_CACHE_DISPONIBILIDAD_TTL', 30)
+
+
+def meses_de(fecha_entrada, fecha_salida):
+    """Meses ('AAAA-MM') que tocan las noches de [fecha_entrada, fecha_salida)."""
+    # Con aritmética de año y mes: corre en cada escritura de una reserva (signals.py)
+    ultima_noche = fecha_salida - timedelta(days=1)
+    anio, mes = fecha_entrada.year, fecha_entrada.month
+    hasta = (ultima_noche.year, ultima_noche.month)
+    meses = []
+    while (anio, mes) <= hasta:
+        meses.append(f'{anio:04d}-{mes:02d}')
+        anio, mes = (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+    return meses
+
+
+def _clave_tipo(tipo_id):
+    return f'{PREFIJO}:v:tipo:{tipo_id}'
+
+
+def _clave_ventana(tipo_id, mes):
+    return f'{PREFIJO}:v:tipo:{tipo_id}:{mes}'
+
+
+def _tipos():
+    """{nombre: id} de los tipos de habitación, cacheado hasta que cambie algún tipo."""
+    from .models import TipoHabitacion
+
+    clave = f'{PREFIJO}:tipos'
+    tipos = cache.get(clave)
+    if tipos is None:
+        tipos = dict(TipoHabitacion.objects.values_list('nombre', 'id'))
+        cache.set(clave, tipos, _ttl())
+    return tipos
+
+
+def _versiones(claves):
+    """Versiones actuales; las que faltan (o fueron desalojadas) nacen con un valor único."""
+    versiones = cache.get_many(claves)
+    faltantes = {clave: time.time_ns() for clave in claves if clave not in versiones}
+    if faltantes:
+        for clave, valor in faltantes.items():
+            cache.add(clave, valor, None)
+        versiones.update(cache.get_many(list(faltantes)))
+    return [versiones.get(clave, 0) for clave in claves]
+
+
+def _subir(claves):
+    for clave in claves:
+        try:
+            cache.incr(clave)
+        except ValueError:
+            cache.set(clave, time.time_ns(), None)
+
+
+def _contar(evento):
+    clave = f'{PREFIJO}:stats:{evento}'
+    if cache.add(clave, 1, None):
+        return
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.set(clave, 1, None)
+
+
+def _clave_resultado(fecha_entrada, fecha_salida, tipo):
+    tipos = _tipos()
+    if tipo:
+        tipo_ids = [tipos[tipo]] if tipo in tipos else []
+    else:
+        tipo_ids = sorted(tipos.values())
+    meses = meses_de(fecha_entrada, fecha_salida)
+    claves = [_clave_tipo(t) for t in tipo_ids] + [_clave_ventana(t, m) for t in tipo_ids for m in meses]
+    version = '.'.join(str(v) for v in _versiones(claves))
+    return f'{PREFIJO}:r:{fecha_entrada.isoformat()}:{fecha_salida.isoformat()}:{tipo or "*"}:{version}'
+
+
+def usable():
+    return habilitado() and not _cambios.actuales()
+
+
+def obtener_ids(fecha_entrada, fecha_salida, tipo, calcular):
+    """
+    Ids libres para la búsqueda. `calcular()` se llama sólo en un fallo de caché y debe
+    devolver la lista de ids; las versiones se leen antes de calcular, así un cambio que
+    llegue a mitad de camino deja el resultado guardado bajo una clave ya vencida.
+    """
+    if not usable():
+        return calcular()
+    clave = _clave_resultado(fecha_entrada, fecha_salida, tipo)
+    ids = cache.get(clave)
+    if ids is not None:
+        _contar('aciertos')
+        return ids
+    _contar('fallos')
+    ids = calcular()
+    cache.set(clave, ids, _ttl())
+    return ids
+
+
+def estadisticas():
+    valores = cache.get_many([f'{PREFIJO}:stats:aciertos', f'{PREFIJO}:stats:fallos'])
+    aciertos = valores.get(f'{PREFIJO}:stats:aciertos', 0)
+    fallos = valores.get(f'{PREFIJO}:stats:fallos', 0)
+    total = aciertos + fallos
+    return {
+        'aciertos': aciertos,
+        'fallos': fallos,
+        'tasa_aciertos': round(aciertos / total, 4) if total else None,
+    }
+
+
+def reiniciar_estadisticas():
+    cache.delete_many([f'{PREFIJO}:stats:aciertos', f'{PREFIJO}:stats:fallos'])
+
+
+# ---- invalidación (llamada desde signals.py) ----
+
+def _confirmar(claves):
+    _subir(sorted(claves))
+    # Lo que ensució este hilo ya está confirmado: puede volver a usar la caché
+    _cambios.actuales().clear()
+
+
+_pendientes = Pendientes(_confirmar)
+
+
+def _invalidar(claves, marca):
+    """
+    Sube las versiones ahora (las que la transacción todavía no subió) y otra vez al
+    confirmarla.
+    """
+    if not claves:
+        return
+    _cambios.actuales().add(marca)
+    _subir(sorted(_pendientes.agregar(claves)))
+
+
+def _como_fecha(valor):
+    return date.fromisoformat(valor) if isinstance(valor, str) else valor
+
+
+def invalidar_reserva(reserva):
+    if not habilitado():
+        return
+    estados = [(reserva.habitacion_id, reserva.fecha_entrada, reserva.fecha_salida)]
+    originales = reserva.valores_originales()
+    if originales and originales['habitacion_id'] is not None:
+        estados.append((originales['habitacion_id'], originales['fecha_entrada'], originales['fecha_salida']))
+
+    habitacion_ids = {habitacion_id for habitacion_id, _, _ in estados}
+    if habitacion_ids == {reserva.habitacion_id} and reserva._meta.get_field('habitacion').is_cached(reserva):
+        tipos = {reserva.habitacion_id: reserva.habitacion.tipo_id}
+    else:
+        from .models import Habitacion
+
+        tipos = dict(Habitacion.objects.filter(pk__in=habitacion_ids).values_list('pk', 'tipo_id'))
+
+    ventanas = set()
+    for habitacion_id, entrada, salida in estados:
+        entrada, salida = _como_fecha(entrada), _como_fecha(salida)
+        tipo_id = tipos.get(habitacion_id)
+        if tipo_id is None or not entrada or not salida or entrada >= salida:
+            continue
+        ventanas.update(_clave_ventana(tipo_id, mes) for mes in meses_de(entrada, salida))
+    _invalidar(sorted(ventanas), ('reserva', reserva.pk))
+
+
+def invalidar_habitacion(habitacion, update_fields=None):
+    if not habilitado():
+        return
+    if update_fields is not None and 'tipo' not in update_fields:
+        tipo_ids = [habitacion.tipo_id]
+    else:
+        # Un cambio completo puede mover la habitación de tipo: se suben todos los tipos
+        tipo_ids = list(_tipos().values())
+        if habitacion.tipo_id not in tipo_ids:
+            tipo_ids.append(habitacion.tipo_id)
+    _invalidar([_clave_tipo(t) for t in tipo_ids], ('habitacion', habitacion.pk))
+
+
+def invalidar_tipos():
+    cache.delete(f'{PREFIJO}:tipos')
+
+
+def invalidar_masivo(tipo_ids=None):
+    """Tras escrituras masivas sin señales: sube la versión de los tipos (o de todos)."""
+    if not habilitado():
+        return
+    if tipo_ids is None:
+        tipo_ids = list(_tipos().values())
+    _invalidar([_clave_tipo(t) for t in tipo_ids], ('masivo', None))
@@ -0,0 +1,183 @@
+"""
+GET condicionales (ETag / Last-Modified) para los listados que se consultan sin parar
+(clientes móviles y el proxy inverso): lista_habitaciones y habitaciones_disponibles.
+
+Cada escritura que puede cambiar lo que muestran deja una marca en MarcaCambio al
+confirmarse su transacción (transaction.on_commit):
+- una reserva marca los meses de sus noches, antes y después del cambio (así también
+  cuenta una reserva eliminada o movida fuera de la ventana);
+- una habitación o un tipo marcan la fila general ('*');
+- una escritura masiva marca los meses de su rango, o la general si no lo conoce.
+Las marcas de una transacción se juntan (al_confirmar.py): un solo upsert al confirmar,
+aunque la transacción guarde miles de reservas.
+
+La marca va después del commit y no dentro de la transacción de la reserva: el upsert de
+la fila del mes la dejaría bloqueada hasta el commit (en PostgreSQL) y todas las reservas
+de ese mes harían cola en esa fila, aunque sean de habitaciones distintas y cada una sólo
+bloquee la suya (reservas.py). A cambio, el validador puede quedar un instante detrás del
+commit: un pedido que llegue justo entre el commit y la marca recibe la versión anterior
+(un 304 o la respuesta cacheada), como mucho hasta la marca, que es inmediata. Si la
+transacción se revierte no se marca nada.
+
+El validador de una página es la marca más reciente entre la general y los meses de su
+ventana: una consulta sobre una tabla diminuta. Si el cliente ya tiene esa versión
+(If-None-Match / If-Modified-Since), la vista responde 304 sin consultar nada más ni
+renderizar el template.
+
+Las vistas async se decoran igual: la versión se calcula antes con el ORM async, porque
+condition() llama sin await a las funciones que calculan los validadores.
+"""
+from datetime import date, timedelta
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.db.models import Max, Q
+from django.utils import timezone
+from django.views.decorators.http import condition
+
+from .al_confirmar import Pendientes
+from .cache_disponibilidad import meses_de
+
+GENERAL = '*'
+# Igual a views.MARGEN_FLEXIBLE_MAXIMO
+MARGEN_FLEXIBLE = timedelta(days=7)
+
+
+def _como_fecha(valor):
+    return date.fromisoformat(valor) if isinstance(valor, str) else valor
+
+
+def _estampar(nombres):
+    from .models import MarcaCambio
+
+    ahora = timezone.now()
+    MarcaCambio.objects.bulk_create(
+        [MarcaCambio(nombre=nombre, actualizada=ahora) for nombre in sorted(nombres)],
+        update_conflicts=True, unique_fields=['nombre'], update_fields=['actualizada'],
+    )
+
+
+_pendientes = Pendientes(_estampar)
+
+
+def _marcar(nombres):
+    _pendientes.agregar(nombres)
+
+
+def registrar_reserva(reserva):
+    rangos = [(reserva.fecha_entrada, reserva.fecha_salida)]
+    originales = reserva.valores_originales()
+    if originales:
+        rangos.append((originales['fecha_entrada'], originales['fecha_salida']))
+    meses = set()
+    for entrada, salida in rangos:
+        entrada, salida = _como_fecha(entrada), _como_fecha(salida)
+        if entrada and salida and entrada < salida:
+            meses.update(meses_de(entrada, salida))
+    if meses:
+        _marcar(meses)
+
+
+def registrar_general():
+    _marcar([GENERAL])
+
+
+def registrar_rango(desde=None, hasta=None):
+    if desde and hasta and desde < hasta:
+        _marcar(meses_de(desde, hasta))
+    else:
+        registrar_general()
+
+
+def _marcas(desde, hasta):
+    from .models import MarcaCambio
+
+    filtro = Q(nombre=GENERAL)
+    if desde and hasta:
+        filtro |= Q(nombre__in=meses_de(desde, hasta))
+    elif desde:
+        filtro |= Q(nombre__gte=desde.strftime('%Y-%m'))
+    return MarcaCambio.objects.filter(filtro)
+
+
+def ultima(desde=None, hasta=None):
+    """
+    Marca más reciente que afecta a las noches de [desde, hasta) (None si no hay).
+    Sin `hasta`, cuenta todos los meses desde `desde` en adelante; sin fechas, sólo la
+    marca general (habitaciones y tipos).
+    """
+    return _marcas(desde, hasta).aggregate(ultima=Max('actualizada'))['ultima']
+
+
+async def aultima(desde=None, hasta=None):
+    """ultima() con el ORM async."""
+    return (await _marcas(desde, hasta).aaggregate(ultima=Max('actualizada')))['ultima']
+
+
+def _armar_version(etiqueta, usuario, marca):
+    # La página también depende de quién la pide (menú, botones de admin) y del día
+    pk = usuario.pk if usuario.is_authenticated else 'anonimo'
+    sello = int(marca.timestamp() * 1_000_000) if marca else 0
+    return f'{etiqueta}-{pk}-{date.today().isoformat()}-{sello}', marca
+
+
+def _version(request, etiqueta, desde, hasta):
+    """(etag, última modificación) de la página, calculados una vez por pedido."""
+    if not hasattr(request, '_version_condicional'):
+        request._version_condicional = _armar_version(etiqueta, request.user, ultima(desde, hasta))
+    return request._version_condicional
+
+
+async def _aversion(request, etiqueta, desde, hasta):
+    if not hasattr(request, '_version_condicional'):
+        request._version_condicional = _armar_version(
+            etiqueta, await request.auser(), await aultima(desde, hasta))
+    return request._version_condicional
+
+
+def _ventana_listado(request, *args, **kwargs):
+    # Reservas activas que salen hoy o después: sus noches van desde el mes de ayer
+    return date.today() - timedelta(days=1), None
+
+
+def _ventana_disponibles(request, fecha_entrada, fecha_salida, *args, **kwargs):
+    try:
+        entrada, salida = date.fromisoformat(fecha_entrada), date.fromisoformat(fecha_salida)
+    except ValueError:
+        return None
+    if entrada >= salida:
+        return None
+    # Con fechas flexibles la página mira hasta una semana antes y después
+    return entrada - MARGEN_FLEXIBLE, salida + MARGEN_FLEXIBLE
+
+
+def _condicional(etiqueta, ventana):
+    def etag(request, *args, **kwargs):
+        rango = ventana(request, *args, **kwargs)
+        return _version(request, etiqueta, *rango)[0] if rango else None
+
+    def ultima_modificacion(request, *args, **kwargs):
+        rango = ventana(request, *args, **kwargs)
+        return _version(request, etiqueta, *rango)[1] if rango else None
+
+    decorador = condition(etag_func=etag, last_modified_func=ultima_modificacion)
+
+    def envolver(vista):
+        condicionada = decorador(vista)
+        if not iscoroutinefunction(vista):
+            return condicionada
+
+        @wraps(vista)
+        async def vista_async(request, *args, **kwargs):
+            rango = ventana(request, *args, **kwargs)
+            if rango:
+                await _aversion(request, etiqueta, *rango)
+            return await condicionada(request, *args, **kwargs)
+
+        return vista_async
+
+    return envolver
+
+
+listado = _condicional('habitaciones', _ventana_listado)
+disponibles = _condicional('disponibles', _ventana_disponibles)
@@ -0,0 +1,147 @@
+"""
+Bandeja de salida de correos (tabla CorreoPendiente).
+
+Las vistas no hablan con el servidor SMTP: encolar() inserta una fila dentro de la misma
+transacción que el cambio que la motiva (confirmar una reserva, crear una cuenta), así que
+si el cambio se revierte el correo tampoco sale, y el pedido no espera al servidor de correo.
+
+El worker (`manage.py enviar_correos`) llama a enviar_lote() en un bucle:
+- reclama hasta HOTEL_CORREOS_LOTE pendientes vencidos corriendo su proximo_intento
+  RESERVA hacia adelante (con SELECT ... FOR UPDATE SKIP LOCKED donde existe), así dos
+  workers no toman la misma fila y, si uno muere a mitad del lote, lo suyo vuelve a
+  quedar vencido al terminar la reserva;
+- envía el lote por una sola conexión SMTP, que se reabre sólo si un envío falla;
+- un fallo reprograma el correo con espera exponencial (HOTEL_CORREOS_ESPERA segundos,
+  duplicándose hasta ESPERA_MAXIMA) y al agotar HOTEL_CORREOS_INTENTOS lo deja como
+  'fallido' (dead letter), con el último error, para revisarlo en el admin.
+
+La entrega es "al menos una vez": un worker que muere después de enviar y antes de
+marcar puede repetir un correo.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import CorreoPendiente
+
+RESERVA = timedelta(minutes=5)
+ESPERA_MAXIMA = timedelta(hours=6)
+
+
+def _lote():
+    return getattr(settings, 'HOTEL_CORREOS_LOTE', 50)
+
+
+def _intentos():
+    return getattr(settings, 'HOTEL_CORREOS_INTENTOS', 5)
+
+
+def _espera(intentos):
+    base = timedelta(seconds=getattr(settings, 'HOTEL_CORREOS_ESPERA', 60))
+    return min(base * 2 ** (intentos - 1), ESPERA_MAXIMA)
+
+
+def encolar(destinatario, asunto, cuerpo, remitente=''):
+    """Agrega el correo a la bandeja de salida (en la transacción en curso, si hay una)."""
+    return CorreoPendiente.objects.create(
+        destinatario=destinatario, asunto=asunto, cuerpo=cuerpo, remitente=remitente or '',
+    )
+
+
+def encolar_varios(mensajes):
+    """encolar() para muchos (destinatario, asunto, cuerpo), con INSERTs por lote."""
+    return CorreoPendiente.objects.bulk_create([
+        CorreoPendiente(destinatario=destinatario, asunto=asunto, cuerpo=cuerpo)
+        for destinatario, asunto, cuerpo in mensajes
+    ], batch_size=500)
+
+
+def _reclamar(tamano):
+    ahora = timezone.now()
+    with transaction.atomic():
+        pendientes = CorreoPendiente.objects.filter(
+            estado='pendiente', proximo_intento__lte=ahora,
+        ).order_by('proximo_intento', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            pendientes = pendientes.select_for_update(skip_locked=True)
+        correos = list(pendientes[:tamano])
+        if correos:
+            CorreoPendiente.objects.filter(pk__in=[correo.pk for correo in correos]).update(
+                proximo_intento=ahora + RESERVA)
+    return correos
+
+
+def _fallo(correo, error):
+    intentos = correo.intentos + 1
+    cambios = {'intentos': intentos, 'ultimo_error': f'{type(error).__name__}: {error}'[:2000]}
+    if intentos >= _intentos():
+        cambios['estado'] = 'fallido'
+    else:
+        cambios['proximo_intento'] = timezone.now() + _espera(intentos)
+    CorreoPendiente.objects.filter(pk=correo.pk).update(**cambios)
+    return cambios.get('estado', 'pendiente')
+
+
+def enviar_lote(tamano=None, conexion=None):
+    """
+    Envía un lote de correos vencidos. Devuelve {'enviados', 'reintentos', 'fallidos'}.
+    `conexion` es un backend de correo ya abierto (el worker lo reutiliza entre lotes);
+    sin ella se abre y se cierra una para este lote.
+    """
+    conteo = {'enviados': 0, 'reintentos': 0, 'fallidos': 0}
+    correos = _reclamar(tamano or _lote())
+    if not correos:
+        return conteo
+
+    propia = conexion is None
+    if propia:
+        conexion = get_connection()
+    enviados = []
+    try:
+        for correo in correos:
+            mensaje = EmailMessage(
+                correo.asunto, correo.cuerpo, correo.remitente or settings.DEFAULT_FROM_EMAIL,
+                [correo.destinatario], connection=conexion,
+            )
+            try:
+                conexion.open()
+                mensaje.send()
+            except Exception as error:
+                # La conexión puede haber quedado rota: se reabre para el siguiente
+                conexion.close()
+                conteo['fallidos' if _fallo(correo, error) == 'fallido' else 'reintentos'] += 1
+            else:
+                enviados.append(correo.pk)
+    finally:
+        if enviados:
+            CorreoPendiente.objects.filter(pk__in=enviados).update(
+                estado='enviado', enviado=timezone.now(), intentos=F('intentos') + 1, ultimo_error='')
+        if propia:
+            conexion.close()
+    conteo['enviados'] = len(enviados)
+    return conteo
+
+
+def vaciar(tamano=None):
+    """Envía lotes hasta que no quede nada vencido, por la misma conexión. Devuelve los totales."""
+    total = {'enviados': 0, 'reintentos': 0, 'fallidos': 0}
+    conexion = get_connection()
+    try:
+        while True:
+            conteo = enviar_lote(tamano, conexion)
+            for clave, cantidad in conteo.items():
+                total[clave] += cantidad
+            if not any(conteo.values()):
+                return total
+    finally:
+        conexion.close()
+
+
+def reintentar(correos):
+    """Vuelve a poner en cola correos fallidos (acción del admin)."""
+    return correos.filter(estado='fallido').update(
+        estado='pendiente', intentos=0, proximo_intento=timezone.now())
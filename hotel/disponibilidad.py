@@ -0,0 +1,395 @@
+"""
+Servicio de consulta de disponibilidad de habitaciones.
+
+Responde "qué habitaciones están libres para [entrada, salida)" con un número
+constante de consultas, sin importar cuántas habitaciones tenga el hotel.
+El solapamiento se resuelve con un NOT EXISTS correlacionado sobre el índice
+(habitacion, fecha_entrada, fecha_salida) de Reserva, y la agrupación por tipo
+se hace con GROUP BY en la base de datos.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.db.models import Count, Exists, Min, OuterRef, Prefetch, Q, Subquery
+
+from . import cache_disponibilidad, tarifas
+from .indice_reservas import indice
+from .models import Habitacion, Reserva, TipoHabitacion
+from . import ocupacion
+from .ocupacion import calendario
+
+ESTADOS_ACTIVOS = ('pendiente', 'confirmada')
+
+
+def reservas_en_conflicto(fecha_entrada=None, fecha_salida=None):
+    """
+    Reservas activas que impiden ocupar una habitación.
+    - Con fechas: las que se solapan con [fecha_entrada, fecha_salida).
+    - Sin fechas: las que terminan hoy o después (mismo criterio que esta_disponible()).
+    """
+    reservas = Reserva.objects.filter(estado__in=ESTADOS_ACTIVOS)
+    if fecha_entrada and fecha_salida:
+        return reservas.filter(fecha_entrada__lt=fecha_salida, fecha_salida__gt=fecha_entrada)
+    return reservas.filter(fecha_salida__gte=date.today())
+
+
+def condicion_libre(fecha_entrada=None, fecha_salida=None):
+    """Expresión Q reutilizable: habitación en estado disponible y sin reservas en conflicto."""
+    conflictos = reservas_en_conflicto(fecha_entrada, fecha_salida).filter(habitacion=OuterRef('pk'))
+    return Q(estado='disponible') & ~Exists(conflictos)
+
+
+def listado_habitaciones(habitaciones=None, proximas=0):
+    """
+    Habitaciones listas para mostrar en un listado, en una sola consulta:
+    - `tipo` por JOIN (select_related);
+    - `tiene_reservas_activas`: EXISTS de reservas activas que terminan hoy o después
+      (con esto esta_disponible() sin fechas no consulta nada);
+    - `fin_reserva_actual`: fecha de salida de la reserva confirmada en curso, o None.
+    Con `proximas` > 0 agrega una consulta más que trae, para todas las habitaciones,
+    sus próximas `proximas` reservas activas (ver Habitacion.proximas_reservas()).
+    """
+    hoy = date.today()
+    habitaciones = Habitacion.objects.all() if habitaciones is None else habitaciones
+    habitaciones = habitaciones.select_related('tipo').annotate(
+        tiene_reservas_activas=Exists(reservas_en_conflicto().filter(habitacion=OuterRef('pk'))),
+        fin_reserva_actual=Subquery(
+            Reserva.objects.filter(
+                habitacion=OuterRef('pk'), estado='confirmada', fecha_entrada__lte=hoy, fecha_salida__gt=hoy
+            ).order_by('fecha_salida').values('fecha_salida')[:1]
+        ),
+    )
+    if proximas:
+        # Prefetch recortado: Django numera por habitación con una función de ventana
+        siguientes = Reserva.objects.filter(
+            estado__in=ESTADOS_ACTIVOS, fecha_entrada__gte=hoy
+        ).order_by('fecha_entrada')[:proximas]
+        habitaciones = habitaciones.prefetch_related(
+            Prefetch('reservas', queryset=siguientes, to_attr='proximas_activas')
+        )
+    return habitaciones
+
+
+def habitaciones_libres(fecha_entrada=None, fecha_salida=None, tipo=None, huespedes=None):
+    """
+    QuerySet (sin evaluar) de habitaciones libres para el rango, en una sola consulta.
+    `tipo` es el nombre del TipoHabitacion y `huespedes` filtra por capacidad máxima.
+    Si hay fechas, los ids salen del calendario en bits o de la caché de resultados
+    cuando están disponibles.
+    """
+    if fecha_entrada and fecha_salida and fecha_entrada >= fecha_salida:
+        return Habitacion.objects.none()
+
+    ids = _libres_en_calendario(fecha_entrada, fecha_salida, tipo, huespedes)
+    if ids is None and fecha_entrada and fecha_salida and cache_disponibilidad.usable():
+        ids = cache_disponibilidad.obtener_ids(
+            fecha_entrada, fecha_salida, tipo,
+            lambda: list(_consulta_sql(fecha_entrada, fecha_salida, tipo).values_list('pk', flat=True)),
+        )
+    if ids is not None and _cabe_en_consulta(ids):
+        habitaciones = Habitacion.objects.select_related('tipo').filter(pk__in=ids)
+        if huespedes:
+            habitaciones = habitaciones.filter(tipo__capacidad_maxima__gte=huespedes)
+        return habitaciones.order_by('tipo__nombre', 'numero')
+
+    return _consulta_sql(fecha_entrada, fecha_salida, tipo, huespedes).order_by('tipo__nombre', 'numero')
+
+
+def _consulta_sql(fecha_entrada=None, fecha_salida=None, tipo=None, huespedes=None):
+    habitaciones = Habitacion.objects.select_related('tipo').filter(
+        condicion_libre(fecha_entrada, fecha_salida)
+    )
+    if tipo:
+        habitaciones = habitaciones.filter(tipo__nombre=tipo)
+    if huespedes:
+        habitaciones = habitaciones.filter(tipo__capacidad_maxima__gte=huespedes)
+    return habitaciones
+
+
+def _cabe_en_consulta(ids):
+    limite = connection.features.max_query_params
+    return limite is None or len(ids) <= limite
+
+
+def _libres_en_calendario(fecha_entrada, fecha_salida, tipo=None, huespedes=None):
+    """Ids libres según el calendario de ocupación en bits, o None si no puede responder."""
+    if not (fecha_entrada and fecha_salida):
+        return None
+    actual = calendario.obtener()
+    if actual is None or not actual.cubre(fecha_entrada, fecha_salida):
+        return None
+
+    tipo_ids = None
+    if tipo or huespedes:
+        tipos = TipoHabitacion.objects.all()
+        if tipo:
+            tipos = tipos.filter(nombre=tipo)
+        if huespedes:
+            tipos = tipos.filter(capacidad_maxima__gte=huespedes)
+        tipo_ids = list(tipos.values_list('pk', flat=True))
+
+    return actual.libres(fecha_entrada, fecha_salida, tipo_ids)
+
+
+def tipos_disponibles(fecha_entrada=None, fecha_salida=None, tipo=None, huespedes=None):
+    """
+    Tipos de habitación con al menos una habitación libre, agrupados en la base de datos.
+    Cada tipo trae `libres` (conteo por GROUP BY) y `habitaciones_libres` (prefetch),
+    en total dos consultas.
+    """
+    libres = habitaciones_libres(fecha_entrada, fecha_salida, tipo, huespedes)
+    return (
+        TipoHabitacion.objects
+        .filter(habitaciones__in=libres.values('pk'))
+        .annotate(libres=Count('habitaciones'))
+        .prefetch_related(Prefetch('habitaciones', queryset=libres, to_attr='habitaciones_libres'))
+        .order_by('precio_por_noche', 'nombre')
+    )
+
+
+def resumen_por_tipo(fecha_entrada=None, fecha_salida=None, huespedes=None):
+    """Conteo de habitaciones libres y precio por tipo, como diccionarios (una consulta)."""
+    return (
+        habitaciones_libres(fecha_entrada, fecha_salida, huespedes=huespedes)
+        .order_by()
+        .values('tipo_id', 'tipo__nombre', 'tipo__capacidad_maxima')
+        .annotate(libres=Count('id'), precio_por_noche=Min('tipo__precio_por_noche'))
+        .order_by('tipo__nombre')
+    )
+
+
+def busqueda_flexible(fecha_entrada, noches, margen, tipo=None, huespedes=None):
+    """
+    Disponibilidad para estadías de `noches` noches que empiezan entre fecha_entrada - margen
+    y fecha_entrada + margen (nunca antes de hoy). Todas las fechas de entrada se resuelven
+    con un solo calendario en bits y un AND deslizante, en tres consultas en total.
+
+    Devuelve (tipos, filas): los tipos considerados (ordenados por precio base) y, por
+    fecha de entrada, un dict con 'fecha_entrada', 'fecha_salida', 'libres', 'por_tipo'
+    (libres por tipo, en el orden de `tipos`), 'precio_minimo' (total de la estadía más
+    barata según el plan de tarifas, que puede variar con la fecha) y 'tipo_mas_barato'.
+    """
+    desde = max(fecha_entrada - timedelta(days=margen), date.today())
+    hasta = fecha_entrada + timedelta(days=margen + 1)
+    if noches < 1 or desde >= hasta:
+        return [], []
+
+    tipos = TipoHabitacion.objects.order_by('precio_por_noche', 'nombre')
+    if tipo:
+        tipos = tipos.filter(nombre=tipo)
+    if huespedes:
+        tipos = tipos.filter(capacidad_maxima__gte=huespedes)
+    tipos = list(tipos)
+    if not tipos:
+        return [], []
+    tipo_ids = [t.pk for t in tipos]
+
+    actual = ocupacion.para_rango(desde, hasta + timedelta(days=noches - 1))
+    tarifario = tarifas.tarifario()
+    filas = []
+    for inicio, mascara in actual.libres_por_inicio(desde, hasta, noches, tipo_ids):
+        por_tipo = actual.contar_por_tipo(mascara, tipo_ids)
+        salida = inicio + timedelta(days=noches)
+        precios = [(tarifario.total(t.pk, inicio, salida), i) for i, t in enumerate(tipos) if por_tipo[t.pk]]
+        precio_minimo, mas_barato = min(precios) if precios else (None, None)
+        filas.append({
+            'fecha_entrada': inicio,
+            'fecha_salida': salida,
+            'libres': sum(por_tipo.values()),
+            'por_tipo': [por_tipo[t.pk] for t in tipos],
+            'precio_minimo': precio_minimo,
+            'tipo_mas_barato': tipos[mas_barato] if precios else None,
+        })
+    return tipos, filas
+
+
+CRITERIOS_GRUPO = (
+    ('mas_barata', 'Opción más económica'),
+    ('menos_habitaciones', 'Menos habitaciones'),
+)
+
+
+def combinaciones_para_grupo(fecha_entrada, fecha_salida, huespedes):
+    """
+    Combinaciones de habitaciones libres que alojan a `huespedes` personas en el rango:
+    la más barata y la de menos habitaciones (si son distintas).
+
+    Se resuelve como una mochila acotada sobre los conteos por tipo (resumen_por_tipo),
+    no sobre habitaciones: cada tipo se parte en bloques de 1, 2, 4... habitaciones y la
+    tabla tiene una fila por capacidad cubierta, tope `huespedes`. El costo es
+    O(huespedes × tipos × log(habitaciones)) y son dos consultas: el resumen por tipo y
+    la elección de habitaciones concretas para las opciones encontradas.
+
+    El costo de cada habitación es el total de la estadía en su tipo según el plan de
+    tarifas (tarifas.py), que queda en la fila del resumen como 'precio_estadia'.
+
+    Devuelve una lista de dicts con 'criterio', 'titulo', 'tipos' (lista de
+    (fila del resumen, cantidad)), 'habitaciones' (instancias elegidas), 'cantidad',
+    'capacidad' y 'precio_total'.
+    """
+    if not huespedes or huespedes < 1 or fecha_entrada >= fecha_salida:
+        return []
+    tipos = [t for t in resumen_por_tipo(fecha_entrada, fecha_salida) if t['libres']]
+    tarifario = tarifas.tarifario()
+    for tipo in tipos:
+        tipo['precio_estadia'] = tarifario.total(tipo['tipo_id'], fecha_entrada, fecha_salida)
+
+    # Bloques de la mochila: (tipo, habitaciones, capacidad, costo). No tiene sentido
+    # usar más habitaciones de un tipo que las necesarias para alojar a todo el grupo.
+    bloques = []
+    for i, tipo in enumerate(tipos):
+        capacidad = tipo['tipo__capacidad_maxima']
+        disponibles = min(tipo['libres'], -(-huespedes // capacidad))
+        bloque = 1
+        while disponibles > 0:
+            cantidad = min(bloque, disponibles)
+            bloques.append((i, cantidad, capacidad * cantidad, tipo['precio_estadia'] * cantidad))
+            disponibles -= cantidad
+            bloque *= 2
+
+    titulos = dict(CRITERIOS_GRUPO)
+    opciones = []
+    for criterio, clave in (('mas_barata', lambda costo, n: (costo, n)),
+                            ('menos_habitaciones', lambda costo, n: (n, costo))):
+        elegidas = _mochila_grupo(bloques, len(tipos), huespedes, clave)
+        if elegidas is None:
+            return []
+        if any(o['cantidades'] == elegidas for o in opciones):
+            continue
+        opciones.append({
+            'criterio': criterio,
+            'titulo': titulos[criterio],
+            'cantidades': elegidas,
+            'tipos': [(tipos[i], n) for i, n in enumerate(elegidas) if n],
+            'cantidad': sum(elegidas),
+            'capacidad': sum(tipos[i]['tipo__capacidad_maxima'] * n for i, n in enumerate(elegidas)),
+            'precio_total': sum(
+                (tipos[i]['precio_estadia'] * n for i, n in enumerate(elegidas)), Decimal('0')
+            ).quantize(Decimal('0.01')),
+        })
+
+    # Habitaciones concretas para cada opción, en una sola consulta
+    necesarias = {}
+    for opcion in opciones:
+        for tipo, n in opcion['tipos']:
+            necesarias[tipo['tipo_id']] = max(necesarias.get(tipo['tipo_id'], 0), n)
+    por_tipo = {}
+    for habitacion in habitaciones_libres(fecha_entrada, fecha_salida).filter(tipo_id__in=necesarias):
+        lista = por_tipo.setdefault(habitacion.tipo_id, [])
+        if len(lista) < necesarias[habitacion.tipo_id]:
+            lista.append(habitacion)
+    for opcion in opciones:
+        opcion['habitaciones'] = [
+            habitacion for tipo, n in opcion['tipos'] for habitacion in por_tipo.get(tipo['tipo_id'], [])[:n]
+        ]
+    return opciones
+
+
+def _mochila_grupo(bloques, cantidad_tipos, huespedes, clave):
+    """
+    Mochila 0/1 sobre los bloques, con la capacidad acumulada recortada a `huespedes`.
+    mejor[c] = (orden, costo, habitaciones, cantidades por tipo) para capacidad c.
+    Devuelve las cantidades por tipo de la mejor combinación que cubre a todos, o None.
+    """
+    mejor = [None] * (huespedes + 1)
+    mejor[0] = (clave(0, 0), 0, 0, (0,) * cantidad_tipos)
+    for tipo, cantidad, capacidad, costo in bloques:
+        siguiente = list(mejor)
+        for c, actual in enumerate(mejor):
+            if actual is None:
+                continue
+            destino = min(c + capacidad, huespedes)
+            nuevo_costo, nuevas = actual[1] + costo, actual[2] + cantidad
+            orden = clave(nuevo_costo, nuevas)
+            if siguiente[destino] is None or orden < siguiente[destino][0]:
+                cantidades = list(actual[3])
+                cantidades[tipo] += cantidad
+                siguiente[destino] = (orden, nuevo_costo, nuevas, tuple(cantidades))
+        mejor = siguiente
+    return list(mejor[huespedes][3]) if mejor[huespedes] else None
+
+
+def cotizar_lote(pedidos):
+    """
+    Disponibilidad y precio de muchas estadías de una vez (API de cotizaciones en lote).
+    Cada pedido es un dict con 'entrada', 'salida', 'huespedes' (o None) y 'tipo' (nombre)
+    o 'habitacion' (id). No hay consultas por pedido: un calendario en bits de la ventana
+    que cubre a todos (el global si está activo y la cubre; si no, habitaciones y reservas
+    activas en dos consultas) resuelve cada disponibilidad con un OR de noches y un
+    popcount, y el tarifario (tarifas.py) cada precio con una resta. Los tipos son una
+    consulta más.
+
+    Devuelve, en el mismo orden, dicts con 'tipo', 'habitacion', 'entrada', 'salida',
+    'noches', 'huespedes', 'libres' (habitaciones libres del tipo, o 1/0 si se pidió una
+    habitación), 'disponible', 'motivo' ('no_disponible', 'capacidad' o None) y 'total'
+    (de una habitación); o {'error': ...} si el tipo o la habitación no existen.
+    """
+    if not pedidos:
+        return []
+    tipos = {nombre: (pk, capacidad) for pk, nombre, capacidad in
+             TipoHabitacion.objects.values_list('id', 'nombre', 'capacidad_maxima')}
+    nombres = {pk: nombre for nombre, (pk, _) in tipos.items()}
+    actual = ocupacion.para_rango(min(p['entrada'] for p in pedidos), max(p['salida'] for p in pedidos))
+    tarifario = tarifas.tarifario()
+
+    mascaras = {}
+    resultados = []
+    for pedido in pedidos:
+        entrada, salida, huespedes = pedido['entrada'], pedido['salida'], pedido.get('huespedes')
+        habitacion_id = pedido.get('habitacion')
+        if habitacion_id is not None:
+            nombre = nombres.get(actual.tipo_de(habitacion_id))
+            if nombre is None:
+                resultados.append({'error': 'La habitación no existe.'})
+                continue
+        else:
+            nombre = pedido['tipo']
+            if nombre not in tipos:
+                resultados.append({'error': f'No existe el tipo "{nombre}".'})
+                continue
+        tipo_id, capacidad = tipos[nombre]
+
+        # Muchos pedidos repiten (rango, tipo): la máscara se calcula una vez
+        clave = (entrada, salida, tipo_id)
+        mascara = mascaras.get(clave)
+        if mascara is None:
+            mascara = mascaras[clave] = actual.mascara_libres(entrada, salida, [tipo_id])
+        if habitacion_id is not None:
+            libres = int(actual.incluye(mascara, habitacion_id))
+        else:
+            libres = mascara.bit_count()
+
+        if not libres:
+            motivo = 'no_disponible'
+        elif huespedes and huespedes > capacidad:
+            motivo = 'capacidad'
+        else:
+            motivo = None
+        resultados.append({
+            'tipo': nombre, 'habitacion': habitacion_id, 'entrada': entrada, 'salida': salida,
+            'noches': (salida - entrada).days, 'huespedes': huespedes, 'libres': libres,
+            'disponible': motivo is None, 'motivo': motivo,
+            'total': tarifario.total(tipo_id, entrada, salida),
+        })
+    return resultados
+
+
+def esta_libre(habitacion, fecha_entrada=None, fecha_salida=None):
+    """
+    Disponibilidad de una habitación concreta: en memoria si el índice de reservas
+    está activo, si no con una sola consulta.
+    """
+    if indice.usable_para(habitacion.pk):
+        return habitacion.esta_disponible(fecha_entrada, fecha_salida)
+    return habitaciones_libres(fecha_entrada, fecha_salida).filter(pk=habitacion.pk).exists()
+
+
+async def aesta_libre(habitacion, fecha_entrada=None, fecha_salida=None):
+    """
+    esta_libre() para las vistas async: siempre la consulta EXISTS, por el ORM async
+    (el índice en memoria se carga de forma síncrona).
+    """
+    return await Habitacion.objects.filter(pk=habitacion.pk).filter(
+        condicion_libre(fecha_entrada, fecha_salida)
+    ).aexists()
@@ -1,9 +1,10 @@
-from django.core.mail import send_mail
-from django.conf import settings
+from . import correos
 
 def enviar_confirmacion_reserva(email_cliente, nombre_cliente, numero_reserva, habitacion_numero=None, fecha_entrada=None, fecha_salida=None, precio_total=None):
     """
-    Envía un email de confirmación de reserva al cliente
+    Encola el email de confirmación de reserva al cliente (lo envía el worker
+    enviar_correos, ver correos.py). Llamarla dentro de la transacción que confirma
+    la reserva: si se revierte, el correo no sale.
     """
     asunto = f"Confirmación de Reserva #{numero_reserva} - Hotel Manager"
 
@@ -41,16 +42,23 @@ Si tienes alguna pregunta, no dudes en contactarnos.
 Hotel Manager
 """
 
-    try:
-        send_mail(
-            asunto,
-            mensaje,
-            settings.DEFAULT_FROM_EMAIL,
-            [email_cliente],
-            fail_silently=False
-        )
-        return True
-    except Exception as e:
-        print(f"Error al enviar email de confirmación: {e}")
-        return False
+    return correos.encolar(email_cliente, asunto, mensaje)
+
+
+def enviar_bienvenida(usuario):
+    """Encola el email de bienvenida de una cuenta nueva (ver enviar_confirmacion_reserva)."""
+    nombre_completo = f"{usuario.first_name} {usuario.last_name}"
+    asunto = "Bienvenido a Hotel Manager"
+    mensaje = f"""Hola {nombre_completo},
+
+Tu cuenta ha sido creada exitosamente.
+
+Nombre de usuario: {usuario.username}
+Correo: {usuario.email}
+
+Ya puedes iniciar sesión y comenzar a hacer reservas.
+
+¡Bienvenido a Hotel Manager!"""
+
+    return correos.encolar(usuario.email, asunto, mensaje)
 
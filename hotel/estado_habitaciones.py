@@ -0,0 +1,117 @@
+"""
+Estado de las habitaciones (Habitacion.estado) derivado de sus reservas, por conjuntos.
+
+Regla (la misma que aplicaba Reserva.actualizar_estado_habitacion):
+- con una reserva confirmada en curso hoy -> 'ocupada';
+- sin reservas activas (pendiente/confirmada) que salgan hoy o después -> 'disponible';
+- en otro caso se deja como está. 'mantenimiento' nunca se toca: lo decide un administrador.
+
+`recalcular()` lo resuelve para cualquier conjunto de habitaciones con una consulta de
+lectura (dos EXISTS anotados) y, sólo si algo cambió, un UPDATE por estado nuevo.
+
+Las escrituras de Reserva no recalculan en el momento: `programar()` anota las
+habitaciones tocadas y un único on_commit las recalcula todas juntas al confirmar la
+transacción. Fuera de una transacción, on_commit corre enseguida. El "cambio de día"
+nocturno para todas las habitaciones es el comando `recalcular_estado_habitaciones`.
+
+QuerySet.update no emite post_save: por cada habitación que cambia se envía post_save
+(update_fields={'estado'}) como si se hubiera guardado, para que caché y calendario se
+enteren; si cambian muchas de una vez se envía signals.cambios_masivos.
+"""
+from datetime import date
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Exists, OuterRef
+from django.db.models.signals import post_save
+
+from .al_confirmar import Pendientes
+
+ESTADOS_ACTIVOS = ('pendiente', 'confirmada')
+# Cambios por encima de este número se notifican con una sola señal masiva
+MAXIMO_SENALES = 100
+
+
+def estado_calculado(estado, en_curso, activas):
+    if estado == 'mantenimiento':
+        return estado
+    if en_curso:
+        return 'ocupada'
+    if not activas:
+        return 'disponible'
+    return estado
+
+
+@transaction.atomic
+def recalcular(habitacion_ids=None, hoy=None):
+    """
+    Recalcula el estado de las habitaciones dadas (todas si es None).
+    Devuelve {habitacion_id: estado_nuevo} de las que cambiaron.
+    """
+    from .models import Habitacion, Reserva
+
+    hoy = hoy or date.today()
+    if habitacion_ids is not None:
+        habitacion_ids = [pk for pk in set(habitacion_ids) if pk is not None]
+        if not habitacion_ids:
+            return {}
+
+    filas = Habitacion.objects.exclude(estado='mantenimiento').annotate(
+        en_curso=Exists(Reserva.objects.filter(
+            habitacion=OuterRef('pk'), estado='confirmada', fecha_entrada__lte=hoy, fecha_salida__gt=hoy
+        )),
+        activas=Exists(Reserva.objects.filter(
+            habitacion=OuterRef('pk'), estado__in=ESTADOS_ACTIVOS, fecha_salida__gte=hoy
+        )),
+    ).order_by().values_list('pk', 'tipo_id', 'estado', 'en_curso', 'activas')
+
+    if habitacion_ids is None:
+        partes = [filas]
+    else:
+        # Por partes: SQLite limita la cantidad de parámetros por consulta
+        partes = [filas.filter(pk__in=habitacion_ids[i:i + 500]) for i in range(0, len(habitacion_ids), 500)]
+
+    cambios = {}
+    for parte in partes:
+        for pk, tipo_id, estado, en_curso, activas in parte.iterator(chunk_size=5000):
+            nuevo = estado_calculado(estado, en_curso, activas)
+            if nuevo != estado:
+                cambios[pk] = (tipo_id, estado, nuevo)
+    if not cambios:
+        return {}
+
+    for nuevo in ('ocupada', 'disponible'):
+        ids = sorted(pk for pk, (_, _, estado) in cambios.items() if estado == nuevo)
+        for i in range(0, len(ids), 500):
+            Habitacion.objects.filter(pk__in=ids[i:i + 500]).update(estado=nuevo)
+
+    _notificar(cambios)
+    return {pk: nuevo for pk, (_, _, nuevo) in cambios.items()}
+
+
+def _notificar(cambios):
+    from .models import Habitacion
+    from .signals import cambios_masivos
+
+    if len(cambios) > MAXIMO_SENALES:
+        cambios_masivos.send(sender=Habitacion, habitacion_ids=set(cambios))
+        return
+    for pk, (tipo_id, _, nuevo) in cambios.items():
+        habitacion = Habitacion(pk=pk, tipo_id=tipo_id, estado=nuevo)
+        post_save.send(sender=Habitacion, instance=habitacion, created=False,
+                       update_fields=frozenset(['estado']), raw=False, using=DEFAULT_DB_ALIAS)
+
+
+def _al_confirmar(ids):
+    recalcular(ids)
+
+
+_pendientes = Pendientes(_al_confirmar)
+
+
+def programar(habitacion_ids):
+    """
+    Recalcula las habitaciones al confirmar la transacción en curso, todas en una pasada
+    (ver al_confirmar.py). Si la transacción se revierte, lo anotado se recalcula con la
+    próxima que confirme: recalcular de más no cambia el resultado.
+    """
+    _pendientes.agregar(pk for pk in habitacion_ids if pk is not None)
@@ -0,0 +1,224 @@
+"""
+Índice en memoria de los intervalos de reservas activas (pendiente/confirmada) por habitación.
+
+Para cada habitación se guardan las reservas ordenadas por fecha de entrada junto con el
+máximo acumulado de las fechas de salida. Con eso, "¿hay alguna reserva que se solape con
+[entrada, salida)?" se responde con una búsqueda binaria y sin SQL, incluso si hubiera
+reservas antiguas que se solapan entre sí.
+
+El índice es local a cada proceso:
+- Se carga de forma perezosa, por habitación, la primera vez que se consulta.
+- Se actualiza con las señales post_save/post_delete de Reserva, pero los cambios se aplican
+  recién al confirmar la transacción. Mientras tanto, las habitaciones modificadas por la
+  transacción en curso se consultan por SQL, así un rollback nunca deja datos falsos.
+- Con settings.HOTEL_INDICE_RESERVAS = False (valor por defecto) todo sigue por SQL.
+- settings.HOTEL_INDICE_RESERVAS_TTL acota cuánto puede tardar un proceso en ver las
+  escrituras hechas por otros procesos: al vencer, el índice se descarta y se recarga.
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import date
+from itertools import accumulate
+
+from django.conf import settings
+from django.db import connection, transaction
+
+ESTADOS_ACTIVOS = ('pendiente', 'confirmada')
+
+
+def habilitado():
+    return getattr(settings, 'HOTEL_INDICE_RESERVAS', False)
+
+
+def _ordinal(valor):
+    if isinstance(valor, str):
+        valor = date.fromisoformat(valor)
+    return valor.toordinal()
+
+
+class _Intervalos:
+    """Reservas activas de una habitación, ordenadas por (entrada, salida, id) en ordinales."""
+
+    __slots__ = ('reservas', 'max_salida')
+
+    def __init__(self, reservas=()):
+        self.reservas = sorted(reservas)
+        self._recalcular()
+
+    def _recalcular(self):
+        self.max_salida = list(accumulate((salida for _, salida, _ in self.reservas), max))
+
+    def agregar(self, entrada, salida, reserva_id):
+        insort(self.reservas, (entrada, salida, reserva_id))
+        self._recalcular()
+
+    def quitar(self, reserva_id):
+        self.reservas = [r for r in self.reservas if r[2] != reserva_id]
+        self._recalcular()
+
+    def hay_solapamiento(self, entrada, salida):
+        # Reservas con fecha_entrada < salida: las primeras k de la lista
+        k = bisect_left(self.reservas, (salida,))
+        return k > 0 and self.max_salida[k - 1] > entrada
+
+    def termina_desde(self, dia):
+        return bool(self.max_salida) and self.max_salida[-1] >= dia
+
+
+class CambiosSinConfirmar:
+    """
+    Habitaciones modificadas por la transacción en curso de cada hilo.
+    Mientras estén aquí, las estructuras en memoria no deben responder por ellas.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def actuales(self):
+        sucias = getattr(self._local, 'sucias', None)
+        if sucias is None:
+            sucias = self._local.sucias = set()
+        elif sucias and not connection.in_atomic_block:
+            # La transacción que las ensució ya terminó (commit aplicado o rollback descartado)
+            sucias.clear()
+        return sucias
+
+
+class IndiceReservas:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._cambios = CambiosSinConfirmar()
+        self._limpiar()
+
+    def _limpiar(self):
+        self._habitaciones = {}
+        self._ubicacion = {}  # reserva_id -> habitacion_id
+        self._cargado_en = time.monotonic()
+
+    def usable_para(self, habitacion_id):
+        """True si la habitación puede consultarse en memoria en este momento."""
+        return habilitado() and habitacion_id is not None and habitacion_id not in self._cambios.actuales()
+
+    # ---- carga ----
+
+    def _vencido(self):
+        ttl = getattr(settings, 'HOTEL_INDICE_RESERVAS_TTL', None)
+        return ttl is not None and time.monotonic() - self._cargado_en > ttl
+
+    def _consultar(self, habitacion_ids=None):
+        from .models import Reserva
+
+        reservas = Reserva.objects.filter(estado__in=ESTADOS_ACTIVOS)
+        if habitacion_ids is not None:
+            reservas = reservas.filter(habitacion_id__in=habitacion_ids)
+        por_habitacion = {hid: [] for hid in habitacion_ids or ()}
+        for reserva_id, habitacion_id, entrada, salida in reservas.values_list(
+            'id', 'habitacion_id', 'fecha_entrada', 'fecha_salida'
+        ).iterator(chunk_size=5000):
+            por_habitacion.setdefault(habitacion_id, []).append(
+                (entrada.toordinal(), salida.toordinal(), reserva_id)
+            )
+        return por_habitacion
+
+    def _guardar(self, por_habitacion):
+        for habitacion_id, reservas in por_habitacion.items():
+            anterior = self._habitaciones.get(habitacion_id)
+            if anterior is not None:
+                for _, _, reserva_id in anterior.reservas:
+                    self._ubicacion.pop(reserva_id, None)
+            self._habitaciones[habitacion_id] = _Intervalos(reservas)
+            for _, _, reserva_id in reservas:
+                self._ubicacion[reserva_id] = habitacion_id
+
+    def _intervalos(self, habitacion_id):
+        with self._lock:
+            if self._vencido():
+                self._limpiar()
+            intervalos = self._habitaciones.get(habitacion_id)
+            if intervalos is None:
+                self._guardar(self._consultar([habitacion_id]))
+                intervalos = self._habitaciones[habitacion_id]
+            return intervalos
+
+    def invalidar(self, habitacion_ids=None):
+        """Descarta habitaciones (o todo el índice) tras escrituras masivas que no emiten señales."""
+        with self._lock:
+            if habitacion_ids is None:
+                self._limpiar()
+                return
+            for habitacion_id in habitacion_ids:
+                intervalos = self._habitaciones.pop(habitacion_id, None)
+                if intervalos is not None:
+                    for _, _, reserva_id in intervalos.reservas:
+                        self._ubicacion.pop(reserva_id, None)
+
+    # ---- consultas ----
+
+    def hay_conflicto(self, habitacion_id, fecha_entrada, fecha_salida):
+        intervalos = self._intervalos(habitacion_id)
+        with self._lock:
+            return intervalos.hay_solapamiento(fecha_entrada.toordinal(), fecha_salida.toordinal())
+
+    def tiene_reservas_activas(self, habitacion_id, desde=None):
+        intervalos = self._intervalos(habitacion_id)
+        with self._lock:
+            return intervalos.termina_desde((desde or date.today()).toordinal())
+
+    # ---- mantenimiento por señales ----
+
+    def registrar_cambio(self, reserva, eliminada=False):
+        """Marca la habitación como sucia y aplica el cambio cuando la transacción confirme."""
+        if not habilitado():
+            return
+        habitacion_id = reserva.habitacion_id
+        reserva_id = reserva.pk
+        activa = not eliminada and reserva.estado in ESTADOS_ACTIVOS
+        entrada = _ordinal(reserva.fecha_entrada)
+        salida = _ordinal(reserva.fecha_salida)
+
+        with self._lock:
+            anterior = self._ubicacion.get(reserva_id)
+        sucias = self._cambios.actuales()
+        sucias.add(habitacion_id)
+        if anterior is not None:
+            sucias.add(anterior)
+
+        def aplicar():
+            with self._lock:
+                origen = self._ubicacion.pop(reserva_id, None)
+                if origen is not None and origen in self._habitaciones:
+                    self._habitaciones[origen].quitar(reserva_id)
+                destino = self._habitaciones.get(habitacion_id)
+                if activa and destino is not None:
+                    destino.agregar(entrada, salida, reserva_id)
+                    self._ubicacion[reserva_id] = habitacion_id
+            sucias.discard(habitacion_id)
+            if anterior is not None:
+                sucias.discard(anterior)
+
+        transaction.on_commit(aplicar)
+
+    # ---- verificación ----
+
+    def verificar(self, reparar=False):
+        """
+        Compara las habitaciones cargadas con la base de datos.
+        Devuelve la lista de habitacion_id inconsistentes (y las recarga si `reparar`).
+        """
+        with self._lock:
+            cargadas = {hid: list(iv.reservas) for hid, iv in self._habitaciones.items()}
+        if not cargadas:
+            return []
+        en_bd = self._consultar()
+        inconsistentes = [
+            hid for hid, reservas in cargadas.items()
+            if reservas != sorted(en_bd.get(hid, []))
+        ]
+        if reparar and inconsistentes:
+            with self._lock:
+                self._guardar({hid: en_bd.get(hid, []) for hid in inconsistentes})
+        return inconsistentes
+
+
+indice = IndiceReservas()
@@ -0,0 +1,21 @@
+# hotel/management/commands/actualizar_resumenes.py
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from hotel import reportes
+
+
+class Command(BaseCommand):
+    help = ('Recalcula los resúmenes diarios de ocupación e ingresos de los reportes: sólo las '
+            'noches recientes y las ya reservadas, o toda la historia con --completo (correr cada noche)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--completo', action='store_true',
+                            help='Recalcular desde la primera reserva, ignorando la marca de la última corrida')
+
+    def handle(self, *args, **options):
+        desde, hasta, filas = reportes.actualizar(completo=options['completo'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Resúmenes actualizados: {filas} filas entre {desde} y {hasta - timedelta(days=1)}'
+        ))
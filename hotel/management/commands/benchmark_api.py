@@ -0,0 +1,72 @@
+# hotel/management/commands/benchmark_api.py
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+
+from hotel import api
+from hotel.benchmarks import crear_datos_sinteticos, transaccion_descartable
+from hotel.models import Habitacion
+
+
+class Command(BaseCommand):
+    help = 'Pedidos por segundo de la API JSON (en proceso, sin servidor HTTP ni red)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--habitaciones', type=int, default=1000,
+                            help='Tamaño del hotel sintético (default: 1000)')
+        parser.add_argument('--pedidos', type=int, default=2000,
+                            help='Pedidos por medición (default: 2000)')
+
+    def handle(self, *args, **options):
+        fabrica = RequestFactory()
+        entrada = date.today() + timedelta(days=30)
+        rango = {'entrada': entrada.isoformat(), 'salida': (entrada + timedelta(days=3)).isoformat()}
+
+        with transaccion_descartable():
+            crear_datos_sinteticos(options['habitaciones'])
+            habitacion_id = Habitacion.objects.filter(numero__startswith='B').values_list('pk', flat=True).first()
+            endpoints = [
+                ('tipos', api.tipos, {}),
+                ('disponibilidad', api.disponibilidad_rango, rango),
+                ('cotizacion', api.cotizacion, {**rango, 'habitacion': habitacion_id, 'huespedes': 2}),
+            ]
+            self.stdout.write(f'{"endpoint":<16} | {"caché":<9} | {"pedidos/s":>10} | {"consultas":>9} | {"bytes":>7}')
+            self.stdout.write('-' * 64)
+            for nombre, vista, parametros in endpoints:
+                def pedir():
+                    request = fabrica.get('/api/v1/', parametros)
+                    request.user = AnonymousUser()
+                    return vista(request)
+
+                repeticiones = max(options['pedidos'] // 20, 1)
+                for modo, cantidad, limpiar in (('fría', repeticiones, True), ('caliente', options['pedidos'], False)):
+                    pedir()
+                    por_segundo, consultas, respuesta = self._medir(pedir, cantidad, limpiar)
+                    self.stdout.write(
+                        f'{nombre:<16} | {modo:<9} | {por_segundo:>10.0f} | {consultas:>9.1f} | {len(respuesta.content):>7}'
+                    )
+            cache.clear()
+
+        self.stdout.write(self.style.SUCCESS('Benchmark terminado (los datos sintéticos fueron descartados).'))
+
+    def _medir(self, pedir, pedidos, limpiar):
+        """(pedidos por segundo, consultas por pedido, última respuesta)."""
+        contador = [0]
+
+        def contar(execute, sql, params, many, context):
+            contador[0] += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(contar):
+            inicio = time.perf_counter()
+            for _ in range(pedidos):
+                if limpiar:
+                    cache.clear()
+                respuesta = pedir()
+            segundos = time.perf_counter() - inicio
+        return pedidos / segundos, contador[0] / pedidos, respuesta
@@ -0,0 +1,211 @@
+# hotel/management/commands/benchmark_asgi.py
+import asyncio
+import io
+import random
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from hotel.benchmarks import crear_datos_sinteticos
+from hotel.models import Habitacion
+
+HOST = 'localhost'
+
+
+class Latencia:
+    """execute_wrapper que demora una fracción de las consultas (base lenta o con bloqueos)."""
+
+    def __init__(self, fraccion, milisegundos, semilla):
+        self.fraccion = fraccion
+        self.segundos = milisegundos / 1000
+        self.azar = random.Random(semilla)
+        self.candado = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self.candado:
+            lenta = self.azar.random() < self.fraccion
+        if lenta:
+            time.sleep(self.segundos)
+        return execute(sql, params, many, context)
+
+    def instalar(self, sender, connection, **kwargs):
+        connection.execute_wrappers.append(self)
+
+
+class Command(BaseCommand):
+    help = ('Pedidos por segundo de búsqueda, disponibilidad y reserva bajo WSGI (hilos) y ASGI '
+            '(vistas síncronas y async), con latencias mixtas en la base. Usa una base temporal.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--habitaciones', type=int, default=300,
+                            help='Tamaño del hotel sintético (default: 300)')
+        parser.add_argument('--pedidos', type=int, default=600,
+                            help='Pedidos por medición (default: 600)')
+        parser.add_argument('--hilos', type=int, default=8,
+                            help='Hilos del servidor WSGI simulado (default: 8)')
+        parser.add_argument('--concurrencia', type=int, default=32,
+                            help='Pedidos simultáneos bajo ASGI (default: 32)')
+        parser.add_argument('--fraccion-lenta', type=float, default=0.2,
+                            help='Fracción de consultas demoradas (default: 0.2)')
+        parser.add_argument('--latencia-ms', type=float, default=25,
+                            help='Demora de cada consulta lenta en ms (default: 25)')
+        parser.add_argument('--semilla', type=int, default=42)
+
+    def handle(self, *args, **options):
+        nombre_original = connection.settings_dict['NAME']
+        with tempfile.TemporaryDirectory() as directorio:
+            # Base temporal en archivo: los hilos de los servidores tienen cada uno su
+            # conexión y tienen que ver los datos sintéticos ya confirmados
+            connection.settings_dict['TEST']['NAME'] = str(Path(directorio) / 'benchmark_asgi.sqlite3')
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                with override_settings(DEBUG=False, ALLOWED_HOSTS=[HOST]):
+                    self._medir_todo(options)
+            finally:
+                connections.close_all()
+                connection.creation.destroy_test_db(nombre_original, verbosity=0)
+                cache.clear()
+
+        self.stdout.write(self.style.SUCCESS('Benchmark terminado (la base temporal fue eliminada).'))
+
+    def _medir_todo(self, options):
+        crear_datos_sinteticos(options['habitaciones'])
+        usuario = User.objects.create_user(username='benchmark_asgi', password='benchmark')
+        cliente = Client()
+        cliente.force_login(usuario)
+        sesion = f'sessionid={cliente.cookies["sessionid"].value}'
+        pedidos = self._pedidos(options['pedidos'], sesion, options['semilla'])
+
+        latencia = Latencia(options['fraccion_lenta'], options['latencia_ms'], options['semilla'])
+        connection_created.connect(latencia.instalar)
+        connections.close_all()
+        try:
+            self.stdout.write(
+                f'{options["fraccion_lenta"]:.0%} de las consultas demoran {options["latencia_ms"]:.0f} ms; '
+                f'{len(pedidos)} pedidos (API, disponibles y formulario de reserva)'
+            )
+            self.stdout.write(f'{"modo":<22} | {"paralelo":>8} | {"pedidos/s":>9} | {"p50 ms":>7} | {"p95 ms":>7} | {"errores":>7}')
+            self.stdout.write('-' * 74)
+            modos = [
+                ('WSGI (vistas sync)', options['hilos'], None,
+                 lambda: self._wsgi(pedidos, options['hilos'])),
+                ('ASGI (vistas sync)', options['concurrencia'], None,
+                 lambda: asyncio.run(self._asgi(pedidos, options['concurrencia']))),
+                ('ASGI (vistas async)', options['concurrencia'], 'gestor_hotel.urls_asgi',
+                 lambda: asyncio.run(self._asgi(pedidos, options['concurrencia']))),
+            ]
+            for nombre, paralelo, urlconf, medir in modos:
+                with override_settings(HOTEL_URLCONF_ASGI=urlconf):
+                    cache.clear()
+                    segundos, resultados = medir()
+                duraciones = sorted(duracion for duracion, _ in resultados)
+                errores = sum(1 for _, estado in resultados if estado >= 400)
+                p95 = duraciones[int(len(duraciones) * 0.95) - 1]
+                self.stdout.write(
+                    f'{nombre:<22} | {paralelo:>8} | {len(resultados) / segundos:>9.0f} | '
+                    f'{statistics.median(duraciones) * 1000:>7.1f} | {p95 * 1000:>7.1f} | {errores:>7}'
+                )
+        finally:
+            connection_created.disconnect(latencia.instalar)
+            connections.close_all()
+
+    def _pedidos(self, cantidad, sesion, semilla):
+        """(ruta, consulta, cookie) mezclando lecturas cacheables y páginas que consultan más."""
+        azar = random.Random(semilla)
+        habitacion_ids = list(Habitacion.objects.values_list('pk', flat=True))
+        pedidos = []
+        for _ in range(cantidad):
+            entrada = date.today() + timedelta(days=azar.randint(20, 40))
+            salida = entrada + timedelta(days=azar.randint(1, 4))
+            rango = f'entrada={entrada.isoformat()}&salida={salida.isoformat()}'
+            habitacion = azar.choice(habitacion_ids)
+            pedidos.append(azar.choices([
+                (reverse('api_tipos'), '', None),
+                (reverse('api_disponibilidad'), rango, None),
+                (reverse('api_cotizacion'), f'{rango}&habitacion={habitacion}', None),
+                (reverse('habitaciones_disponibles', args=[entrada.isoformat(), salida.isoformat()]), '', None),
+                (reverse('hacer_reserva_con_fechas', args=[habitacion, entrada.isoformat(), salida.isoformat()]),
+                 '', sesion),
+            ], weights=[2, 4, 3, 2, 1])[0])
+        return pedidos
+
+    def _wsgi(self, pedidos, hilos):
+        """Servidor WSGI con `hilos` hilos: cada pedido ocupa un hilo de principio a fin."""
+        aplicacion = get_wsgi_application()
+
+        def atender(pedido):
+            ruta, consulta, cookie = pedido
+            entorno = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': ruta, 'QUERY_STRING': consulta,
+                'SERVER_NAME': HOST, 'SERVER_PORT': '80', 'HTTP_HOST': HOST,
+                'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(b''), 'wsgi.errors': io.StringIO(),
+            }
+            if cookie:
+                entorno['HTTP_COOKIE'] = cookie
+            estado = []
+            inicio = time.perf_counter()
+            respuesta = aplicacion(entorno, lambda status, headers, exc_info=None: estado.append(int(status[:3])))
+            try:
+                b''.join(respuesta)
+            finally:
+                respuesta.close()
+            return time.perf_counter() - inicio, estado[0]
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=hilos) as servidor:
+            resultados = list(servidor.map(atender, pedidos))
+        return time.perf_counter() - inicio, resultados
+
+    async def _asgi(self, pedidos, concurrencia):
+        """Un event loop atendiendo hasta `concurrencia` pedidos a la vez."""
+        aplicacion = get_asgi_application()
+        semaforo = asyncio.Semaphore(concurrencia)
+
+        async def atender(pedido):
+            ruta, consulta, cookie = pedido
+            cabeceras = [(b'host', HOST.encode())]
+            if cookie:
+                cabeceras.append((b'cookie', cookie.encode()))
+            alcance = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+                'scheme': 'http', 'path': ruta, 'raw_path': ruta.encode(), 'query_string': consulta.encode(),
+                'root_path': '', 'headers': cabeceras, 'server': (HOST, 80), 'client': ('127.0.0.1', 50000),
+            }
+            recibido = False
+
+            async def recibir():
+                nonlocal recibido
+                if not recibido:
+                    recibido = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                # Sin desconexión: Django cancela esta espera al terminar la respuesta
+                await asyncio.Event().wait()
+
+            estado = []
+
+            async def enviar(mensaje):
+                if mensaje['type'] == 'http.response.start':
+                    estado.append(mensaje['status'])
+
+            async with semaforo:
+                inicio = time.perf_counter()
+                await aplicacion(alcance, recibir, enviar)
+                return time.perf_counter() - inicio, estado[0]
+
+        inicio = time.perf_counter()
+        resultados = await asyncio.gather(*(atender(pedido) for pedido in pedidos))
+        return time.perf_counter() - inicio, resultados
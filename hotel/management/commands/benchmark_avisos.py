@@ -0,0 +1,73 @@
+# hotel/management/commands/benchmark_avisos.py
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from hotel import avisos, correos
+from hotel.benchmarks import SMTPLocal, crear_datos_sinteticos, transaccion_descartable
+from hotel.models import CorreoPendiente, Reserva
+
+
+class Command(BaseCommand):
+    help = 'Tiempo y memoria máxima de encolar (y opcionalmente enviar) avisos de llegada'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--avisos', type=int, nargs='+', default=[10000, 50000],
+                            help='Cantidades de reservas con aviso pendiente (default: 10000 50000)')
+        parser.add_argument('--lote', type=int, default=avisos.LOTE,
+                            help=f'Reservas por lote (default: {avisos.LOTE})')
+        parser.add_argument('--enviar', action='store_true',
+                            help='Medir también el envío contra un SMTP local (una conexión)')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{"avisos":>7} | {"lote":>5} | {"encolar s":>9} | {"avisos/s":>8} | '
+                          f'{"memoria máx MB":>14} | {"enviar s":>8}')
+        self.stdout.write('-' * 68)
+        for cantidad in options['avisos']:
+            # Con DEBUG la conexión guarda el SQL de cada consulta (los INSERT de mensajes
+            # son grandes) y eso, no los lotes, dominaría la memoria
+            with override_settings(DEBUG=False), transaccion_descartable():
+                self._crear_reservas(cantidad)
+                tracemalloc.start()
+                inicio = time.perf_counter()
+                encolados = avisos.encolar_avisos('llegada', tamano=options['lote'])
+                segundos = time.perf_counter() - inicio
+                pico = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+                enviar = '-'
+                if options['enviar']:
+                    with SMTPLocal() as smtp, override_settings(**smtp.ajustes(), HOTEL_CORREOS_LOTE=500):
+                        inicio = time.perf_counter()
+                        correos.vaciar()
+                        enviar = f'{time.perf_counter() - inicio:.1f}'
+                    if len(smtp.mensajes) != CorreoPendiente.objects.count() or smtp.conexiones != 1:
+                        self.stderr.write(f'{len(smtp.mensajes)} mensajes por {smtp.conexiones} conexiones')
+
+                self.stdout.write(
+                    f'{encolados:>7} | {options["lote"]:>5} | {segundos:>9.1f} | {encolados / segundos:>8.0f} | '
+                    f'{pico / 1024 / 1024:>14.1f} | {enviar:>8}'
+                )
+
+        self.stdout.write(self.style.SUCCESS('Benchmark terminado (los datos sintéticos fueron descartados).'))
+
+    def _crear_reservas(self, cantidad):
+        """`cantidad` reservas confirmadas que llegan mañana o pasado, de mil clientes distintos."""
+        habitaciones = crear_datos_sinteticos(500, reservas_por_habitacion=0)
+        clientes = User.objects.bulk_create([
+            User(username=f'benchmark_aviso_{i}', email=f'cliente{i}@example.com', first_name=f'Cliente {i}')
+            for i in range(1000)
+        ])
+        manana = date.today() + timedelta(days=1)
+        Reserva.objects.bulk_create([
+            Reserva(
+                cliente=clientes[i % len(clientes)], habitacion=habitaciones[i % len(habitaciones)],
+                fecha_entrada=manana + timedelta(days=i % 2), fecha_salida=manana + timedelta(days=i % 2 + 3),
+                numero_huespedes=1, estado='confirmada', precio_total=habitaciones[i % len(habitaciones)].tipo.precio_por_noche * 3,
+            )
+            for i in range(cantidad)
+        ], batch_size=5000)
@@ -0,0 +1,90 @@
+# hotel/management/commands/benchmark_correos.py
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.mail import EmailMessage
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from hotel import correos
+from hotel.benchmarks import SMTPLocal, crear_datos_sinteticos, transaccion_descartable
+from hotel.models import CorreoPendiente, Reserva
+
+
+class Command(BaseCommand):
+    help = ('Latencia de confirmar una reserva (que encola el correo) frente a enviarlo en el '
+            'pedido, y envíos por segundo del worker, contra un SMTP local con demora')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--demoras', type=float, nargs='+', default=[0, 0.1, 0.5],
+                            help='Demoras del servidor SMTP en segundos, por saludo y por mensaje (default: 0 0.1 0.5)')
+        parser.add_argument('--pedidos', type=int, default=10,
+                            help='Confirmaciones medidas por demora (default: 10)')
+        parser.add_argument('--correos', type=int, default=50,
+                            help='Correos que vacía el worker por demora (default: 50)')
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{"demora SMTP":>11} | {"confirmar (cola) ms":>19} | {"envío en el pedido ms":>21} | '
+            f'{"worker correos/s":>16} | {"uno por conexión/s":>18}'
+        )
+        self.stdout.write('-' * 98)
+        with transaccion_descartable():
+            crear_datos_sinteticos(max(options['pedidos'], 50))
+            admin = User.objects.create_user(username='benchmark_correos', password='x', is_staff=True)
+            cliente = Client()
+            cliente.force_login(admin)
+            for demora in options['demoras']:
+                with SMTPLocal(demora=demora) as smtp, \
+                        override_settings(ALLOWED_HOSTS=['testserver'], **smtp.ajustes()):
+                    fila = [
+                        self._confirmar(cliente, options['pedidos']),
+                        self._envio_directo(options['pedidos']),
+                        *self._worker(options['correos']),
+                    ]
+                self.stdout.write(
+                    f'{demora * 1000:>9.0f}ms | {fila[0]:>19.1f} | {fila[1]:>21.1f} | '
+                    f'{fila[2]:>16.0f} | {fila[3]:>18.0f}'
+                )
+
+        self.stdout.write(self.style.SUCCESS('Benchmark terminado (los datos sintéticos fueron descartados).'))
+
+    def _confirmar(self, cliente, pedidos):
+        """Mediana (ms) de confirmar una reserva desde gestionar_reservas: encola el correo."""
+        tiempos = []
+        reservas = Reserva.objects.filter(estado='pendiente').values_list('pk', flat=True)[:pedidos]
+        for pk in reservas:
+            Reserva.objects.filter(pk=pk).update(estado='pendiente')
+            inicio = time.perf_counter()
+            respuesta = cliente.post(reverse('cambiar_estado_reserva', args=[pk]), {'nuevo_estado': 'confirmada'})
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+            if respuesta.status_code != 302:
+                raise CommandError(f'cambiar_estado_reserva respondió {respuesta.status_code}')
+        return statistics.median(tiempos)
+
+    def _envio_directo(self, pedidos):
+        """Mediana (ms) de lo que sumaba al pedido enviar el correo ahí mismo (conexión nueva)."""
+        tiempos = []
+        for i in range(pedidos):
+            inicio = time.perf_counter()
+            EmailMessage('Confirmación', 'Cuerpo', None, [f'cliente{i}@example.com']).send()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        return statistics.median(tiempos)
+
+    def _worker(self, cantidad):
+        """Correos por segundo del worker (una conexión por lote) y con una conexión por correo."""
+        resultados = []
+        for por_correo in (False, True):
+            CorreoPendiente.objects.all().delete()
+            for i in range(cantidad):
+                correos.encolar(f'cliente{i}@example.com', 'Confirmación', 'Cuerpo')
+            inicio = time.perf_counter()
+            if por_correo:
+                for correo in CorreoPendiente.objects.all():
+                    EmailMessage(correo.asunto, correo.cuerpo, None, [correo.destinatario]).send()
+            else:
+                correos.vaciar()
+            resultados.append(cantidad / (time.perf_counter() - inicio))
+        return resultados
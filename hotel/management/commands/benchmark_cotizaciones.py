@@ -0,0 +1,125 @@
+# hotel/management/commands/benchmark_cotizaciones.py
+import json
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from io import StringIO
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory, override_settings
+
+from hotel import api
+from hotel.benchmarks import transaccion_descartable
+from hotel.models import Habitacion, Reserva, TipoHabitacion
+
+
+class Command(BaseCommand):
+    help = ('Tiempo de cotizar un lote de estadías (tipo o habitación) con POST /api/v1/cotizaciones/ '
+            'frente a las mismas cotizaciones una por una, sobre datos de poblar_datos --escala')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lotes', type=int, nargs='+', default=[100, 1000],
+                            help='Tamaños de lote (default: 100 1000)')
+        parser.add_argument('--pisos', type=int, default=20)
+        parser.add_argument('--habitaciones-por-piso', type=int, default=50)
+        parser.add_argument('--reservas', type=int, default=50000)
+        parser.add_argument('--repeticiones', type=int, default=5,
+                            help='Mediciones por lote; se informa la mediana (default: 5)')
+        parser.add_argument('--semilla', type=int, default=42)
+
+    def handle(self, *args, **options):
+        fabrica = RequestFactory()
+        azar = random.Random(options['semilla'])
+        with override_settings(DEBUG=False), transaccion_descartable():
+            call_command('poblar_datos', escala=True, pisos=options['pisos'],
+                         habitaciones_por_piso=options['habitaciones_por_piso'], reservas=options['reservas'],
+                         desde=date.today() - timedelta(days=180), semilla=options['semilla'], stdout=StringIO())
+            habitacion_ids = list(Habitacion.objects.values_list('pk', flat=True))
+            tipos = list(TipoHabitacion.objects.values_list('nombre', flat=True))
+            self.stdout.write(f'{len(habitacion_ids)} habitaciones, {Reserva.objects.count()} reservas')
+            self.stdout.write(f'{"lote":>5} | {"caché":<8} | {"lote ms":>8} | {"consultas":>9} | '
+                              f'{"una por una ms":>14} | {"consultas":>9}')
+            self.stdout.write('-' * 70)
+
+            for cantidad in options['lotes']:
+                elementos = self._elementos(azar, cantidad, habitacion_ids, tipos)
+                cuerpo = json.dumps({'cotizaciones': elementos})
+
+                def lote():
+                    request = fabrica.post('/api/v1/cotizaciones/', cuerpo, content_type='application/json')
+                    request.user = AnonymousUser()
+                    respuesta = api.cotizaciones(request)
+                    if respuesta.status_code != 200:
+                        raise CommandError(respuesta.content.decode())
+                    return respuesta
+
+                for modo, limpiar in (('fría', True), ('caliente', False)):
+                    tiempos, consultas = [], 0
+                    lote()
+                    for _ in range(options['repeticiones']):
+                        if limpiar:
+                            cache.clear()
+                        segundos, consultas = self._medir(lote)
+                        tiempos.append(segundos)
+                    individual_ms, individual_consultas = ('-', '-')
+                    if limpiar:
+                        individual_ms, individual_consultas = self._una_por_una(fabrica, elementos)
+                    self.stdout.write(
+                        f'{cantidad:>5} | {modo:<8} | {statistics.median(tiempos) * 1000:>8.1f} | {consultas:>9} | '
+                        f'{individual_ms:>14} | {individual_consultas:>9}'
+                    )
+            cache.clear()
+
+        self.stdout.write('(fría: sin tarifario en la caché; una por una: GET /api/v1/cotizacion/ o '
+                          '/api/v1/disponibilidad/ por elemento, sin caché de respuestas)')
+        self.stdout.write(self.style.SUCCESS('Benchmark terminado (los datos sintéticos fueron descartados).'))
+
+    def _elementos(self, azar, cantidad, habitacion_ids, tipos):
+        """Mitad por habitación, mitad por tipo, entradas en los próximos seis meses."""
+        elementos = []
+        for i in range(cantidad):
+            entrada = date.today() + timedelta(days=azar.randint(0, 180))
+            elemento = {
+                'entrada': entrada.isoformat(),
+                'salida': (entrada + timedelta(days=azar.randint(1, 10))).isoformat(),
+                'huespedes': azar.randint(1, 4),
+            }
+            if i % 2:
+                elemento['habitacion'] = azar.choice(habitacion_ids)
+            else:
+                elemento['tipo'] = azar.choice(tipos)
+            elementos.append(elemento)
+        return elementos
+
+    def _medir(self, funcion):
+        contador = [0]
+
+        def contar(execute, sql, params, many, context):
+            contador[0] += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(contar):
+            inicio = time.perf_counter()
+            funcion()
+            return time.perf_counter() - inicio, contador[0]
+
+    def _una_por_una(self, fabrica, elementos):
+        def todas():
+            for elemento in elementos:
+                cache.clear()
+                if 'habitacion' in elemento:
+                    request = fabrica.get('/api/v1/cotizacion/', elemento)
+                    vista = api.cotizacion
+                else:
+                    request = fabrica.get('/api/v1/disponibilidad/', elemento)
+                    vista = api.disponibilidad_rango
+                request.user = AnonymousUser()
+                vista(request)
+
+        segundos, consultas = self._medir(todas)
+        return f'{segundos * 1000:.0f}', consultas
@@ -0,0 +1,59 @@
+# hotel/management/commands/benchmark_disponibilidad.py
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+
+from hotel import disponibilidad, ocupacion
+from hotel.benchmarks import crear_datos_sinteticos, medir, transaccion_descartable
+from hotel.models import Habitacion
+
+
+class Command(BaseCommand):
+    help = 'Compara la búsqueda de disponibilidad por habitación con el servicio basado en conjuntos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--habitaciones', type=int, nargs='+', default=[100, 1000, 10000],
+                            help='Tamaños de hotel a medir (default: 100 1000 10000)')
+        parser.add_argument('--omitir-anterior', action='store_true',
+                            help='No medir el recorrido habitación por habitación (lento con 10k)')
+
+    def handle(self, *args, **options):
+        entrada = date.today() + timedelta(days=14)
+        salida = entrada + timedelta(days=3)
+
+        self.stdout.write(f'Rango consultado: {entrada} → {salida}')
+        self.stdout.write(f'{"habitaciones":>12} | {"método":<22} | {"consultas":>9} | {"ms":>9} | {"libres":>6}')
+        self.stdout.write('-' * 70)
+
+        for n in options['habitaciones']:
+            with transaccion_descartable():
+                crear_datos_sinteticos(n)
+
+                def por_habitacion():
+                    return [h for h in Habitacion.objects.select_related('tipo')
+                            if h.esta_disponible(entrada, salida)]
+
+                def servicio():
+                    tipos = list(disponibilidad.tipos_disponibles(entrada, salida))
+                    return [h for t in tipos for h in t.habitaciones_libres]
+
+                ms_carga, consultas_carga, cal = medir(lambda: ocupacion.construir(date.today(), 730), 1)
+                self.stdout.write(
+                    f'{n:>12} | {"carga calendario bits":<22} | {consultas_carga:>9} | {ms_carga:>9.1f} | {"":>6}'
+                )
+
+                def calendario_bits():
+                    return cal.libres(entrada, salida)
+
+                metodos = [('servicio (conjuntos)', servicio), ('calendario en bits', calendario_bits)]
+                if not options['omitir_anterior']:
+                    metodos.insert(0, ('esta_disponible()', por_habitacion))
+
+                for nombre, funcion in metodos:
+                    repeticiones = 1 if funcion is por_habitacion else 5
+                    ms, consultas, resultado = medir(funcion, repeticiones)
+                    self.stdout.write(
+                        f'{n:>12} | {nombre:<22} | {consultas:>9} | {ms:>9.1f} | {len(resultado):>6}'
+                    )
+
+        self.stdout.write(self.style.SUCCESS('Benchmark terminado (los datos sintéticos fueron descartados).'))
@@ -0,0 +1,58 @@
+# hotel/management/commands/benchmark_portada.py
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory, override_settings
+
+from hotel import views
+from hotel.benchmarks import crear_datos_sinteticos, transaccion_descartable
+
+
+class Command(BaseCommand):
+    help = 'Pedidos por segundo de la página de inicio anónima, sin y con la portada en caché'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--habitaciones', type=int, nargs='+', default=[100, 1000, 10000],
+                            help='Tamaños de hotel a medir (default: 100 1000 10000)')
+        parser.add_argument('--pedidos', type=int, default=200,
+                            help='Pedidos a la portada por medición (default: 200)')
+
+    def handle(self, *args, **options):
+        fabrica = RequestFactory()
+
+        def pedir():
+            request = fabrica.get('/')
+            request.user = AnonymousUser()
+            return views.inicio(request)
+
+        def medir(pedidos):
+            contador = [0]
+
+            def contar(execute, sql, params, many, context):
+                contador[0] += 1
+                return execute(sql, params, many, context)
+
+            pedir()  # calienta la caché (si está habilitada)
+            with connection.execute_wrapper(contar):
+                inicio = time.perf_counter()
+                for _ in range(pedidos):
+                    pedir()
+                segundos = time.perf_counter() - inicio
+            return pedidos / segundos, contador[0] / pedidos
+
+        self.stdout.write(f'{"habitaciones":>12} | {"portada":<14} | {"pedidos/s":>10} | {"consultas/pedido":>16}')
+        self.stdout.write('-' * 62)
+        for n in options['habitaciones']:
+            with transaccion_descartable():
+                crear_datos_sinteticos(n)
+                for nombre, habilitada in (('sin caché', False), ('en caché', True)):
+                    cache.clear()
+                    with override_settings(HOTEL_CACHE_PORTADA=habilitada):
+                        por_segundo, consultas = medir(options['pedidos'])
+                    self.stdout.write(f'{n:>12} | {nombre:<14} | {por_segundo:>10.1f} | {consultas:>16.1f}')
+            cache.clear()
+
+        self.stdout.write(self.style.SUCCESS('Benchmark terminado (los datos sintéticos fueron descartados).'))
@@ -0,0 +1,81 @@
+# hotel/management/commands/benchmark_reportes.py
+import statistics
+import time
+from datetime import date
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory, override_settings
+
+from hotel import reportes, views
+from hotel.benchmarks import transaccion_descartable
+from hotel.models import Reserva
+
+
+class Command(BaseCommand):
+    help = ('Tiempo de recalcular los resúmenes diarios (todo y sólo lo reciente) y de servir el '
+            'reporte de ocupación con varios años de historia de poblar_datos --escala')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--anios', type=int, default=3, help='Años de historia (default: 3)')
+        parser.add_argument('--pisos', type=int, default=20)
+        parser.add_argument('--habitaciones-por-piso', type=int, default=50)
+        parser.add_argument('--reservas', type=int, default=100000)
+        parser.add_argument('--repeticiones', type=int, default=10,
+                            help='Pedidos medidos por vista; se informa la mediana (default: 10)')
+        parser.add_argument('--semilla', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if options['anios'] < 1:
+            raise CommandError('--anios debe ser mayor que cero')
+        hoy = date.today()
+        desde = date(hoy.year - options['anios'] + 1, 1, 1)
+        with override_settings(DEBUG=False), transaccion_descartable():
+            call_command('poblar_datos', escala=True, pisos=options['pisos'],
+                         habitaciones_por_piso=options['habitaciones_por_piso'], reservas=options['reservas'],
+                         desde=desde, dias=(hoy - desde).days + 180, semilla=options['semilla'], stdout=StringIO())
+            self.stdout.write(f'{Reserva.objects.count()} reservas desde {desde}')
+
+            inicio = time.perf_counter()
+            _, _, filas = reportes.actualizar(completo=True)
+            self.stdout.write(f'Resúmenes completos: {filas} filas en {time.perf_counter() - inicio:.2f} s')
+            inicio = time.perf_counter()
+            _, _, filas = reportes.actualizar()
+            self.stdout.write(f'Actualización nocturna (sólo lo reciente): {filas} filas en '
+                              f'{time.perf_counter() - inicio:.2f} s')
+
+            admin = User.objects.create_user(username='benchmark_reportes', is_staff=True)
+            fabrica = RequestFactory()
+            casos = [
+                ('HTML, 12 meses por mes', views.reporte_ocupacion, {}),
+                (f'HTML, {options["anios"]} años por semana', views.reporte_ocupacion,
+                 {'desde': desde.isoformat(), 'agrupar': 'semana', 'anios': options['anios']}),
+                (f'JSON, {options["anios"]} años por día', views.reporte_ocupacion_datos,
+                 {'desde': desde.isoformat(), 'agrupar': 'dia', 'anios': options['anios']}),
+            ]
+            self.stdout.write(f'{"vista":<28} | {"mediana ms":>10} | {"máx ms":>7} | {"consultas":>9}')
+            self.stdout.write('-' * 63)
+            for nombre, vista, parametros in casos:
+                tiempos = []
+                for _ in range(options['repeticiones']):
+                    request = fabrica.get('/reportes/ocupacion/', parametros)
+                    request.user = admin
+                    contador = [0]
+
+                    def contar(execute, sql, params, many, context):
+                        contador[0] += 1
+                        return execute(sql, params, many, context)
+
+                    with connection.execute_wrapper(contar):
+                        inicio = time.perf_counter()
+                        respuesta = vista(request)
+                        tiempos.append(time.perf_counter() - inicio)
+                    if respuesta.status_code != 200:
+                        raise CommandError(f'{nombre}: respuesta {respuesta.status_code}')
+                self.stdout.write(f'{nombre:<28} | {statistics.median(tiempos) * 1000:>10.1f} | '
+                                  f'{max(tiempos) * 1000:>7.1f} | {contador[0]:>9}')
+
+        self.stdout.write(self.style.SUCCESS('Benchmark terminado (los datos sintéticos fueron descartados).'))
@@ -0,0 +1,101 @@
+# hotel/management/commands/benchmark_tarifas.py
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from hotel import tarifas
+from hotel.benchmarks import crear_datos_sinteticos, transaccion_descartable
+from hotel.models import DescuentoEstadia, Tarifa
+
+
+class Command(BaseCommand):
+    help = ('Tiempo de cotizar muchos (habitación, rango) con el tarifario cacheado (vector de '
+            'precios acumulados) frente a aplicar las reglas estadía por estadía')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cotizaciones', type=int, nargs='+', default=[1000, 10000, 100000],
+                            help='Cantidades de (habitación, rango) a cotizar (default: 1000 10000 100000)')
+        parser.add_argument('--temporadas', type=int, default=24,
+                            help='Reglas de temporada en el horizonte, además de fines de semana y fechas (default: 24)')
+        parser.add_argument('--comparar', type=int, default=200,
+                            help='Cotizaciones medidas regla por regla, para comparar (default: 200)')
+        parser.add_argument('--semilla', type=int, default=42)
+
+    def handle(self, *args, **options):
+        azar = random.Random(options['semilla'])
+        with override_settings(DEBUG=False), transaccion_descartable():
+            habitaciones = crear_datos_sinteticos(500, reservas_por_habitacion=0)
+            reglas = self._crear_plan(azar, options['temporadas'])
+            tipo_de = {habitacion.pk: habitacion.tipo_id for habitacion in habitaciones}
+            hoy = date.today()
+
+            cache.clear()
+            inicio = time.perf_counter()
+            tarifario = tarifas.tarifario()
+            armar_ms = (time.perf_counter() - inicio) * 1000
+            self.stdout.write(f'{reglas} reglas; armar el tarifario de {tarifas.dias()} días para '
+                              f'{len(tarifario.acumulados)} tipos: {armar_ms:.1f} ms (una vez por versión y día)')
+
+            # Referencia: las mismas reglas aplicadas sólo sobre las noches de cada estadía
+            muestra = self._rangos(azar, list(tipo_de), hoy, options['comparar'])
+            inicio = time.perf_counter()
+            for habitacion_id, entrada, salida in muestra:
+                tarifas.armar(entrada, (salida - entrada).days, [tipo_de[habitacion_id]]).total(
+                    tipo_de[habitacion_id], entrada, salida)
+            por_estadia_us = (time.perf_counter() - inicio) * 1_000_000 / len(muestra)
+
+            self.stdout.write(f'{"cotizaciones":>12} | {"tarifario ms":>12} | {"µs c/u":>7} | '
+                              f'{"regla por regla ms":>18} | {"aceleración":>11}')
+            self.stdout.write('-' * 73)
+            for cantidad in options['cotizaciones']:
+                rangos = self._rangos(azar, list(tipo_de), hoy, cantidad)
+                inicio = time.perf_counter()
+                tarifario = tarifas.tarifario()
+                totales = [tarifario.total(tipo_de[habitacion_id], entrada, salida)
+                           for habitacion_id, entrada, salida in rangos]
+                segundos = time.perf_counter() - inicio
+                if len(totales) != cantidad:
+                    raise CommandError('Faltan cotizaciones')
+                estimado_ms = por_estadia_us * cantidad / 1000
+                self.stdout.write(
+                    f'{cantidad:>12} | {segundos * 1000:>12.1f} | {segundos * 1_000_000 / cantidad:>7.2f} | '
+                    f'{estimado_ms:>18.0f} | {estimado_ms / (segundos * 1000):>10.0f}x'
+                )
+            self.stdout.write(f'(regla por regla medido sobre {len(muestra)} estadías y extrapolado)')
+        cache.clear()
+
+        self.stdout.write(self.style.SUCCESS('Benchmark terminado (los datos sintéticos fueron descartados).'))
+
+    def _crear_plan(self, azar, temporadas):
+        """Temporadas al azar, recargo de fin de semana, precios fijos por fecha y descuentos por duración."""
+        hoy = date.today()
+        reglas = []
+        for i in range(temporadas):
+            desde = hoy + timedelta(days=azar.randint(0, tarifas.dias() - 30))
+            reglas.append(Tarifa(nombre=f'Temporada {i}', desde=desde, hasta=desde + timedelta(days=azar.randint(7, 60)),
+                                 porcentaje=Decimal(azar.choice([-15, -10, 10, 20, 35]))))
+        reglas.append(Tarifa(nombre='Fin de semana', dias_semana='4,5', porcentaje=Decimal('12'), prioridad=1))
+        for i in range(20):
+            fecha = hoy + timedelta(days=azar.randint(0, tarifas.dias() - 1))
+            reglas.append(Tarifa(nombre=f'Evento {i}', desde=fecha, hasta=fecha,
+                                 precio_por_noche=Decimal(azar.randint(80, 200) * 1000), prioridad=10))
+        Tarifa.objects.bulk_create(reglas)
+        DescuentoEstadia.objects.bulk_create([
+            DescuentoEstadia(nombre='Corta', noches_minimas=3, porcentaje=Decimal('5')),
+            DescuentoEstadia(nombre='Semana', noches_minimas=7, porcentaje=Decimal('12')),
+        ])
+        # bulk_create no emite señales
+        tarifas.invalidar()
+        return len(reglas) + 2
+
+    def _rangos(self, azar, habitacion_ids, hoy, cantidad):
+        rangos = []
+        for _ in range(cantidad):
+            entrada = hoy + timedelta(days=azar.randint(0, 365))
+            rangos.append((azar.choice(habitacion_ids), entrada, entrada + timedelta(days=azar.randint(1, 14))))
+        return rangos
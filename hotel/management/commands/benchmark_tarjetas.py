@@ -0,0 +1,57 @@
+# hotel/management/commands/benchmark_tarjetas.py
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+
+from hotel import views
+from hotel.benchmarks import crear_datos_sinteticos, transaccion_descartable
+
+
+class Command(BaseCommand):
+    help = 'Tiempo de los listados de habitaciones sin y con las tarjetas en caché'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--habitaciones', type=int, nargs='+', default=[1000],
+                            help='Tamaños de hotel a medir (default: 1000)')
+        parser.add_argument('--repeticiones', type=int, default=10,
+                            help='Pedidos por medición con la caché caliente (default: 10)')
+
+    def handle(self, *args, **options):
+        fabrica = RequestFactory()
+        entrada = date.today() + timedelta(days=60)
+        salida = entrada + timedelta(days=2)
+        listados = [
+            ('habitaciones', lambda request: views.lista_habitaciones(request), '/habitaciones/'),
+            ('disponibles', lambda request: views.habitaciones_disponibles(
+                request, entrada.isoformat(), salida.isoformat()), '/disponibles/'),
+        ]
+
+        def ms_por_pedido(vista, ruta, repeticiones):
+            inicio = time.perf_counter()
+            for _ in range(repeticiones):
+                request = fabrica.get(ruta)
+                request.user = AnonymousUser()
+                respuesta = vista(request)
+            return (time.perf_counter() - inicio) * 1000 / repeticiones, len(respuesta.content)
+
+        self.stdout.write(f'{"habitaciones":>12} | {"listado":<12} | {"tarjetas":<16} | {"ms/pedido":>9} | {"KB":>6}')
+        self.stdout.write('-' * 68)
+        for n in options['habitaciones']:
+            with transaccion_descartable():
+                crear_datos_sinteticos(n)
+                for nombre, vista, ruta in listados:
+                    cache.clear()
+                    with override_settings(HOTEL_CACHE_TARJETAS=False):
+                        medidas = [('sin caché', *ms_por_pedido(vista, ruta, options['repeticiones']))]
+                    cache.clear()
+                    medidas.append(('en caché (fría)', *ms_por_pedido(vista, ruta, 1)))
+                    medidas.append(('en caché', *ms_por_pedido(vista, ruta, options['repeticiones'])))
+                    for modo, ms, tamano in medidas:
+                        self.stdout.write(f'{n:>12} | {nombre:<12} | {modo:<16} | {ms:>9.1f} | {tamano / 1024:>6.0f}')
+            cache.clear()
+
+        self.stdout.write(self.style.SUCCESS('Benchmark terminado (los datos sintéticos fueron descartados).'))
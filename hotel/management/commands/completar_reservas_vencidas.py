@@ -0,0 +1,35 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from hotel import vencimientos
+
+
+class Command(BaseCommand):
+    help = ('Marca como completadas las reservas confirmadas cuya fecha de salida ya pasó y '
+            'recalcula el estado de sus habitaciones (programar con cron, o usar --cada)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--completo', action='store_true',
+                            help='Revisar todo el historial, ignorando la marca de la última corrida')
+        parser.add_argument('--cada', type=int, default=None,
+                            help='Quedarse corriendo y repetir cada N segundos (modo worker)')
+
+    def handle(self, *args, **options):
+        if options['cada'] is not None and options['cada'] <= 0:
+            raise CommandError('--cada debe ser mayor que cero')
+        self._correr(options['completo'])
+        while options['cada']:
+            time.sleep(options['cada'])
+            close_old_connections()
+            self._correr(False)
+
+    def _correr(self, completo):
+        desde = None if completo else vencimientos.marca()
+        reservas, habitaciones = vencimientos.completar_vencidas(completo=completo)
+        self.stdout.write(self.style.SUCCESS(
+            f'{date.today()}: {reservas} reservas completadas en {habitaciones} habitaciones'
+            + (f' (salidas desde {desde})' if desde else '')
+        ))
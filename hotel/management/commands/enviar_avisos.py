@@ -0,0 +1,35 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hotel import avisos, correos
+
+
+class Command(BaseCommand):
+    help = ('Encola los avisos a huéspedes: 48 horas antes de la llegada y después de la salida '
+            '(programar con cron; cada reserva recibe cada aviso una sola vez)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tipo', choices=sorted(avisos.AVISOS), action='append',
+                            help='Sólo estos avisos (default: todos)')
+        parser.add_argument('--lote', type=int, default=avisos.LOTE,
+                            help=f'Reservas por lote y transacción (default: {avisos.LOTE})')
+        parser.add_argument('--enviar', action='store_true',
+                            help='Enviar después la bandeja de salida (si no, lo hace el worker enviar_correos)')
+
+    def handle(self, *args, **options):
+        if options['lote'] <= 0:
+            raise CommandError('--lote debe ser mayor que cero')
+        encolados = {
+            tipo: avisos.encolar_avisos(tipo, tamano=options['lote'])
+            for tipo in options['tipo'] or sorted(avisos.AVISOS)
+        }
+        self.stdout.write(self.style.SUCCESS(
+            f'{date.today()}: ' + ', '.join(f'{cantidad} avisos de {tipo}' for tipo, cantidad in encolados.items())
+            + ' encolados'
+        ))
+        if options['enviar']:
+            total = correos.vaciar()
+            self.stdout.write(self.style.SUCCESS(
+                f'{total["enviados"]} enviados, {total["reintentos"]} para reintentar, {total["fallidos"]} fallidos'
+            ))
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils import timezone
+
+from hotel import correos
+
+
+class Command(BaseCommand):
+    help = ('Envía los correos de la bandeja de salida por lotes, con una conexión SMTP '
+            'reutilizada (programar con cron, o usar --cada)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=None,
+                            help='Correos por lote (default: HOTEL_CORREOS_LOTE)')
+        parser.add_argument('--cada', type=int, default=None,
+                            help='Quedarse corriendo y revisar la cola cada N segundos (modo worker)')
+
+    def handle(self, *args, **options):
+        if options['cada'] is not None and options['cada'] <= 0:
+            raise CommandError('--cada debe ser mayor que cero')
+        if options['lote'] is not None and options['lote'] <= 0:
+            raise CommandError('--lote debe ser mayor que cero')
+        self._vaciar(options['lote'])
+        while options['cada']:
+            time.sleep(options['cada'])
+            close_old_connections()
+            self._vaciar(options['lote'])
+
+    def _vaciar(self, lote):
+        total = correos.vaciar(lote)
+        if any(total.values()):
+            self.stdout.write(self.style.SUCCESS(
+                f'{timezone.localtime():%Y-%m-%d %H:%M:%S}: {total["enviados"]} enviados, '
+                f'{total["reintentos"]} para reintentar, {total["fallidos"]} fallidos'
+            ))
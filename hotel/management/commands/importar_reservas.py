@@ -0,0 +1,306 @@
+# hotel/management/commands/importar_reservas.py
+import csv
+import json
+import os
+import sys
+import time
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from hotel import estado_habitaciones, tarifas
+from hotel.indice_reservas import _Intervalos
+from hotel.models import Habitacion, Reserva
+from hotel.signals import cambios_masivos
+
+ESTADOS_ACTIVOS = ('pendiente', 'confirmada')
+ESTADOS_VALIDOS = dict(Reserva.ESTADOS_RESERVA)
+MARGEN_ANUAL = 90  # días de los tarifarios por año después del 31 de diciembre
+COLUMNAS = ['habitacion', 'cliente', 'fecha_entrada', 'fecha_salida', 'numero_huespedes',
+            'estado', 'precio_total', 'comentarios']
+
+
+class Rechazo(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Importa reservas en masa desde CSV o JSON lines. Valida fechas y capacidad, detecta '
+            'solapamientos en memoria (ordenando por habitación y fecha) y escribe con bulk_create '
+            'en transacciones por lote. Las filas rechazadas se guardan en un archivo aparte. '
+            'Conviene correrlo sin reservas entrando en paralelo (p. ej. en una ventana de mantenimiento).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='CSV con encabezado o JSON lines ("-" para stdin)')
+        parser.add_argument('--formato', choices=['csv', 'jsonl'], default=None,
+                            help='Formato de entrada (default: según la extensión)')
+        parser.add_argument('--lote', type=int, default=5000, help='Reservas por transacción')
+        parser.add_argument('--rechazos', default=None,
+                            help='Archivo CSV de filas rechazadas (default: <archivo>.rechazos.csv)')
+        parser.add_argument('--estado', default='pendiente', choices=list(ESTADOS_VALIDOS),
+                            help='Estado de las filas que no traen uno (default: pendiente)')
+        parser.add_argument('--crear-clientes', action='store_true',
+                            help='Crear (sin contraseña utilizable) los clientes que no existan')
+        parser.add_argument('--simular', action='store_true', help='Validar sin escribir nada')
+
+    def handle(self, *args, **options):
+        if options['archivo'] != '-' and not os.path.isfile(options['archivo']):
+            raise CommandError(f"No existe el archivo {options['archivo']}")
+        if options['lote'] < 1:
+            raise CommandError('--lote debe ser mayor que 0')
+        inicio = time.perf_counter()
+        formato = options['formato'] or ('jsonl' if options['archivo'].endswith(('.jsonl', '.ndjson')) else 'csv')
+        ruta_rechazos = options['rechazos'] or (
+            'rechazos.csv' if options['archivo'] == '-' else f"{options['archivo']}.rechazos.csv"
+        )
+
+        self.habitaciones = {
+            numero: (pk, capacidad, tipo_id)
+            for pk, numero, capacidad, tipo_id in Habitacion.objects.values_list(
+                'pk', 'numero', 'tipo__capacidad_maxima', 'tipo_id'
+            )
+        }
+        self.clientes = {}
+        for pk, username, email in User.objects.values_list('pk', 'username', 'email').iterator(chunk_size=5000):
+            self.clientes[username] = pk
+            if email:
+                self.clientes.setdefault(email, pk)
+        self.estado_defecto = options['estado']
+        self.clientes_nuevos = set()
+        # Un tarifario por corrida (y uno por año para las fechas fuera de su horizonte)
+        self.tarifario = tarifas.tarifario()
+        self.tarifarios_por_anio = {}
+
+        with open(ruta_rechazos, 'w', newline='', encoding='utf-8') as salida_rechazos:
+            rechazos = csv.writer(salida_rechazos)
+            rechazos.writerow(['linea', 'motivo'] + COLUMNAS)
+            self.total_rechazadas = 0
+
+            def rechazar(linea, motivo, fila):
+                self.total_rechazadas += 1
+                rechazos.writerow([linea, motivo] + [fila.get(c, '') for c in COLUMNAS])
+
+            # 1) Lectura en streaming y validación fila por fila
+            candidatas = []
+            leidas = 0
+            entrada_archivo = sys.stdin if options['archivo'] == '-' else open(options['archivo'], newline='', encoding='utf-8')
+            try:
+                for linea, fila in self._filas(entrada_archivo, formato):
+                    leidas += 1
+                    try:
+                        candidatas.append(self._validar(linea, fila, options['crear_clientes']))
+                    except Rechazo as motivo:
+                        rechazar(linea, str(motivo), fila)
+            finally:
+                if entrada_archivo is not sys.stdin:
+                    entrada_archivo.close()
+
+            # 2) Solapamientos: barrido por habitación en orden de entrada, contra las reservas
+            #    ya existentes y contra las aceptadas del mismo archivo
+            aceptadas = self._barrer(candidatas, rechazar)
+
+        self.stdout.write(f'Leídas: {leidas} | válidas: {len(aceptadas)} | rechazadas: {self.total_rechazadas}')
+        if self.total_rechazadas:
+            self.stdout.write(self.style.WARNING(f'Filas rechazadas en {ruta_rechazos}'))
+        if options['simular']:
+            self.stdout.write(self.style.SUCCESS(f'Simulación terminada en {time.perf_counter() - inicio:.1f}s (nada escrito).'))
+            return
+
+        # 3) Escritura por lotes
+        self._crear_clientes()
+        creadas = self._escribir(aceptadas, options['lote'])
+        segundos = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f'Importadas {creadas} reservas en {segundos:.1f}s ({creadas / max(segundos, 1e-9):.0f} por segundo).'
+        ))
+
+    # ---- lectura ----
+
+    def _filas(self, archivo, formato):
+        if formato == 'csv':
+            for linea, fila in enumerate(csv.DictReader(archivo), start=2):
+                yield linea, {clave.strip(): (valor or '').strip() for clave, valor in fila.items() if clave}
+            return
+        for linea, texto in enumerate(archivo, start=1):
+            if not texto.strip():
+                continue
+            try:
+                fila = json.loads(texto)
+            except json.JSONDecodeError:
+                fila = {'comentarios': texto.strip()[:200], '_error': 'JSON inválido'}
+            if not isinstance(fila, dict):
+                fila = {'_error': 'La línea no es un objeto JSON'}
+            yield linea, {clave: '' if valor is None else str(valor).strip() for clave, valor in fila.items()}
+
+    def _validar(self, linea, fila, crear_clientes):
+        """Devuelve (habitacion_id, entrada, salida, linea, datos) o lanza Rechazo."""
+        if fila.get('_error'):
+            raise Rechazo(fila['_error'])
+
+        habitacion = self.habitaciones.get(fila.get('habitacion', ''))
+        if habitacion is None:
+            raise Rechazo('Habitación inexistente')
+        habitacion_id, capacidad, tipo_id = habitacion
+
+        cliente = fila.get('cliente', '')
+        if not cliente:
+            raise Rechazo('Falta el cliente')
+        if cliente not in self.clientes:
+            if not crear_clientes:
+                raise Rechazo('Cliente inexistente')
+            self.clientes_nuevos.add(cliente)
+
+        try:
+            entrada = date.fromisoformat(fila.get('fecha_entrada', ''))
+            salida = date.fromisoformat(fila.get('fecha_salida', ''))
+        except ValueError:
+            raise Rechazo('Fecha inválida (se espera AAAA-MM-DD)')
+        if entrada >= salida:
+            raise Rechazo('La fecha de entrada debe ser anterior a la de salida')
+
+        try:
+            huespedes = int(fila.get('numero_huespedes') or 1)
+        except ValueError:
+            raise Rechazo('Número de huéspedes inválido')
+        if huespedes < 1:
+            raise Rechazo('La reserva debe tener al menos 1 huésped')
+        if huespedes > capacidad:
+            raise Rechazo(f'Número de huéspedes ({huespedes}) excede la capacidad ({capacidad})')
+
+        estado = fila.get('estado') or self.estado_defecto
+        if estado not in ESTADOS_VALIDOS:
+            raise Rechazo(f'Estado inválido: {estado}')
+
+        if fila.get('precio_total'):
+            try:
+                precio = Decimal(fila['precio_total']).quantize(Decimal('0.01'))
+            except InvalidOperation:
+                raise Rechazo('Precio inválido')
+        else:
+            # Mismo precio que Reserva.save(): temporadas, días de la semana y descuentos
+            precio = self._precio(tipo_id, entrada, salida)
+
+        datos = (cliente, huespedes, estado, precio, fila.get('comentarios', ''), fila)
+        return habitacion_id, entrada.toordinal(), salida.toordinal(), linea, datos
+
+    def _precio(self, tipo_id, entrada, salida):
+        if self.tarifario.cubre(tipo_id, entrada, salida):
+            return self.tarifario.total(tipo_id, entrada, salida)
+        # Historia o fechas lejanas: el año de la entrada más un margen para las estadías largas
+        tarifario = self.tarifarios_por_anio.get(entrada.year)
+        if tarifario is None:
+            inicio = date(entrada.year, 1, 1)
+            tarifario = self.tarifarios_por_anio[entrada.year] = tarifas.armar(inicio, 366 + MARGEN_ANUAL)
+        return tarifario.total(tipo_id, entrada, salida)
+
+    # ---- solapamientos ----
+
+    def _existentes(self, candidatas):
+        """Intervalos de reservas activas ya guardadas para las habitaciones y fechas del archivo."""
+        activas = [c for c in candidatas if c[4][2] in ESTADOS_ACTIVOS]
+        if not activas:
+            return {}
+        desde = date.fromordinal(min(c[1] for c in activas))
+        hasta = date.fromordinal(max(c[2] for c in activas))
+        habitacion_ids = {c[0] for c in activas}
+
+        reservas = Reserva.objects.filter(estado__in=ESTADOS_ACTIVOS, fecha_entrada__lt=hasta, fecha_salida__gt=desde)
+        if len(habitacion_ids) <= 500:
+            reservas = reservas.filter(habitacion_id__in=habitacion_ids)
+        por_habitacion = {}
+        for habitacion_id, entrada, salida, pk in reservas.values_list(
+            'habitacion_id', 'fecha_entrada', 'fecha_salida', 'pk'
+        ).iterator(chunk_size=5000):
+            if habitacion_id in habitacion_ids:
+                por_habitacion.setdefault(habitacion_id, []).append((entrada.toordinal(), salida.toordinal(), pk))
+        return {habitacion_id: _Intervalos(intervalos) for habitacion_id, intervalos in por_habitacion.items()}
+
+    def _barrer(self, candidatas, rechazar):
+        existentes = self._existentes(candidatas)
+        candidatas.sort(key=lambda c: (c[0], c[1], c[2], c[3]))
+
+        aceptadas = []
+        habitacion_actual, fin_aceptadas = None, None
+        for candidata in candidatas:
+            habitacion_id, entrada, salida, linea, datos = candidata
+            if datos[2] not in ESTADOS_ACTIVOS:
+                aceptadas.append(candidata)
+                continue
+            if habitacion_id != habitacion_actual:
+                habitacion_actual, fin_aceptadas = habitacion_id, None
+            # Ordenadas por entrada: basta con la salida más tardía de las ya aceptadas
+            if fin_aceptadas is not None and entrada < fin_aceptadas:
+                rechazar(linea, 'Se solapa con otra reserva del archivo', datos[5])
+                continue
+            intervalos = existentes.get(habitacion_id)
+            if intervalos is not None and intervalos.hay_solapamiento(entrada, salida):
+                rechazar(linea, 'Se solapa con una reserva existente', datos[5])
+                continue
+            fin_aceptadas = salida if fin_aceptadas is None else max(fin_aceptadas, salida)
+            aceptadas.append(candidata)
+        return aceptadas
+
+    # ---- escritura ----
+
+    def _crear_clientes(self):
+        if not self.clientes_nuevos:
+            return
+        # Contraseña no utilizable: un solo hash para todos, sin costo por usuario
+        sin_clave = make_password(None)
+        User.objects.bulk_create(
+            [User(username=c[:150], email=c if '@' in c else '', password=sin_clave) for c in sorted(self.clientes_nuevos)],
+            batch_size=1000, ignore_conflicts=True,
+        )
+        creados = dict(User.objects.filter(
+            username__in=[c[:150] for c in self.clientes_nuevos]
+        ).values_list('username', 'pk'))
+        for cliente in self.clientes_nuevos:
+            self.clientes[cliente] = creados[cliente[:150]]
+        self.stdout.write(f'Clientes creados: {len(self.clientes_nuevos)}')
+
+    def _escribir(self, aceptadas, tamano_lote):
+        escritas = []
+        pendientes = iter(aceptadas)
+        try:
+            while True:
+                lote = list(islice(pendientes, tamano_lote))
+                if not lote:
+                    break
+                with transaction.atomic():
+                    Reserva.objects.bulk_create([
+                        Reserva(
+                            habitacion_id=habitacion_id,
+                            cliente_id=self.clientes[cliente],
+                            fecha_entrada=date.fromordinal(entrada),
+                            fecha_salida=date.fromordinal(salida),
+                            numero_huespedes=huespedes,
+                            estado=estado,
+                            precio_total=precio,
+                            comentarios=comentarios,
+                        )
+                        for habitacion_id, entrada, salida, _, (cliente, huespedes, estado, precio, comentarios, _) in lote
+                    ], batch_size=1000)
+                escritas.extend(lote)
+                self.stdout.write(f'  {len(escritas)}/{len(aceptadas)} reservas escritas')
+        finally:
+            # También si un lote falla: los anteriores ya están confirmados y estados,
+            # cachés, calendario y marcas de cambio tienen que enterarse de ellos
+            self._avisar_cambios(escritas)
+        return len(escritas)
+
+    def _avisar_cambios(self, escritas):
+        if not escritas:
+            return
+        habitacion_ids = {c[0] for c in escritas}
+        estado_habitaciones.recalcular(habitacion_ids)
+        cambios_masivos.send(
+            sender=Reserva,
+            habitacion_ids=habitacion_ids,
+            desde=date.fromordinal(min(c[1] for c in escritas)),
+            hasta=date.fromordinal(max(c[2] for c in escritas)),
+        )
@@ -1,57 +1,99 @@
 # hotel/management/commands/poblar_datos.py
-from django.core.management.base import BaseCommand
+import random
+import time
+from datetime import date, timedelta
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
-from hotel.models import TipoHabitacion, Habitacion, PerfilUsuario
+from django.db import transaction
+from hotel import estado_habitaciones, tarifas
+from hotel.models import TipoHabitacion, Habitacion, PerfilUsuario, Reserva
+from hotel.signals import cambios_masivos
+
+TIPOS_HABITACION = [
+    {
+        'nombre': 'individual',
+        'descripcion': 'Habitación cómoda para una persona con cama individual y escritorio.',
+        'precio_por_noche': 35000.00,
+        'capacidad_maxima': 1
+    },
+    {
+        'nombre': 'doble',
+        'descripcion': 'Habitación espaciosa con cama matrimonial o dos camas individuales.',
+        'precio_por_noche': 55000.00,
+        'capacidad_maxima': 2
+    },
+    {
+        'nombre': 'suite',
+        'descripcion': 'Suite de lujo con sala de estar separada, cama king size y minibar.',
+        'precio_por_noche': 95000.00,
+        'capacidad_maxima': 2
+    },
+    {
+        'nombre': 'familiar',
+        'descripcion': 'Habitación amplia ideal para familias con múltiples camas y área de estar.',
+        'precio_por_noche': 75000.00,
+        'capacidad_maxima': 4
+    }
+]
+
+# ---- modo escala (--escala) ----
+
+PREFIJO_ESCALA = 'E'
+PREFIJO_USUARIO = 'escala_'
+CLAVE_ESCALA = 'escala123'
+
+# Proporción de cada tipo entre las habitaciones sintéticas
+PESOS_TIPO = {'individual': 25, 'doble': 40, 'suite': 10, 'familiar': 25}
+
+# Largo de estadía (noches) y su frecuencia
+NOCHES = [1, 2, 3, 4, 5, 7, 10, 14]
+PESOS_NOCHES = [22, 28, 20, 11, 7, 7, 3, 2]
+MEDIA_NOCHES = sum(n * p for n, p in zip(NOCHES, PESOS_NOCHES)) / sum(PESOS_NOCHES)
+
+# Días de los tarifarios por año después del 31 de diciembre (como importar_reservas)
+MARGEN_ANUAL = 90
+
+# Demanda relativa por mes (enero a diciembre)
+DEMANDA_MENSUAL = [1.6, 1.7, 1.0, 0.8, 0.7, 0.8, 1.3, 0.8, 1.2, 0.9, 0.9, 1.3]
+
+NOMBRES = ['Juan', 'María', 'José', 'Ana', 'Pedro', 'Camila', 'Diego', 'Valentina', 'Felipe', 'Javiera',
+           'Matías', 'Catalina', 'Tomás', 'Fernanda', 'Benjamín', 'Constanza']
+APELLIDOS = ['González', 'Muñoz', 'Rojas', 'Díaz', 'Pérez', 'Soto', 'Contreras', 'Silva', 'Martínez',
+             'Sepúlveda', 'Morales', 'Rodríguez', 'López', 'Fuentes', 'Hernández', 'Torres']
+CALLES = ['Av. Central', 'Calle Los Aromos', 'Pasaje Las Flores', 'Av. Libertador', 'Calle 1 Sur', 'Calle 2 Norte']
+CIUDADES = ['Talca', 'Santiago', 'Curicó', 'Linares', 'Concepción', 'Valparaíso']
+
 
 class Command(BaseCommand):
-    help = 'Poblar la base de datos con datos iniciales del hotel'
+    help = ('Poblar la base de datos con datos iniciales del hotel. Con --escala genera además '
+            'un hotel sintético grande (pisos, habitaciones, usuarios y reservas) a partir de una semilla')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escala', action='store_true',
+                            help='Generar datos sintéticos en masa en vez de los datos de ejemplo')
+        parser.add_argument('--pisos', type=int, default=10, help='Pisos sintéticos (con --escala)')
+        parser.add_argument('--habitaciones-por-piso', type=int, default=20,
+                            help='Habitaciones por piso (con --escala)')
+        parser.add_argument('--usuarios', type=int, default=500, help='Clientes sintéticos (con --escala)')
+        parser.add_argument('--reservas', type=int, default=10000, help='Reservas sintéticas (con --escala)')
+        parser.add_argument('--dias', type=int, default=730,
+                            help='Días de calendario que ocupan las reservas, desde --desde (con --escala)')
+        parser.add_argument('--desde', type=date.fromisoformat, default=None,
+                            help='Primera fecha de entrada, AAAA-MM-DD (default: hoy menos un año)')
+        parser.add_argument('--semilla', type=int, default=42, help='Semilla: misma semilla, mismos datos')
+        parser.add_argument('--lote', type=int, default=5000, help='Filas por transacción (con --escala)')
 
     def handle(self, *args, **options):
         self.stdout.write(self.style.SUCCESS('INICIANDO POBLADO DE DATOS DEL HOTEL'))
         self.stdout.write('='*60)
 
-        # Crear tipos de habitación
-        tipos_habitacion = [
-            {
-                'nombre': 'individual',
-                'descripcion': 'Habitación cómoda para una persona con cama individual y escritorio.',
-                'precio_por_noche': 35000.00,
-                'capacidad_maxima': 1
-            },
-            {
-                'nombre': 'doble',
-                'descripcion': 'Habitación espaciosa con cama matrimonial o dos camas individuales.',
-                'precio_por_noche': 55000.00,
-                'capacidad_maxima': 2
-            },
-            {
-                'nombre': 'suite',
-                'descripcion': 'Suite de lujo con sala de estar separada, cama king size y minibar.',
-                'precio_por_noche': 95000.00,
-                'capacidad_maxima': 2
-            },
-            {
-                'nombre': 'familiar',
-                'descripcion': 'Habitación amplia ideal para familias con múltiples camas y área de estar.',
-                'precio_por_noche': 75000.00,
-                'capacidad_maxima': 4
-            }
-        ]
-
-        self.stdout.write('\nPASO 1: Creando tipos de habitación...')
-        for tipo_data in tipos_habitacion:
-            tipo, created = TipoHabitacion.objects.get_or_create(
-                nombre=tipo_data['nombre'],
-                defaults=tipo_data
-            )
-            if created:
-                self.stdout.write(
-                    self.style.SUCCESS(f'Tipo "{tipo.get_nombre_display()}" - ${tipo.precio_por_noche}/noche')
-                )
-            else:
-                self.stdout.write(
-                    self.style.WARNING(f'Tipo "{tipo.get_nombre_display()}" ya existe')
-                )
+        self._crear_tipos()
+        if options['escala']:
+            self._poblar_escala(options)
+            return
 
         # Crear habitaciones de ejemplo
         habitaciones_ejemplo = [
@@ -239,4 +281,221 @@ class Command(BaseCommand):
         self.stdout.write('  2. Visitar: http://127.0.0.1:8000')
         self.stdout.write('  3. ¡Probar el sistema con los usuarios creados!')
 
-        self.stdout.write('\n¡El gestor de hotel está listo para usar!')
\ No newline at end of file
+        self.stdout.write('\n¡El gestor de hotel está listo para usar!')
+
+    def _crear_tipos(self):
+        self.stdout.write('\nPASO 1: Creando tipos de habitación...')
+        for tipo_data in TIPOS_HABITACION:
+            tipo, created = TipoHabitacion.objects.get_or_create(
+                nombre=tipo_data['nombre'],
+                defaults=tipo_data
+            )
+            if created:
+                self.stdout.write(
+                    self.style.SUCCESS(f'Tipo "{tipo.get_nombre_display()}" - ${tipo.precio_por_noche}/noche')
+                )
+            else:
+                self.stdout.write(
+                    self.style.WARNING(f'Tipo "{tipo.get_nombre_display()}" ya existe')
+                )
+
+    # ---- modo escala ----
+
+    def _poblar_escala(self, options):
+        pisos, por_piso = options['pisos'], options['habitaciones_por_piso']
+        if not (1 <= pisos <= 9999 and 1 <= por_piso <= 9999):
+            raise CommandError('--pisos y --habitaciones-por-piso deben estar entre 1 y 9999')
+        if options['usuarios'] < 1 or options['dias'] < 1 or options['lote'] < 1:
+            raise CommandError('--usuarios, --dias y --lote deben ser mayores que 0')
+        if options['reservas'] < 0:
+            raise CommandError('--reservas no puede ser negativo')
+        if Habitacion.objects.filter(numero__startswith=PREFIJO_ESCALA).exists():
+            raise CommandError(f'Ya existen habitaciones "{PREFIJO_ESCALA}*" de una corrida anterior: '
+                               'vacíe la base (manage.py flush) antes de generar otra escala.')
+
+        inicio = time.perf_counter()
+        azar = random.Random(options['semilla'])
+        tipos = list(TipoHabitacion.objects.order_by('pk'))
+        desde = options['desde'] or date.today() - timedelta(days=365)
+
+        self.stdout.write(f'\nPASO 2: Creando {pisos * por_piso} habitaciones en {pisos} pisos...')
+        habitaciones = self._crear_habitaciones_escala(azar, tipos, pisos, por_piso, options['lote'])
+
+        self.stdout.write(f'\nPASO 3: Creando {options["usuarios"]} clientes con perfil...')
+        cliente_ids = self._crear_clientes_escala(azar, options['usuarios'], options['lote'])
+
+        self.stdout.write(f'\nPASO 4: Creando {options["reservas"]} reservas...')
+        creadas, rango = self._crear_reservas_escala(
+            azar, habitaciones, cliente_ids, options['reservas'], desde, options['dias'], options['lote']
+        )
+
+        ocupadas = estado_habitaciones.recalcular(h[0] for h in habitaciones)
+        # bulk_create no emite post_save: índice, calendario y cachés se ponen al día aquí
+        cambios_masivos.send(sender=Habitacion, habitacion_ids=None, desde=None, hasta=None)
+
+        segundos = time.perf_counter() - inicio
+        self.stdout.write('\n' + '=' * 60)
+        self.stdout.write(f'Habitaciones: {len(habitaciones)} ({len(ocupadas)} ocupadas hoy) | '
+                          f'clientes: {len(cliente_ids)} | reservas: {creadas}')
+        if rango:
+            self.stdout.write(f'Fechas de las reservas: {rango[0]} a {rango[1]}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Escala generada en {segundos:.1f}s (semilla {options["semilla"]}).'
+        ))
+
+    def _crear_habitaciones_escala(self, azar, tipos, pisos, por_piso, tamano_lote):
+        """Devuelve [(pk, tipo_id, capacidad_maxima)] en orden de número."""
+        pesos = [PESOS_TIPO.get(tipo.nombre, 1) for tipo in tipos]
+        nuevas = []
+        for piso in range(1, pisos + 1):
+            for n in range(1, por_piso + 1):
+                tipo = azar.choices(tipos, pesos)[0]
+                nuevas.append(Habitacion(
+                    numero=f'{PREFIJO_ESCALA}{piso}-{n}', tipo=tipo, piso=piso,
+                    descripcion=f'{tipo.get_nombre_display()} sintética del piso {piso}',
+                ))
+        for i in range(0, len(nuevas), tamano_lote):
+            with transaction.atomic():
+                Habitacion.objects.bulk_create(nuevas[i:i + tamano_lote], batch_size=1000)
+
+        ids = dict(Habitacion.objects.filter(numero__startswith=PREFIJO_ESCALA).values_list('numero', 'pk'))
+        return [(ids[h.numero], h.tipo_id, h.tipo.capacidad_maxima) for h in nuevas]
+
+    def _crear_clientes_escala(self, azar, cantidad, tamano_lote):
+        # Un solo hash para todos: PBKDF2 por usuario tomaría minutos con miles de clientes
+        clave = make_password(CLAVE_ESCALA)
+        usuarios = [
+            User(
+                username=f'{PREFIJO_USUARIO}{i:07d}',
+                first_name=azar.choice(NOMBRES),
+                last_name=f'{azar.choice(APELLIDOS)} {azar.choice(APELLIDOS)}',
+                email=f'{PREFIJO_USUARIO}{i:07d}@escala.hotel',
+                password=clave,
+            )
+            for i in range(cantidad)
+        ]
+        for i in range(0, cantidad, tamano_lote):
+            with transaction.atomic():
+                User.objects.bulk_create(usuarios[i:i + tamano_lote], batch_size=1000, ignore_conflicts=True)
+
+        cliente_ids = list(User.objects.filter(
+            username__startswith=PREFIJO_USUARIO
+        ).order_by('username').values_list('pk', flat=True))
+        con_perfil = set(PerfilUsuario.objects.filter(
+            usuario__username__startswith=PREFIJO_USUARIO
+        ).values_list('usuario_id', flat=True))
+        perfiles = []
+        for i, pk in enumerate(cliente_ids):
+            # Se sortea aunque el perfil exista, para que la semilla dé siempre las mismas reservas
+            perfil = PerfilUsuario(
+                usuario_id=pk,
+                telefono=f'+56 9 {azar.randrange(10000):04d} {azar.randrange(10000):04d}',
+                cedula=f'{10_000_000 + i}-{azar.choice("0123456789K")}',
+                direccion=f'{azar.choice(CALLES)} {azar.randint(1, 2999)}, {azar.choice(CIUDADES)}',
+            )
+            if pk not in con_perfil:
+                perfiles.append(perfil)
+        for i in range(0, len(perfiles), tamano_lote):
+            with transaction.atomic():
+                PerfilUsuario.objects.bulk_create(perfiles[i:i + tamano_lote], batch_size=1000)
+        self.stdout.write(f'  Contraseña de los clientes sintéticos: {CLAVE_ESCALA}')
+        return cliente_ids
+
+    def _crear_reservas_escala(self, azar, habitaciones, cliente_ids, cantidad, desde, dias, tamano_lote):
+        """Escribe las reservas por lotes. Devuelve (creadas, rango de fechas)."""
+        hoy = date.today().toordinal()
+        precios = Precios()
+        primera, ultima = None, None
+        creadas = 0
+        reservas = generar_reservas(azar, habitaciones, len(cliente_ids), cantidad, desde.toordinal(), dias)
+        while True:
+            lote = []
+            for habitacion_id, tipo_id, cliente, entrada, salida, huespedes in islice(reservas, tamano_lote):
+                estado = _estado(azar, entrada, salida, hoy)
+                primera = entrada if primera is None else min(primera, entrada)
+                ultima = salida if ultima is None else max(ultima, salida)
+                fecha_entrada, fecha_salida = date.fromordinal(entrada), date.fromordinal(salida)
+                lote.append(Reserva(
+                    habitacion_id=habitacion_id,
+                    cliente_id=cliente_ids[cliente],
+                    fecha_entrada=fecha_entrada,
+                    fecha_salida=fecha_salida,
+                    numero_huespedes=huespedes,
+                    estado=estado,
+                    # Mismo precio que Reserva.save(): temporadas, días de la semana y descuentos
+                    precio_total=precios.total(tipo_id, fecha_entrada, fecha_salida),
+                ))
+            if not lote:
+                break
+            with transaction.atomic():
+                Reserva.objects.bulk_create(lote, batch_size=1000)
+            creadas += len(lote)
+            self.stdout.write(f'  {creadas}/{cantidad} reservas escritas')
+        rango = (date.fromordinal(primera), date.fromordinal(ultima)) if creadas else None
+        return creadas, rango
+
+
+class Precios:
+    """
+    Precios del plan de tarifas para las reservas sintéticas. Usa el tarifario vigente y,
+    para la historia (--desde en el pasado) o fechas lejanas, uno por año de entrada.
+    """
+
+    def __init__(self):
+        self.tarifario = tarifas.tarifario()
+        self.por_anio = {}
+
+    def total(self, tipo_id, entrada, salida):
+        if self.tarifario.cubre(tipo_id, entrada, salida):
+            return self.tarifario.total(tipo_id, entrada, salida)
+        tarifario = self.por_anio.get(entrada.year)
+        if tarifario is None:
+            inicio = date(entrada.year, 1, 1)
+            tarifario = self.por_anio[entrada.year] = tarifas.armar(inicio, 366 + MARGEN_ANUAL)
+        return tarifario.total(tipo_id, entrada, salida)
+
+
+def temporada(dia):
+    """Factor de demanda del día (ordinal): temporadas altas en verano, invierno y Fiestas Patrias."""
+    fecha = date.fromordinal(dia)
+    factor = DEMANDA_MENSUAL[fecha.month - 1]
+    # Entradas de viernes y sábado más frecuentes
+    return factor * 1.4 if fecha.weekday() in (4, 5) else factor
+
+
+def generar_reservas(azar, habitaciones, clientes, cantidad, desde, dias):
+    """
+    Genera (habitacion_id, tipo_id, índice de cliente, entrada, salida, huéspedes) con fechas
+    en ordinales. Cada habitación recibe su cuota y se recorre su calendario hacia adelante:
+    una estadía empieza después de la salida de la anterior, así que no hay solapamientos.
+    Los huecos entre estadías se achican en temporada alta y se estiran en temporada baja.
+    """
+    if not habitaciones:
+        return
+    base, resto = divmod(cantidad, len(habitaciones))
+    for posicion, (habitacion_id, tipo_id, capacidad) in enumerate(habitaciones):
+        cuota = base + (1 if posicion < resto else 0)
+        if not cuota:
+            continue
+        # Días de calendario por reserva que le tocan a esta habitación
+        espacio = dias / cuota
+        dia = desde + int(azar.random() * min(espacio, 7))
+        for _ in range(cuota):
+            noches = min(azar.choices(NOCHES, PESOS_NOCHES)[0], max(int(espacio), 1))
+            libre = max(espacio - MEDIA_NOCHES, 0)
+            if libre:
+                dia += int(azar.expovariate(temporada(dia) / libre))
+            # Clientes frecuentes: los primeros índices aparecen más seguido
+            cliente = int(clientes * azar.random() ** 2)
+            huespedes = azar.randint(1, capacidad)
+            yield habitacion_id, tipo_id, cliente, dia, dia + noches, huespedes
+            dia += noches
+
+
+def _estado(azar, entrada, salida, hoy):
+    sorteo = azar.random()
+    if salida <= hoy:
+        return 'cancelada' if sorteo < 0.05 else 'completada'
+    if sorteo < 0.08:
+        return 'cancelada'
+    return 'pendiente' if sorteo < 0.3 and entrada > hoy else 'confirmada'
@@ -0,0 +1,22 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from hotel import estado_habitaciones
+
+
+class Command(BaseCommand):
+    help = ('Recalcula el estado (ocupada/disponible) de todas las habitaciones según sus reservas. '
+            'Pensado para correr cada noche, después del cambio de día')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hoy', type=date.fromisoformat, default=None,
+                            help='Fecha a considerar como hoy, AAAA-MM-DD (default: hoy)')
+
+    def handle(self, *args, **options):
+        cambios = estado_habitaciones.recalcular(hoy=options['hoy'])
+        ocupadas = sum(1 for estado in cambios.values() if estado == 'ocupada')
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(cambios)} habitaciones cambiaron de estado '
+            f'({ocupadas} a ocupada, {len(cambios) - ocupadas} a disponible)'
+        ))
@@ -0,0 +1,127 @@
+# hotel/management/commands/stress_reservas.py
+import multiprocessing
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from decimal import Decimal
+
+import django
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from hotel.models import Habitacion, Reserva, TipoHabitacion
+from hotel.reservas import crear_reserva, reservas_solapadas
+
+PREFIJO = 'ST'
+USUARIO = 'stress_cliente'
+
+
+def generar_pedidos(cantidad, habitacion_ids, dias, semilla):
+    """Pedidos (habitacion_id, entrada, salida) con muchas colisiones a propósito."""
+    azar = random.Random(semilla)
+    inicio = date.today() + timedelta(days=1)
+    pedidos = []
+    for _ in range(cantidad):
+        entrada = inicio + timedelta(days=azar.randrange(dias))
+        pedidos.append((azar.choice(habitacion_ids), entrada, entrada + timedelta(days=azar.randint(1, 4))))
+    return pedidos
+
+
+def ejecutar_pedidos(pedidos, hilos):
+    """Ejecuta los pedidos con `hilos` hilos (cada uno con su conexión). Devuelve los conteos."""
+    habitaciones = {h.pk: h for h in Habitacion.objects.select_related('tipo').filter(pk__in={p[0] for p in pedidos})}
+    cliente = User.objects.get(username=USUARIO)
+
+    def reservar(pedido):
+        habitacion_id, entrada, salida = pedido
+        try:
+            crear_reserva(habitaciones[habitacion_id], cliente, entrada, salida)
+            return 'creadas'
+        except ValidationError:
+            return 'rechazadas'
+        except Exception:
+            return 'errores'
+        finally:
+            connection.close()
+
+    conteo = {'creadas': 0, 'rechazadas': 0, 'errores': 0}
+    with ThreadPoolExecutor(max_workers=hilos) as ejecutor:
+        for resultado in ejecutor.map(reservar, pedidos):
+            conteo[resultado] += 1
+    return conteo
+
+
+def _proceso(args):
+    pedidos, hilos = args
+    try:
+        return ejecutar_pedidos(pedidos, hilos)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = ('Dispara miles de reservas concurrentes (hilos y procesos) contra la base configurada '
+            'y verifica que no quede ninguna reserva solapada')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reservas', type=int, default=2000, help='Pedidos de reserva a disparar')
+        parser.add_argument('--hilos', type=int, default=16, help='Hilos por proceso')
+        parser.add_argument('--procesos', type=int, default=1, help='Procesos (cada uno con sus hilos)')
+        parser.add_argument('--habitaciones', type=int, default=20, help='Habitaciones sintéticas')
+        parser.add_argument('--dias', type=int, default=60, help='Días del rango de fechas de entrada')
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--conservar', action='store_true',
+                            help='No borrar las habitaciones y reservas sintéticas al terminar')
+
+    def handle(self, *args, **options):
+        if Habitacion.objects.filter(numero__startswith=PREFIJO).exists():
+            raise CommandError(f'Ya existen habitaciones "{PREFIJO}*": borrelas o revise una corrida anterior.')
+
+        tipo, _ = TipoHabitacion.objects.get_or_create(
+            nombre='doble', defaults={'precio_por_noche': Decimal('50000.00'), 'capacidad_maxima': 2}
+        )
+        User.objects.get_or_create(username=USUARIO)
+        # Una por una (no bulk_create) para que las señales mantengan índice y cachés
+        habitacion_ids = [
+            Habitacion.objects.create(numero=f'{PREFIJO}{i:05d}', tipo=tipo, piso=1).pk
+            for i in range(options['habitaciones'])
+        ]
+
+        pedidos = generar_pedidos(options['reservas'], habitacion_ids, options['dias'], options['semilla'])
+        self.stdout.write(
+            f'{len(pedidos)} pedidos sobre {len(habitacion_ids)} habitaciones, '
+            f'{options["procesos"]} proceso(s) × {options["hilos"]} hilo(s)'
+        )
+
+        try:
+            inicio = time.perf_counter()
+            if options['procesos'] > 1:
+                partes = [(pedidos[i::options['procesos']], options['hilos']) for i in range(options['procesos'])]
+                connections.close_all()
+                # spawn: cada proceso arranca Django (django.setup) antes de recibir su parte
+                with multiprocessing.get_context('spawn').Pool(options['procesos'], initializer=django.setup) as pool:
+                    resultados = pool.map(_proceso, partes)
+                conteo = {clave: sum(r[clave] for r in resultados) for clave in resultados[0]}
+            else:
+                conteo = ejecutar_pedidos(pedidos, options['hilos'])
+            segundos = time.perf_counter() - inicio
+
+            sinteticas = Reserva.objects.filter(habitacion__numero__startswith=PREFIJO)
+            solapadas = reservas_solapadas(sinteticas).count()
+            en_bd = sinteticas.filter(estado__in=('pendiente', 'confirmada')).count()
+
+            self.stdout.write(
+                f'creadas={conteo["creadas"]} rechazadas={conteo["rechazadas"]} errores={conteo["errores"]} '
+                f'en base={en_bd} | {segundos:.1f}s, {len(pedidos) / segundos:.0f} pedidos/s'
+            )
+        finally:
+            if not options['conservar']:
+                Reserva.objects.filter(habitacion__numero__startswith=PREFIJO).delete()
+                Habitacion.objects.filter(numero__startswith=PREFIJO).delete()
+
+        if solapadas or conteo['creadas'] != en_bd:
+            raise CommandError(f'{solapadas} reservas solapadas (creadas={conteo["creadas"]}, en base={en_bd})')
+        self.stdout.write(self.style.SUCCESS('Sin reservas solapadas.'))
@@ -0,0 +1,29 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+
+class RutasAsgi:
+    """
+    En los pedidos que llegan por ASGI (uvicorn, ver README) resuelve las rutas con
+    HOTEL_URLCONF_ASGI, que manda la búsqueda, la disponibilidad y la reserva a sus vistas
+    async. Bajo WSGI la cadena de middleware es síncrona y sigue mandando ROOT_URLCONF.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.urlconf = getattr(settings, 'HOTEL_URLCONF_ASGI', None)
+        self.es_async = iscoroutinefunction(get_response)
+        if self.es_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.es_async:
+            return self._acall(request)
+        return self.get_response(request)
+
+    async def _acall(self, request):
+        if self.urlconf:
+            request.urlconf = self.urlconf
+        return await self.get_response(request)
@@ -0,0 +1,37 @@
+# Restricción de exclusión contra reservas solapadas (sólo PostgreSQL).
+#
+# En otras bases la garantía la dan Reserva.save() y reservas.py (bloqueo de la
+# habitación o BEGIN IMMEDIATE en SQLite); en PostgreSQL además la base rechaza
+# dos reservas activas de la misma habitación con rangos que se cruzan.
+
+from django.db import migrations
+
+CREAR = """
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+ALTER TABLE hotel_reserva ADD CONSTRAINT reserva_sin_solapamiento
+    EXCLUDE USING gist (habitacion_id WITH =, daterange(fecha_entrada, fecha_salida) WITH &&)
+    WHERE (estado IN ('pendiente', 'confirmada'));
+"""
+
+ELIMINAR = "ALTER TABLE hotel_reserva DROP CONSTRAINT IF EXISTS reserva_sin_solapamiento;"
+
+
+def crear_restriccion(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREAR)
+
+
+def eliminar_restriccion(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(ELIMINAR)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0003_alter_habitacion_options_alter_perfilusuario_options_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_restriccion, eliminar_restriccion),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.5 on 2026-10-17 17:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0005_reserva_sin_solapamiento'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarcaTarea',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=50, unique=True)),
+                ('fecha', models.DateField()),
+                ('actualizada', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Marca de tarea',
+                'verbose_name_plural': 'Marcas de tareas',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['estado', 'fecha_salida'], name='hotel_reser_estado_b254a6_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-17 17:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0006_marca_tarea'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['fecha_reserva', 'id'], name='hotel_reser_fecha_r_a7a6a5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['fecha_entrada'], name='hotel_reser_fecha_e_94bb90_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-17 17:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0007_reserva_indices_listado'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['cliente', 'fecha_entrada'], name='hotel_reser_cliente_12e1f8_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.5 on 2026-10-17 17:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0008_reserva_cliente_fecha_entrada'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarcaCambio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=10, unique=True)),
+                ('actualizada', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Marca de cambio',
+                'verbose_name_plural': 'Marcas de cambios',
+            },
+        ),
+    ]
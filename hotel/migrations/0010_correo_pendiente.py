@@ -0,0 +1,35 @@
+# Generated by Django 5.2.5 on 2026-10-17 17:59
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0009_marca_cambio'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CorreoPendiente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('destinatario', models.EmailField(max_length=254)),
+                ('asunto', models.CharField(max_length=255)),
+                ('cuerpo', models.TextField()),
+                ('remitente', models.CharField(blank=True, max_length=255)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('enviado', 'Enviado'), ('fallido', 'Fallido')], default='pendiente', max_length=20)),
+                ('intentos', models.PositiveIntegerField(default=0)),
+                ('proximo_intento', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ultimo_error', models.TextField(blank=True)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('enviado', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Correo pendiente',
+                'verbose_name_plural': 'Correos pendientes',
+                'indexes': [models.Index(fields=['estado', 'proximo_intento'], name='hotel_corre_estado_fa5452_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-17 18:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0010_correo_pendiente'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reserva',
+            name='aviso_llegada',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reserva',
+            name='aviso_salida',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['estado', 'fecha_entrada'], name='hotel_reser_estado_efa441_idx'),
+        ),
+    ]
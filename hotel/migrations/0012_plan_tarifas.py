@@ -0,0 +1,51 @@
+# Generated by Django 5.2.5 on 2026-10-17 18:21
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0011_avisos_reserva'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DescuentoEstadia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100)),
+                ('noches_minimas', models.PositiveIntegerField()),
+                ('porcentaje', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('activo', models.BooleanField(default=True)),
+                ('tipo', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='descuentos_estadia', to='hotel.tipohabitacion')),
+            ],
+            options={
+                'verbose_name': 'Descuento por estadía',
+                'verbose_name_plural': 'Descuentos por estadía',
+                'ordering': ['noches_minimas'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Tarifa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100)),
+                ('desde', models.DateField(blank=True, null=True)),
+                ('hasta', models.DateField(blank=True, help_text='Última noche incluida', null=True)),
+                ('dias_semana', models.CharField(blank=True, help_text='Noches a las que aplica (0=lunes ... 6=domingo), separadas por coma; vacío: todas', max_length=20)),
+                ('precio_por_noche', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('porcentaje', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=6)),
+                ('prioridad', models.IntegerField(default=0)),
+                ('activa', models.BooleanField(default=True)),
+                ('tipo', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='tarifas', to='hotel.tipohabitacion')),
+            ],
+            options={
+                'verbose_name': 'Tarifa',
+                'verbose_name_plural': 'Tarifas',
+                'ordering': ['prioridad', 'id'],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-17 18:33
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0012_plan_tarifas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('habitaciones', models.PositiveIntegerField(default=0)),
+                ('vendidas', models.PositiveIntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('llegadas', models.PositiveIntegerField(default=0)),
+                ('tipo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes', to='hotel.tipohabitacion')),
+            ],
+            options={
+                'verbose_name': 'Resumen diario',
+                'verbose_name_plural': 'Resúmenes diarios',
+                'ordering': ['fecha', 'tipo'],
+                'indexes': [models.Index(fields=['fecha'], name='hotel_resum_fecha_f61d27_idx')],
+                'constraints': [models.UniqueConstraint(fields=('tipo', 'fecha'), name='resumen_tipo_fecha_unico')],
+            },
+        ),
+    ]
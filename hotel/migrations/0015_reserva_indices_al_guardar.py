@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-17 19:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0014_reserva_cliente_fecha_salida'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='reserva',
+            name='hotel_reser_estado_b95b96_idx',
+        ),
+        migrations.AlterField(
+            model_name='reserva',
+            name='cliente',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='reserva',
+            name='habitacion',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='hotel.habitacion'),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['habitacion', 'fecha_salida'], name='hotel_reser_habitac_24b8f6_idx'),
+        ),
+    ]
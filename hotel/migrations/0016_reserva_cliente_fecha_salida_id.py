@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-17 19:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0015_reserva_indices_al_guardar'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='reserva',
+            name='hotel_reser_cliente_12e1f8_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='reserva',
+            name='hotel_reser_cliente_a84c8c_idx',
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['cliente', 'fecha_salida', 'id'], name='hotel_reser_cliente_bbb7f7_idx'),
+        ),
+    ]
@@ -1,10 +1,14 @@
 from decimal import Decimal
-from django.db import models, transaction
+from django.db import IntegrityError, models, transaction
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from datetime import date
 
+from . import estado_habitaciones, tarifas
+from .al_confirmar import agrupadas
+from .indice_reservas import indice as indice_reservas
+
 class TipoHabitacion(models.Model):
     TIPOS_HABITACION = [
         ('individual', 'Individual'),
@@ -29,6 +33,82 @@ class TipoHabitacion(models.Model):
         return self.get_nombre_display()
 
 
+class Tarifa(models.Model):
+    """
+    Regla del plan de tarifas (ver tarifas.py) sobre el precio de cada noche de un tipo,
+    o de todos si no tiene tipo. Las reglas que tocan una noche se aplican de menor a
+    mayor prioridad: `precio_por_noche` reemplaza el precio que venía y `porcentaje` lo
+    ajusta (+25 recarga, -10 descuento). Una temporada es un rango con porcentaje o precio;
+    el recargo de fin de semana, una regla con dias_semana "4,5" (noches de viernes y
+    sábado); el precio fijo de una fecha, una regla de un día con prioridad alta.
+    """
+    nombre = models.CharField(max_length=100)
+    tipo = models.ForeignKey(TipoHabitacion, on_delete=models.CASCADE, null=True, blank=True,
+                             related_name='tarifas')
+    desde = models.DateField(null=True, blank=True)
+    hasta = models.DateField(null=True, blank=True, help_text='Última noche incluida')
+    dias_semana = models.CharField(max_length=20, blank=True,
+                                   help_text='Noches a las que aplica (0=lunes ... 6=domingo), '
+                                             'separadas por coma; vacío: todas')
+    precio_por_noche = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    porcentaje = models.DecimalField(max_digits=6, decimal_places=2, default=Decimal('0'))
+    prioridad = models.IntegerField(default=0)
+    activa = models.BooleanField(default=True)
+
+    class Meta:
+        verbose_name = "Tarifa"
+        verbose_name_plural = "Tarifas"
+        ordering = ['prioridad', 'id']
+
+    def __str__(self):
+        return self.nombre
+
+    def dias(self):
+        """Días de la semana (0=lunes) a los que aplica, o None si son todos."""
+        if not self.dias_semana.strip():
+            return None
+        return {int(dia) for dia in self.dias_semana.split(',') if dia.strip()}
+
+    def clean(self):
+        if self.desde and self.hasta and self.desde > self.hasta:
+            raise ValidationError("La fecha de inicio debe ser anterior o igual a la de fin.")
+        try:
+            dias = self.dias()
+        except ValueError:
+            raise ValidationError("Los días de la semana deben ser números separados por coma.")
+        if dias and not dias <= set(range(7)):
+            raise ValidationError("Los días de la semana van de 0 (lunes) a 6 (domingo).")
+        if self.precio_por_noche is None and not self.porcentaje:
+            raise ValidationError("Indique un precio por noche o un porcentaje.")
+        if self.porcentaje is not None and self.porcentaje <= -100:
+            raise ValidationError("El porcentaje no puede bajar el precio a cero o menos.")
+
+
+class DescuentoEstadia(models.Model):
+    """
+    Descuento por duración: a partir de `noches_minimas` noches el total de la estadía
+    baja `porcentaje` por ciento. Si aplican varios se usa el mayor (ver tarifas.py).
+    """
+    nombre = models.CharField(max_length=100)
+    tipo = models.ForeignKey(TipoHabitacion, on_delete=models.CASCADE, null=True, blank=True,
+                             related_name='descuentos_estadia')
+    noches_minimas = models.PositiveIntegerField()
+    porcentaje = models.DecimalField(max_digits=5, decimal_places=2)
+    activo = models.BooleanField(default=True)
+
+    class Meta:
+        verbose_name = "Descuento por estadía"
+        verbose_name_plural = "Descuentos por estadía"
+        ordering = ['noches_minimas']
+
+    def __str__(self):
+        return f"{self.nombre} ({self.porcentaje}% desde {self.noches_minimas} noches)"
+
+    def clean(self):
+        if self.porcentaje is not None and not 0 < self.porcentaje < 100:
+            raise ValidationError("El descuento debe estar entre 0 y 100%.")
+
+
 class Habitacion(models.Model):
     ESTADOS = [
         ('disponible', 'Disponible'),
@@ -68,8 +148,20 @@ class Habitacion(models.Model):
         if self.estado != 'disponible':
             return False
 
+        # Anotada por disponibilidad.listado_habitaciones(): sin consultas
+        if not fecha_entrada and not fecha_salida and hasattr(self, 'tiene_reservas_activas'):
+            return not self.tiene_reservas_activas
+
         hoy = date.today()
 
+        # Con el índice en memoria activo, el solapamiento se resuelve sin SQL
+        if indice_reservas.usable_para(self.pk):
+            if not fecha_entrada or not fecha_salida:
+                return not indice_reservas.tiene_reservas_activas(self.pk, hoy)
+            if fecha_entrada >= fecha_salida:
+                return False
+            return not indice_reservas.hay_conflicto(self.pk, fecha_entrada, fecha_salida)
+
         if not fecha_entrada or not fecha_salida:
             reservas_activas = self.reservas.filter(
                 estado__in=['pendiente', 'confirmada'],
@@ -89,6 +181,10 @@ class Habitacion(models.Model):
         return not reservas_conflicto.exists()
 
     def proximas_reservas(self, limite=3):
+        # Precargadas por disponibilidad.listado_habitaciones(proximas=...)
+        precargadas = getattr(self, 'proximas_activas', None)
+        if precargadas is not None:
+            return precargadas[:limite]
         return self.reservas.filter(
             estado__in=['pendiente', 'confirmada'],
             fecha_entrada__gte=date.today()
@@ -103,6 +199,9 @@ class Habitacion(models.Model):
         ).first()
 
 
+RESTRICCION_SIN_SOLAPAMIENTO = 'reserva_sin_solapamiento'
+
+
 class Reserva(models.Model):
     ESTADOS_RESERVA = [
         ('pendiente', 'Pendiente'),
@@ -111,8 +210,10 @@ class Reserva(models.Model):
         ('completada', 'Completada'),
     ]
 
-    cliente = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reservas')
-    habitacion = models.ForeignKey(Habitacion, on_delete=models.CASCADE, related_name='reservas')
+    # Sin índice propio: los compuestos que empiezan por cliente y por habitación (Meta) ya
+    # sirven esas búsquedas, y cada índice de más es una escritura más en cada save()
+    cliente = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reservas', db_index=False)
+    habitacion = models.ForeignKey(Habitacion, on_delete=models.CASCADE, related_name='reservas', db_index=False)
     fecha_entrada = models.DateField()
     fecha_salida = models.DateField()
     numero_huespedes = models.PositiveIntegerField()
@@ -120,6 +221,9 @@ class Reserva(models.Model):
     precio_total = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
     fecha_reserva = models.DateTimeField(auto_now_add=True)
     comentarios = models.TextField(blank=True)
+    # Avisos por correo ya encolados (avisos.py): una corrida no repite los de otra
+    aviso_llegada = models.DateTimeField(null=True, blank=True)
+    aviso_salida = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         verbose_name = "Reserva"
@@ -127,114 +231,256 @@ class Reserva(models.Model):
         ordering = ['-fecha_reserva']
         indexes = [
             models.Index(fields=['habitacion', 'fecha_entrada', 'fecha_salida']),
-            models.Index(fields=['estado']),
+            # Validación de solapamiento al guardar (Reserva._hay_solapamiento)
+            models.Index(fields=['habitacion', 'fecha_salida']),
+            # También sirve los filtros sólo por estado
+            models.Index(fields=['estado', 'fecha_salida']),
+            # Paginación por clave del listado de reservas (paginacion.py) y filtro por fechas
+            models.Index(fields=['fecha_reserva', 'id']),
+            models.Index(fields=['fecha_entrada']),
+            # Mis reservas: próximas (fecha_salida > hoy) e historial por separado, paginadas
+            # por (fecha_salida, id): filtro y orden salen del mismo índice, sin ordenar aparte
+            models.Index(fields=['cliente', 'fecha_salida', 'id']),
+            # Avisos previos a la llegada: confirmadas que entran en los próximos días
+            models.Index(fields=['estado', 'fecha_entrada']),
         ]
         permissions = [
             ("can_confirm_reservation", "Can confirm reservation"),
             ("can_cancel_reservation", "Can cancel reservation"),
         ]
 
+    # Campos cuyo valor anterior necesitan las estructuras derivadas (cachés, índice...)
+    CAMPOS_SEGUIDOS = ('habitacion_id', 'fecha_entrada', 'fecha_salida', 'estado')
+
     def __str__(self):
         return f"Reserva #{self.id} - {self.cliente.username} - Hab. {self.habitacion.numero}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._recordar_valores()
+        return instancia
+
+    def _recordar_valores(self):
+        self._valores_originales = {campo: self.__dict__.get(campo) for campo in self.CAMPOS_SEGUIDOS}
+
+    def valores_originales(self):
+        """Valores leídos de la base de datos (None si la reserva es nueva)."""
+        return getattr(self, '_valores_originales', None)
+
     #Previene reservas invalidas o sobrecupo
-def clean(self):
-    # Si falta alguna fecha, no validar aún
-    if not self.fecha_entrada or not self.fecha_salida:
-        return
-
-    # Validación de fechas
-    if self.fecha_entrada >= self.fecha_salida:
-        raise ValidationError("La fecha de entrada debe ser anterior a la de salida.")
-
-    # Validar número de huéspedes
-    if self.numero_huespedes < 1:
-        raise ValidationError("La reserva debe tener al menos 1 huésped.")
-
-    capacidad = self.habitacion.tipo.capacidad_maxima
-    if self.numero_huespedes > capacidad:
-        raise ValidationError(
-            f"Número de huéspedes ({self.numero_huespedes}) excede la capacidad ({capacidad})."
-        )
+    def clean(self):
+        # Si falta alguna fecha, no validar aún
+        if not self.fecha_entrada or not self.fecha_salida:
+            return
+
+        # Validación de fechas
+        if self.fecha_entrada >= self.fecha_salida:
+            raise ValidationError("La fecha de entrada debe ser anterior a la de salida.")
 
-    # Validar solapamiento
-    conflictos = Reserva.objects.filter(
-        habitacion=self.habitacion,
-        estado__in=['pendiente', 'confirmada'],
-        fecha_entrada__lt=self.fecha_salida,
-        fecha_salida__gt=self.fecha_entrada
-    )
-    if self.pk:
-        conflictos = conflictos.exclude(pk=self.pk)
-    if conflictos.exists():
-        raise ValidationError("La habitación no está disponible en ese rango de fechas.")
+        # Validar número de huéspedes
+        if self.numero_huespedes < 1:
+            raise ValidationError("La reserva debe tener al menos 1 huésped.")
+
+        capacidad = self.habitacion.tipo.capacidad_maxima
+        if self.numero_huespedes > capacidad:
+            raise ValidationError(
+                f"Número de huéspedes ({self.numero_huespedes}) excede la capacidad ({capacidad})."
+            )
 
+        # Validar solapamiento
+        if self._hay_solapamiento():
+            raise ValidationError("La habitación no está disponible en ese rango de fechas.")
+
+    def _hay_solapamiento(self):
+        """
+        True si otra reserva activa de la habitación se cruza con [entrada, salida).
+        Corre en cada save(), así que va en SQL directo (compilarla con el ORM costaba más
+        que resolverla) y por el índice (habitacion, fecha_salida): lee sólo las reservas
+        de la habitación que terminan después de la entrada, no todo su historial.
+        """
+        conexion = transaction.get_connection()
+        ops = conexion.ops
+        sql = (f'SELECT 1 FROM {ops.quote_name(self._meta.db_table)} WHERE habitacion_id = %s '
+               f'AND fecha_salida > %s AND fecha_entrada < %s AND estado IN (%s, %s)')
+        parametros = [
+            self.habitacion_id,
+            ops.adapt_datefield_value(self.fecha_entrada),
+            ops.adapt_datefield_value(self.fecha_salida),
+            'pendiente', 'confirmada',
+        ]
+        if self.pk:
+            sql += ' AND id <> %s'
+            parametros.append(self.pk)
+        with conexion.cursor() as cursor:
+            cursor.execute(sql + ' LIMIT 1', parametros)
+            return cursor.fetchone() is not None
 
     def calcular_noches(self):
         return (self.fecha_salida - self.fecha_entrada).days
 
     def _calcular_precio(self):
-        noches = Decimal(self.calcular_noches())
-        precio_noche = Decimal(self.habitacion.tipo.precio_por_noche)
-        return (noches * precio_noche).quantize(Decimal('0.01'))
+        # Plan de tarifas vigente: temporadas, días de la semana y descuento por duración
+        return tarifas.cotizar(self.habitacion.tipo_id, self.fecha_entrada, self.fecha_salida)
 
     #Para evitar estados corruptos
     @transaction.atomic
     def save(self, *args, **kwargs):
-        # Ejecutar clean para validar
-        self.full_clean()
+        # Serializar con otras escrituras de la misma habitación antes de validar (ver reservas.py)
+        self._bloquear_habitacion()
+
+        # Ejecutar clean para validar (una sola consulta: el solapamiento). Las relaciones
+        # ya cargadas no se vuelven a buscar en la base: la clave foránea las respalda.
+        # Reserva no tiene campos únicos ni restricciones en Meta que revisar.
+        self.full_clean(exclude=self._relaciones_cargadas(), validate_unique=False, validate_constraints=False)
 
         # Calcular precio si no está establecido
         if self.precio_total in (None, Decimal('0.00')):
             self.precio_total = self._calcular_precio()
 
-        super().save(*args, **kwargs)
-
-        # Actualizar estado de la habitación después de guardar
-        self.actualizar_estado_habitacion()
+        # Lo que las señales y el estado de la habitación dejan para el commit: un solo callback
+        with agrupadas():
+            try:
+                super().save(*args, **kwargs)
+            except IntegrityError as error:
+                # Restricción de exclusión en PostgreSQL (migración 0005): último resguardo
+                if RESTRICCION_SIN_SOLAPAMIENTO in str(error):
+                    raise ValidationError("La habitación no está disponible en ese rango de fechas.")
+                raise
+            originales = self.valores_originales()
+            self._recordar_valores()
+
+            # Estado de la habitación (y de la anterior, si se movió): una pasada al confirmar
+            estado_habitaciones.programar([self.habitacion_id, originales and originales['habitacion_id']])
+
+    def _relaciones_cargadas(self):
+        return [campo for campo in ('cliente', 'habitacion') if self._meta.get_field(campo).is_cached(self)]
+
+    def _bloquear_habitacion(self):
+        """
+        Bloquea la fila de la habitación (SELECT ... FOR UPDATE) en bases que lo necesitan:
+        dos reservas de la misma habitación se validan y guardan de a una, y las de
+        habitaciones distintas siguen en paralelo. En SQLite no hace falta: las
+        transacciones empiezan con BEGIN IMMEDIATE (settings.DATABASES) y ya toman
+        el bloqueo de escritura antes de validar. En PostgreSQL tampoco: la restricción de
+        exclusión (migración 0005) rechaza la segunda de dos reservas que se cruzan y save()
+        lo informa como ValidationError, así que cada reserva cuesta una consulta menos.
+        """
+        conexion = transaction.get_connection()
+        if self.habitacion_id and conexion.features.has_select_for_update and conexion.vendor != 'postgresql':
+            list(Habitacion.objects.select_for_update().filter(pk=self.habitacion_id).values_list('pk', flat=True))
 
     def actualizar_estado_habitacion(self):
         """
-        Determina el estado de la habitación según reservas activas.
-        - Si existe una reserva confirmada en curso -> ocupada.
-        - Si no hay reservas activas -> disponible.
-        - Si hay reservas pero no confirmadas -> mantener 'disponible' o 'mantenimiento' según negocio.
+        Recalcula ya el estado de la habitación según sus reservas activas
+        (ver estado_habitaciones.py: confirmada en curso -> ocupada, sin reservas
+        activas -> disponible, mantenimiento se respeta).
         """
-        hoy = date.today()
-        habitacion = self.habitacion
+        estado_habitaciones.recalcular([self.habitacion_id])
+        self.habitacion.refresh_from_db(fields=['estado'])
 
-        # Si existe alguna reserva confirmada que incluye hoy -> ocupada
-        if Reserva.objects.filter(habitacion=habitacion, estado='confirmada',
-                                fecha_entrada__lte=hoy, fecha_salida__gt=hoy).exists():
-            habitacion.estado = 'ocupada'
-            habitacion.save(update_fields=['estado'])
-            return
+    def delete(self, *args, **kwargs):
+        habitacion_id = self.habitacion_id
+        resultado = super().delete(*args, **kwargs)
+        estado_habitaciones.programar([habitacion_id])
+        return resultado
+
+
+class ResumenDiario(models.Model):
+    """
+    Resumen de ocupación e ingresos por tipo de habitación y noche, para los reportes.
+    Lo recalcula `manage.py actualizar_resumenes` (ver reportes.py); no se mantiene
+    con señales.
+    """
+    tipo = models.ForeignKey(TipoHabitacion, on_delete=models.CASCADE, related_name='resumenes')
+    fecha = models.DateField()
+    habitaciones = models.PositiveIntegerField(default=0)
+    vendidas = models.PositiveIntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    llegadas = models.PositiveIntegerField(default=0)
 
-        # Si no hay reservas activas (pendiente/confirmada) en o después de hoy -> disponible
-        otras_reservas_activas = Reserva.objects.filter(
-            habitacion=habitacion,
-            estado__in=['pendiente', 'confirmada'],
-            fecha_salida__gte=hoy
-        ).exclude(id=self.id)
+    class Meta:
+        verbose_name = "Resumen diario"
+        verbose_name_plural = "Resúmenes diarios"
+        ordering = ['fecha', 'tipo']
+        constraints = [
+            models.UniqueConstraint(fields=['tipo', 'fecha'], name='resumen_tipo_fecha_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['fecha']),
+        ]
 
-        if not otras_reservas_activas.exists():
-            habitacion.estado = 'disponible'
-            habitacion.save(update_fields=['estado'])
+    def __str__(self):
+        return f"{self.tipo} {self.fecha}: {self.vendidas}/{self.habitaciones}"
 
-    def delete(self, *args, **kwargs):
-        habitacion = self.habitacion
-        super().delete(*args, **kwargs)
 
-        hoy = date.today()
-        reservas_activas = Reserva.objects.filter(
-            habitacion=habitacion,
-            estado__in=['pendiente', 'confirmada'],
-            fecha_salida__gte=hoy
-        )
+class MarcaTarea(models.Model):
+    """
+    Marca de avance (high-water mark) de una tarea programada: hasta qué fecha ya
+    procesó. La siguiente corrida sólo mira lo posterior (ver vencimientos.py).
+    """
+    nombre = models.CharField(max_length=50, unique=True)
+    fecha = models.DateField()
+    actualizada = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Marca de tarea"
+        verbose_name_plural = "Marcas de tareas"
+
+    def __str__(self):
+        return f"{self.nombre}: {self.fecha}"
 
-        if not reservas_activas.exists():
-            habitacion.estado = 'disponible'
-            habitacion.save(update_fields=['estado'])
+
+class MarcaCambio(models.Model):
+    """
+    Último cambio que afecta la disponibilidad, por mes ('AAAA-MM', según las noches de
+    las reservas tocadas) o general ('*', habitaciones y tipos). Sirve de validador barato
+    para los GET condicionales de los listados (ver condicional.py).
+    """
+    nombre = models.CharField(max_length=10, unique=True)
+    actualizada = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Marca de cambio"
+        verbose_name_plural = "Marcas de cambios"
+
+    def __str__(self):
+        return f"{self.nombre}: {self.actualizada}"
+
+
+class CorreoPendiente(models.Model):
+    """
+    Bandeja de salida de correos: las vistas encolan la fila dentro de su transacción y
+    el worker `manage.py enviar_correos` la envía (ver correos.py). Los que agotan sus
+    intentos quedan como fallidos para revisarlos desde el admin.
+    """
+    ESTADOS = [
+        ('pendiente', 'Pendiente'),
+        ('enviado', 'Enviado'),
+        ('fallido', 'Fallido'),
+    ]
+
+    destinatario = models.EmailField()
+    asunto = models.CharField(max_length=255)
+    cuerpo = models.TextField()
+    remitente = models.CharField(max_length=255, blank=True)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='pendiente')
+    intentos = models.PositiveIntegerField(default=0)
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    ultimo_error = models.TextField(blank=True)
+    creado = models.DateTimeField(auto_now_add=True)
+    enviado = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Correo pendiente"
+        verbose_name_plural = "Correos pendientes"
+        indexes = [
+            # Lo que el worker busca en cada vuelta: pendientes ya vencidos, en orden
+            models.Index(fields=['estado', 'proximo_intento']),
+        ]
+
+    def __str__(self):
+        return f"{self.asunto} -> {self.destinatario} ({self.estado})"
 
 
 class PerfilUsuario(models.Model):
@@ -0,0 +1,353 @@
+"""
+Calendario de ocupación en bits.
+
+Cada habitación ocupa una posición (bit) y cada noche del horizonte es un entero de Python
+usado como bitset: el bit j de `noches[i]` indica que la habitación j está ocupada la noche
+inicio + i. Así las preguntas sobre todas las habitaciones se responden con operaciones
+OR/AND/popcount sobre enteros grandes, sin consultas por habitación:
+
+- libres(entrada, salida): OR de las noches del rango y complemento.
+- libres_por_noche(desde, hasta): popcount de cada noche (p. ej. un mes por tipo).
+- primer_hueco(n): AND deslizante de n noches consecutivas, por duplicación.
+
+También se guarda el bitset por habitación (bit i = noche i) para aplicar cambios de una
+reserva con un XOR sobre las noches que realmente cambiaron.
+
+El calendario global (`calendario`) se activa con settings.HOTEL_CALENDARIO_OCUPACION, se
+carga perezosamente con un horizonte de settings.HOTEL_CALENDARIO_OCUPACION_DIAS noches desde
+hoy y se mantiene con las señales de Reserva y Habitacion, igual que el índice de reservas.
+Para ventanas puntuales (un mes, una búsqueda flexible) se puede construir un
+CalendarioOcupacion temporal con `construir(desde, dias)`, que cuesta dos consultas.
+"""
+import threading
+import time
+from datetime import date, timedelta
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import transaction
+
+from .indice_reservas import ESTADOS_ACTIVOS, CambiosSinConfirmar, _ordinal
+
+HORIZONTE_DIAS = 730
+
+
+def habilitado():
+    return getattr(settings, 'HOTEL_CALENDARIO_OCUPACION', False)
+
+
+def _bits(x):
+    """Posiciones de los bits encendidos de x (x >= 0), de menor a mayor."""
+    return [i for i, c in enumerate(bin(x)[:1:-1]) if c == '1']
+
+
+class CalendarioOcupacion:
+    def __init__(self, inicio, dias=HORIZONTE_DIAS):
+        self.inicio = inicio
+        self.dias = dias
+        self._lock = threading.RLock()
+        self._base = inicio.toordinal()
+        self.noches = [0] * dias
+        self._habitaciones = []      # posición -> habitacion_id (None si se eliminó)
+        self._posicion = {}          # habitacion_id -> posición
+        self._por_habitacion = {}    # habitacion_id -> bitset de noches ocupadas
+        self._reservas = {}          # habitacion_id -> {reserva_id: (entrada, salida)} en ordinales
+        self._ubicacion = {}         # reserva_id -> habitacion_id
+        self._disponibles = 0        # habitaciones en estado 'disponible'
+        self._por_tipo = {}          # tipo_id -> máscara de habitaciones
+        self._tipo_de = {}           # habitacion_id -> tipo_id
+
+    # ---- construcción ----
+
+    def cargar(self):
+        """Carga habitaciones y reservas activas del horizonte (dos consultas)."""
+        from .models import Habitacion, Reserva
+
+        with self._lock:
+            for habitacion_id, tipo_id, estado in Habitacion.objects.values_list('id', 'tipo_id', 'estado'):
+                self._alta_habitacion(habitacion_id, tipo_id, estado)
+
+            fin = date.fromordinal(self._base + self.dias)
+            reservas = Reserva.objects.filter(
+                estado__in=ESTADOS_ACTIVOS, fecha_entrada__lt=fin, fecha_salida__gt=self.inicio
+            ).values_list('id', 'habitacion_id', 'fecha_entrada', 'fecha_salida')
+            for reserva_id, habitacion_id, entrada, salida in reservas.iterator(chunk_size=5000):
+                self._reservas.setdefault(habitacion_id, {})[reserva_id] = (entrada.toordinal(), salida.toordinal())
+                self._ubicacion[reserva_id] = habitacion_id
+
+            # Cada habitación se arma como un bitset de noches y luego se vuelca a las noches
+            # con XOR sobre sus bordes: un bit se enciende al entrar y se apaga al salir.
+            bordes = [0] * (self.dias + 1)
+            for habitacion_id, reservas_habitacion in self._reservas.items():
+                if habitacion_id not in self._posicion:
+                    continue
+                ocupadas = self._bitset(reservas_habitacion.values())
+                self._por_habitacion[habitacion_id] = ocupadas
+                bit = 1 << self._posicion[habitacion_id]
+                for i in _bits(ocupadas ^ (ocupadas << 1)):
+                    bordes[i] ^= bit
+            acumulado = 0
+            for i in range(self.dias):
+                acumulado ^= bordes[i]
+                self.noches[i] = acumulado
+        return self
+
+    def _bitset(self, intervalos):
+        ocupadas = 0
+        for entrada, salida in intervalos:
+            a = max(entrada - self._base, 0)
+            b = min(salida - self._base, self.dias)
+            if a < b:
+                ocupadas |= ((1 << (b - a)) - 1) << a
+        return ocupadas
+
+    def _alta_habitacion(self, habitacion_id, tipo_id, estado):
+        posicion = self._posicion.get(habitacion_id)
+        if posicion is None:
+            posicion = self._posicion[habitacion_id] = len(self._habitaciones)
+            self._habitaciones.append(habitacion_id)
+        bit = 1 << posicion
+        anterior = self._tipo_de.get(habitacion_id)
+        if anterior is not None:
+            self._por_tipo[anterior] &= ~bit
+        self._tipo_de[habitacion_id] = tipo_id
+        self._por_tipo[tipo_id] = self._por_tipo.get(tipo_id, 0) | bit
+        if estado == 'disponible':
+            self._disponibles |= bit
+        else:
+            self._disponibles &= ~bit
+
+    # ---- mantenimiento incremental ----
+
+    def _redibujar(self, habitacion_id):
+        """Vuelca a las noches sólo los bits de la habitación que cambiaron."""
+        posicion = self._posicion.get(habitacion_id)
+        if posicion is None:
+            return
+        nuevo = self._bitset(self._reservas.get(habitacion_id, {}).values())
+        anterior = self._por_habitacion.get(habitacion_id, 0)
+        bit = 1 << posicion
+        for i in _bits(anterior ^ nuevo):
+            self.noches[i] ^= bit
+        self._por_habitacion[habitacion_id] = nuevo
+
+    def aplicar_reserva(self, reserva_id, habitacion_id, entrada, salida, activa):
+        with self._lock:
+            origen = self._ubicacion.pop(reserva_id, None)
+            if origen is not None:
+                self._reservas.get(origen, {}).pop(reserva_id, None)
+                self._redibujar(origen)
+            if activa:
+                self._reservas.setdefault(habitacion_id, {})[reserva_id] = (entrada, salida)
+                self._ubicacion[reserva_id] = habitacion_id
+                self._redibujar(habitacion_id)
+
+    def aplicar_habitacion(self, habitacion_id, tipo_id, estado, eliminada=False):
+        with self._lock:
+            if not eliminada:
+                self._alta_habitacion(habitacion_id, tipo_id, estado)
+                self._redibujar(habitacion_id)
+                return
+            posicion = self._posicion.pop(habitacion_id, None)
+            if posicion is None:
+                return
+            bit = 1 << posicion
+            self._disponibles &= ~bit
+            tipo_id = self._tipo_de.pop(habitacion_id, None)
+            if tipo_id is not None:
+                self._por_tipo[tipo_id] &= ~bit
+            for i in _bits(self._por_habitacion.pop(habitacion_id, 0)):
+                self.noches[i] &= ~bit
+            self._habitaciones[posicion] = None
+            for reserva_id in self._reservas.pop(habitacion_id, {}):
+                self._ubicacion.pop(reserva_id, None)
+
+    # ---- consultas ----
+
+    def cubre(self, desde, hasta):
+        return self._base <= _ordinal(desde) and _ordinal(hasta) <= self._base + self.dias
+
+    def _candidatas(self, tipo_ids=None):
+        if tipo_ids is None:
+            return self._disponibles
+        mascara = reduce(or_, (self._por_tipo.get(t, 0) for t in tipo_ids), 0)
+        return self._disponibles & mascara
+
+    def _a_ids(self, mascara):
+        return [self._habitaciones[j] for j in _bits(mascara)]
+
+    def mascara_libres(self, fecha_entrada, fecha_salida, tipo_ids=None):
+        """Máscara de habitaciones disponibles sin reservas activas en [entrada, salida)."""
+        a = _ordinal(fecha_entrada) - self._base
+        b = _ordinal(fecha_salida) - self._base
+        with self._lock:
+            return self._candidatas(tipo_ids) & ~reduce(or_, self.noches[a:b], 0)
+
+    def libres(self, fecha_entrada, fecha_salida, tipo_ids=None):
+        """Ids de habitaciones disponibles sin reservas activas en [entrada, salida)."""
+        return self._a_ids(self.mascara_libres(fecha_entrada, fecha_salida, tipo_ids))
+
+    def tipo_de(self, habitacion_id):
+        """Tipo de la habitación, o None si no está en el calendario."""
+        return self._tipo_de.get(habitacion_id)
+
+    def incluye(self, mascara, habitacion_id):
+        """True si la habitación está en la máscara."""
+        posicion = self._posicion.get(habitacion_id)
+        return posicion is not None and bool(mascara >> posicion & 1)
+
+    def libres_por_noche(self, desde, hasta, tipo_ids=None):
+        """Lista de (fecha, habitaciones libres) para cada noche de [desde, hasta)."""
+        a = _ordinal(desde) - self._base
+        b = _ordinal(hasta) - self._base
+        with self._lock:
+            candidatas = self._candidatas(tipo_ids)
+            return [
+                (date.fromordinal(self._base + i), (candidatas & ~self.noches[i]).bit_count())
+                for i in range(a, b)
+            ]
+
+    def primer_hueco(self, noches, desde=None, tipo_ids=None, habitacion_id=None):
+        """
+        Primera fecha >= desde en la que alguna habitación (del tipo, o la indicada) queda
+        libre `noches` noches seguidas. Devuelve (fecha, [habitacion_ids]) o None.
+        """
+        a = max(_ordinal(desde or self.inicio) - self._base, 0)
+        with self._lock:
+            if habitacion_id is not None:
+                posicion = self._posicion.get(habitacion_id)
+                candidatas = self._disponibles & (1 << posicion) if posicion is not None else 0
+            else:
+                candidatas = self._candidatas(tipo_ids)
+            libres = [candidatas & ~ocupadas for ocupadas in self.noches[a:]]
+
+        if not candidatas:
+            return None
+        for i, mascara in enumerate(_ventanas(libres, noches, candidatas)):
+            if mascara:
+                return date.fromordinal(self._base + a + i), self._a_ids(mascara)
+        return None
+
+    def libres_por_inicio(self, desde, hasta, noches, tipo_ids=None):
+        """
+        Para cada fecha de entrada en [desde, hasta), la máscara de habitaciones libres
+        `noches` noches seguidas desde esa fecha. Todas las ventanas salen de un solo
+        recorrido por las noches (AND deslizante), no de una búsqueda por fecha.
+        Devuelve una lista de (fecha_entrada, máscara); ver contar_por_tipo().
+        """
+        a = _ordinal(desde) - self._base
+        b = _ordinal(hasta) - self._base
+        with self._lock:
+            candidatas = self._candidatas(tipo_ids)
+            libres = [candidatas & ~ocupadas for ocupadas in self.noches[a:b + noches - 1]]
+        return [
+            (date.fromordinal(self._base + a + i), mascara)
+            for i, mascara in enumerate(_ventanas(libres, noches, candidatas))
+        ]
+
+    def contar_por_tipo(self, mascara, tipo_ids=None):
+        """{tipo_id: habitaciones de la máscara que son de ese tipo}."""
+        with self._lock:
+            tipos = self._por_tipo if tipo_ids is None else {t: self._por_tipo.get(t, 0) for t in tipo_ids}
+            return {tipo_id: (mascara & bits).bit_count() for tipo_id, bits in tipos.items()}
+
+
+def _ventanas(libres, noches, inicial):
+    """
+    ventana[i] = AND de libres[i .. i + noches - 1] para cada i posible, armado por
+    duplicación: potencia[i] es el AND de un bloque de largo `paso` que empieza en i.
+    """
+    largo = len(libres) - noches + 1
+    if largo <= 0:
+        return []
+    ventana = [inicial] * largo
+    potencia, paso, desplazamiento, restantes = libres, 1, 0, noches
+    while restantes:
+        if restantes & 1:
+            ventana = [v & potencia[i + desplazamiento] for i, v in enumerate(ventana)]
+            desplazamiento += paso
+        restantes >>= 1
+        if restantes:
+            potencia = [potencia[i] & potencia[i + paso] for i in range(len(potencia) - paso)]
+            paso *= 2
+    return ventana
+
+
+def construir(desde, dias):
+    """Calendario temporal para una ventana concreta, sin tocar el global."""
+    return CalendarioOcupacion(desde, dias).cargar()
+
+
+class _CalendarioGlobal:
+    """Calendario del proceso con horizonte móvil desde hoy, mantenido por señales."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cambios = CambiosSinConfirmar()
+        self._actual = None
+        self._cargado_en = 0
+
+    def invalidar(self):
+        with self._lock:
+            self._actual = None
+
+    def obtener(self):
+        """El calendario vigente, o None si está desactivado o hay cambios sin confirmar."""
+        if not habilitado() or self._cambios.actuales():
+            return None
+        ttl = getattr(settings, 'HOTEL_CALENDARIO_OCUPACION_TTL', None)
+        with self._lock:
+            actual = self._actual
+            vencido = ttl is not None and time.monotonic() - self._cargado_en > ttl
+            if actual is None or actual.inicio != date.today() or vencido:
+                dias = getattr(settings, 'HOTEL_CALENDARIO_OCUPACION_DIAS', HORIZONTE_DIAS)
+                actual = self._actual = construir(date.today(), dias)
+                self._cargado_en = time.monotonic()
+            return actual
+
+    def _al_confirmar(self, clave, aplicar):
+        sucias = self._cambios.actuales()
+        sucias.add(clave)
+
+        def confirmar():
+            actual = self._actual
+            if actual is not None:
+                aplicar(actual)
+            sucias.discard(clave)
+
+        transaction.on_commit(confirmar)
+
+    def registrar_reserva(self, reserva, eliminada=False):
+        if not habilitado():
+            return
+        datos = (
+            reserva.pk, reserva.habitacion_id,
+            _ordinal(reserva.fecha_entrada), _ordinal(reserva.fecha_salida),
+            not eliminada and reserva.estado in ESTADOS_ACTIVOS,
+        )
+        self._al_confirmar(('reserva', reserva.pk), lambda cal: cal.aplicar_reserva(*datos))
+
+    def registrar_habitacion(self, habitacion, eliminada=False):
+        if not habilitado():
+            return
+        datos = (habitacion.pk, habitacion.tipo_id, habitacion.estado, eliminada)
+        self._al_confirmar(('habitacion', habitacion.pk), lambda cal: cal.aplicar_habitacion(*datos))
+
+
+calendario = _CalendarioGlobal()
+
+
+def para_rango(desde, hasta):
+    """El calendario global si cubre el rango; si no, uno temporal sólo para esa ventana."""
+    actual = calendario.obtener()
+    if actual is not None and actual.cubre(desde, hasta):
+        return actual
+    return construir(desde, (hasta - desde).days)
+
+
+def rango_mes(anio, mes):
+    """Primer día del mes y primer día del mes siguiente."""
+    desde = date(anio, mes, 1)
+    hasta = (desde + timedelta(days=32)).replace(day=1)
+    return desde, hasta
@@ -0,0 +1,100 @@
+"""
+Paginación por clave (keyset / seek) para listados grandes de reservas.
+
+OFFSET obliga a la base a recorrer y descartar todas las filas anteriores a la página;
+con un millón de reservas las últimas páginas cuestan tanto como leer la tabla. Aquí la
+página siguiente se pide "después de (fecha_reserva, id) de la última fila mostrada",
+que es un recorrido por el índice (fecha_reserva, id) desde ese punto.
+
+El orden es (-fecha_reserva, -id): el id desempata reservas creadas en el mismo instante.
+Los cursores son opacos (base64 de JSON) y se pasan en la URL como ?despues= o ?antes=.
+Un cursor inválido o manipulado se trata como "primera página".
+"""
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+TAMANO_PAGINA = 50
+CAMPOS = ('fecha_reserva', 'id')
+
+
+class Pagina:
+    """Filas de la página y cursores para la siguiente (?despues=) y la anterior (?antes=)."""
+
+    def __init__(self, objetos, siguiente=None, anterior=None):
+        self.objetos = objetos
+        self.siguiente = siguiente
+        self.anterior = anterior
+
+    def __iter__(self):
+        return iter(self.objetos)
+
+    def __len__(self):
+        return len(self.objetos)
+
+    @property
+    def hay_otras(self):
+        return bool(self.siguiente or self.anterior)
+
+
+def cursor(objeto, campos=CAMPOS):
+    valores = [getattr(objeto, campo) for campo in campos]
+    texto = json.dumps([v.isoformat() if hasattr(v, 'isoformat') else v for v in valores])
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+
+def _decodificar(texto, modelo, campos):
+    """Valores de la clave, convertidos al tipo de cada campo, o None si el cursor no sirve."""
+    try:
+        relleno = '=' * (-len(texto) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(texto + relleno))
+        if not isinstance(valores, list) or len(valores) != len(campos):
+            return None
+        return [modelo._meta.get_field(campo).to_python(valor) for campo, valor in zip(campos, valores)]
+    except (ValueError, TypeError, binascii.Error, ValidationError):
+        return None
+
+
+def _despues_de(valores, campos, sentido):
+    """Q de las filas que van después de `valores` en orden descendente (sentido='lt') o al revés ('gt')."""
+    (campo, desempate), (valor, valor_desempate) = campos, valores
+    return Q(**{f'{campo}__{sentido}': valor}) | Q(**{campo: valor, f'{desempate}__{sentido}': valor_desempate})
+
+
+def paginar(queryset, despues=None, antes=None, tamano=TAMANO_PAGINA, campos=CAMPOS, descendente=True):
+    """
+    Una página de `queryset` ordenado por `campos` (dos: clave y desempate), de mayor a
+    menor salvo `descendente=False`. Lee tamano + 1 filas para saber si hay más, sin COUNT.
+    """
+    modelo = queryset.model
+    campo, desempate = campos
+    adelante, atras = ('lt', 'gt') if descendente else ('gt', 'lt')
+    orden = (f'-{campo}', f'-{desempate}') if descendente else (campo, desempate)
+    orden_inverso = (campo, desempate) if descendente else (f'-{campo}', f'-{desempate}')
+    valores_antes = _decodificar(antes, modelo, campos) if antes else None
+    valores_despues = _decodificar(despues, modelo, campos) if despues and not valores_antes else None
+
+    if valores_antes:
+        # Hacia atrás: orden inverso desde el cursor, y se da vuelta la página
+        filas = list(queryset.filter(_despues_de(valores_antes, campos, atras)).order_by(*orden_inverso)[:tamano + 1])
+        hay_mas = len(filas) > tamano
+        filas = filas[:tamano][::-1]
+        return Pagina(
+            objetos=filas,
+            siguiente=cursor(filas[-1], campos) if filas else None,
+            anterior=cursor(filas[0], campos) if hay_mas else None,
+        )
+
+    if valores_despues:
+        queryset = queryset.filter(_despues_de(valores_despues, campos, adelante))
+    filas = list(queryset.order_by(*orden)[:tamano + 1])
+    hay_mas = len(filas) > tamano
+    filas = filas[:tamano]
+    return Pagina(
+        objetos=filas,
+        siguiente=cursor(filas[-1], campos) if hay_mas else None,
+        anterior=cursor(filas[0], campos) if valores_despues and filas else None,
+    )
@@ -0,0 +1,106 @@
+"""
+Datos precalculados de la página de inicio (la más visitada, casi siempre anónima).
+
+`datos()` devuelve las habitaciones destacadas (las primeras libres, con su tipo) y el
+catálogo de tipos, guardados en la caché bajo la versión actual de la portada. El
+template además cachea como fragmentos el HTML que arma con ellos, con la misma versión
+en la clave: con la caché caliente, servir la portada no consulta la base de datos.
+
+La versión sube (ahora y otra vez al confirmar la transacción) cuando cambia algo que
+puede alterar lo que se muestra:
+- cualquier escritura de Habitacion o TipoHabitacion, o una escritura masiva;
+- una reserva activa sobre una habitación destacada (deja de estar libre);
+- una reserva que deja de ocupar una habitación (cancelada, completada, eliminada o
+  movida a otra): esa habitación puede pasar a estar libre.
+Lo demás (p. ej. una reserva cuya fecha de salida ya pasó) se corrige al vencer el TTL.
+Con la caché de portada apagada no se invalida nada.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import disponibilidad
+from .al_confirmar import Pendientes
+from .disponibilidad import ESTADOS_ACTIVOS
+
+PREFIJO = 'portada'
+CANTIDAD_DESTACADAS = 6
+
+
+def habilitado():
+    return getattr(settings, 'HOTEL_CACHE_PORTADA', True)
+
+
+def ttl():
+    """Segundos que viven datos y fragmentos (0 si la caché de portada está apagada)."""
+    return getattr(settings, 'HOTEL_CACHE_PORTADA_TTL', 60) if habilitado() else 0
+
+
+def version():
+    clave = f'{PREFIJO}:version'
+    valor = cache.get(clave)
+    if valor is None:
+        cache.add(clave, time.time_ns(), None)
+        valor = cache.get(clave, 0)
+    return valor
+
+
+def _calcular():
+    from .models import TipoHabitacion
+
+    destacadas = list(disponibilidad.habitaciones_libres()[:CANTIDAD_DESTACADAS])
+    return {
+        'destacadas': destacadas,
+        'ids': {habitacion.pk for habitacion in destacadas},
+        'tipos': list(TipoHabitacion.objects.all()),
+    }
+
+
+def datos():
+    """{'destacadas': [...], 'ids': {...}, 'tipos': [...]}, de la caché si está."""
+    if not habilitado():
+        return _calcular()
+    actual = version()
+    valor = cache.get(f'{PREFIJO}:datos:{actual}')
+    if valor is None:
+        valor = _calcular()
+        # Los ids también aparte: cada reserva guardada los consulta (invalidar_reserva)
+        # y así no deserializa las habitaciones y los tipos
+        cache.set_many({f'{PREFIJO}:datos:{actual}': valor, f'{PREFIJO}:ids:{actual}': valor['ids']}, ttl())
+    return valor
+
+
+def _destacadas_en_cache():
+    return cache.get(f'{PREFIJO}:ids:{version()}') or set()
+
+
+def _subir(claves):
+    for clave in claves:
+        try:
+            cache.incr(clave)
+        except ValueError:
+            cache.set(clave, time.time_ns(), None)
+
+
+_pendientes = Pendientes(_subir)
+
+
+def invalidar():
+    # Ahora (la misma transacción puede volver a leer la portada) y otra vez al confirmar,
+    # por si otro hilo recalculó antes del commit; esa segunda, una vez por transacción
+    if habilitado():
+        claves = [f'{PREFIJO}:version']
+        _pendientes.agregar(claves)
+        _subir(claves)
+
+
+def invalidar_reserva(reserva, eliminada=False):
+    if not habilitado():
+        return
+    originales = reserva.valores_originales() or {}
+    activa = not eliminada and reserva.estado in ESTADOS_ACTIVOS
+    ocupaba = originales.get('estado') in ESTADOS_ACTIVOS
+    liberada = ocupaba and (not activa or originales.get('habitacion_id') != reserva.habitacion_id)
+    if liberada or (activa and reserva.habitacion_id in _destacadas_en_cache()):
+        invalidar()
@@ -0,0 +1,214 @@
+"""
+Reportes de ocupación e ingresos: ocupación %, ADR (ingreso por noche vendida) y RevPAR
+(ingreso por habitación disponible), por día, semana o mes y por tipo de habitación.
+
+Los reportes leen sólo la tabla ResumenDiario, una fila por (tipo, noche) con las
+habitaciones del tipo, las noches vendidas, los ingresos y las llegadas, agrupada en la
+base: no recorren Reserva, así que varios años de historia son unas miles de filas.
+
+Mantenimiento (comando `actualizar_resumenes`, una vez por noche):
+- `reconstruir(desde, hasta)` recalcula el rango con un solo INSERT ... SELECT: un CTE
+  recursivo expande cada reserva en sus noches dentro del rango, otro arma el calendario
+  y la base agrupa por (tipo, noche). Borra y escribe en la misma transacción.
+- `actualizar()` sólo recalcula lo reciente: desde HOTEL_RESUMENES_DIAS_RECIENTES antes
+  de la última corrida (MarcaTarea) hasta HOTEL_RESUMENES_DIAS_FUTUROS adelante (lo ya
+  reservado). Con la tabla vacía o `completo=True` recalcula toda la historia, p. ej.
+  después de corregir reservas viejas.
+
+Criterios: cuentan las reservas pendientes, confirmadas y completadas; el precio de cada
+reserva se reparte en partes iguales entre sus noches; las habitaciones disponibles de
+cada tipo son las que tiene hoy (no hay historial de altas y bajas).
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import NotSupportedError, connection, transaction
+from django.db.models import F, Min, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear, TruncMonth, TruncWeek
+
+TAREA = 'actualizar_resumenes'
+ESTADOS_VENDIDOS = ('pendiente', 'confirmada', 'completada')
+PERIODOS = {
+    'dia': lambda: F('fecha'),
+    'semana': lambda: TruncWeek('fecha'),
+    'mes': lambda: TruncMonth('fecha'),
+}
+CENTAVO = Decimal('0.01')
+
+# Lo que cambia entre motores en el INSERT ... SELECT de reconstruir()
+_DIALECTOS = {
+    'sqlite': {
+        'fecha': '%s',
+        'siguiente': "date({}, '+1 day')",
+        'noches': 'CAST(julianday(r.fecha_salida) - julianday(r.fecha_entrada) AS INTEGER)',
+        'mayor': 'max',
+        'menor': 'min',
+    },
+    'postgresql': {
+        'fecha': 'CAST(%s AS date)',
+        'siguiente': '({} + 1)',
+        'noches': '(r.fecha_salida - r.fecha_entrada)',
+        'mayor': 'GREATEST',
+        'menor': 'LEAST',
+    },
+}
+
+
+def dias_recientes():
+    return getattr(settings, 'HOTEL_RESUMENES_DIAS_RECIENTES', 30)
+
+
+def dias_futuros():
+    return getattr(settings, 'HOTEL_RESUMENES_DIAS_FUTUROS', 365)
+
+
+def marca():
+    """Fecha de la última actualización de los resúmenes (None si nunca corrió)."""
+    from .models import MarcaTarea
+
+    return MarcaTarea.objects.filter(nombre=TAREA).values_list('fecha', flat=True).first()
+
+
+# ---- cálculo por conjuntos ----
+
+def _sql_reconstruir():
+    from .models import Habitacion, Reserva, ResumenDiario, TipoHabitacion
+
+    dialecto = _DIALECTOS.get(connection.vendor)
+    if dialecto is None:
+        raise NotSupportedError(f'Los resúmenes no soportan la base {connection.vendor}.')
+    q = connection.ops.quote_name
+    fecha, siguiente = dialecto['fecha'], dialecto['siguiente'].format('fecha')
+    estados = ', '.join(['%s'] * len(ESTADOS_VENDIDOS))
+    return f"""
+        INSERT INTO {q(ResumenDiario._meta.db_table)} (tipo_id, fecha, habitaciones, vendidas, ingresos, llegadas)
+        WITH RECURSIVE
+        calendario(fecha) AS (
+            SELECT {fecha}
+            UNION ALL
+            SELECT {siguiente} FROM calendario WHERE {siguiente} < {fecha}
+        ),
+        noches(tipo_id, fecha, fin, importe, llegada) AS (
+            SELECT h.tipo_id, {dialecto['mayor']}(r.fecha_entrada, {fecha}), {dialecto['menor']}(r.fecha_salida, {fecha}),
+                   COALESCE(r.precio_total, 0) * 1.0 / {dialecto['noches']}, r.fecha_entrada
+            FROM {q(Reserva._meta.db_table)} r
+            JOIN {q(Habitacion._meta.db_table)} h ON h.id = r.habitacion_id
+            WHERE r.estado IN ({estados}) AND r.fecha_entrada < {fecha} AND r.fecha_salida > {fecha}
+              AND r.fecha_salida > r.fecha_entrada
+            UNION ALL
+            SELECT tipo_id, {siguiente}, fin, importe, llegada FROM noches WHERE {siguiente} < fin
+        ),
+        ventas AS (
+            SELECT tipo_id, fecha, COUNT(*) AS vendidas, SUM(importe) AS ingresos,
+                   SUM(CASE WHEN fecha = llegada THEN 1 ELSE 0 END) AS llegadas
+            FROM noches GROUP BY tipo_id, fecha
+        ),
+        capacidad AS (
+            SELECT tipo_id, COUNT(*) AS habitaciones FROM {q(Habitacion._meta.db_table)} GROUP BY tipo_id
+        )
+        SELECT t.id, c.fecha, COALESCE(h.habitaciones, 0), COALESCE(v.vendidas, 0),
+               ROUND(COALESCE(v.ingresos, 0), 2), COALESCE(v.llegadas, 0)
+        FROM calendario c
+        CROSS JOIN {q(TipoHabitacion._meta.db_table)} t
+        LEFT JOIN capacidad h ON h.tipo_id = t.id
+        LEFT JOIN ventas v ON v.tipo_id = t.id AND v.fecha = c.fecha
+    """
+
+
+@transaction.atomic
+def reconstruir(desde, hasta):
+    """Recalcula las filas de ResumenDiario de [desde, hasta). Devuelve cuántas escribió."""
+    from .models import ResumenDiario
+
+    ResumenDiario.objects.filter(fecha__gte=desde, fecha__lt=hasta).delete()
+    if desde >= hasta:
+        return 0
+    desde, hasta = desde.isoformat(), hasta.isoformat()
+    parametros = [desde, hasta, desde, hasta, *ESTADOS_VENDIDOS, hasta, desde]
+    with connection.cursor() as cursor:
+        cursor.execute(_sql_reconstruir(), parametros)
+        return cursor.rowcount
+
+
+def actualizar(hoy=None, completo=False):
+    """
+    Recalcula lo reciente (o todo, con `completo` o la tabla vacía) y deja la marca.
+    Devuelve (desde, hasta, filas).
+    """
+    from .models import MarcaTarea, Reserva, ResumenDiario
+
+    hoy = hoy or date.today()
+    hasta = hoy + timedelta(days=dias_futuros())
+    ultima = marca()
+    if completo or ultima is None or not ResumenDiario.objects.exists():
+        desde = Reserva.objects.aggregate(primera=Min('fecha_entrada'))['primera'] or hoy
+    else:
+        desde = min(ultima, hoy) - timedelta(days=dias_recientes())
+    filas = reconstruir(desde, hasta)
+    MarcaTarea.objects.update_or_create(nombre=TAREA, defaults={'fecha': hoy})
+    return desde, hasta, filas
+
+
+# ---- reportes (sólo leen ResumenDiario) ----
+
+def _indicadores(fila):
+    """Agrega ocupación %, ADR y RevPAR a una fila con habitaciones, vendidas e ingresos."""
+    habitaciones, vendidas, ingresos = fila['habitaciones'] or 0, fila['vendidas'] or 0, fila['ingresos'] or Decimal('0')
+    fila.update(
+        habitaciones=habitaciones, vendidas=vendidas, ingresos=ingresos, llegadas=fila.get('llegadas') or 0,
+        ocupacion=round(vendidas * 100 / habitaciones, 1) if habitaciones else 0.0,
+        adr=(ingresos / vendidas).quantize(CENTAVO) if vendidas else Decimal('0.00'),
+        revpar=(ingresos / habitaciones).quantize(CENTAVO) if habitaciones else Decimal('0.00'),
+    )
+    return fila
+
+
+def _filas(desde, hasta, tipo_ids=None):
+    from .models import ResumenDiario
+
+    filas = ResumenDiario.objects.filter(fecha__gte=desde, fecha__lt=hasta)
+    if tipo_ids is not None:
+        filas = filas.filter(tipo_id__in=tipo_ids)
+    return filas.order_by()
+
+
+def _sumas():
+    return {'habitaciones': Sum('habitaciones'), 'vendidas': Sum('vendidas'),
+            'ingresos': Sum('ingresos'), 'llegadas': Sum('llegadas')}
+
+
+def resumen(desde, hasta, agrupar='mes', por_tipo=False, tipo_ids=None):
+    """
+    Indicadores de las noches de [desde, hasta), una fila por periodo ('dia', 'semana',
+    'mes'; None: todo el rango junto) y, con `por_tipo`, por tipo. Una consulta.
+    """
+    filas = _filas(desde, hasta, tipo_ids)
+    campos = []
+    if agrupar is not None:
+        filas = filas.annotate(periodo=PERIODOS[agrupar]())
+        campos.append('periodo')
+    if por_tipo:
+        filas = filas.annotate(tipo_nombre=F('tipo__nombre'))
+        campos.append('tipo_nombre')
+    if not campos:
+        return [_indicadores(filas.aggregate(**_sumas()))]
+    return [_indicadores(fila) for fila in filas.values(*campos).annotate(**_sumas()).order_by(*campos)]
+
+
+def interanual(anios, tipo_ids=None):
+    """
+    Indicadores por mes de cada año de `anios`, para comparar un año con otro:
+    {anio: [fila de enero, ..., fila de diciembre]} (None en los meses sin datos). Una consulta.
+    """
+    anios = sorted(anios)
+    if not anios:
+        return {}
+    filas = _filas(date(anios[0], 1, 1), date(anios[-1] + 1, 1, 1), tipo_ids).annotate(
+        anio=ExtractYear('fecha'), mes=ExtractMonth('fecha'),
+    ).values('anio', 'mes').annotate(**_sumas())
+    resultado = {anio: [None] * 12 for anio in anios}
+    for fila in filas:
+        if fila['anio'] in resultado:
+            resultado[fila['anio']][fila['mes'] - 1] = _indicadores(fila)
+    return resultado
@@ -0,0 +1,76 @@
+"""
+Servicio de reservas sin dobles reservas bajo concurrencia.
+
+Consultar la disponibilidad y luego guardar no alcanza: dos pedidos en paralelo pueden
+ver la habitación libre y guardar los dos. La garantía está en Reserva.save(), que valida
+y guarda dentro de una transacción que ya tiene el bloqueo adecuado:
+
+- SQLite: las transacciones empiezan con BEGIN IMMEDIATE (OPTIONS.transaction_mode en
+  settings.DATABASES), así que la validación de solapamiento y el INSERT se ejecutan con
+  el bloqueo de escritura tomado. SQLite sólo admite un escritor a la vez de todos modos.
+- PostgreSQL/MySQL: SELECT ... FOR UPDATE sobre la fila de la habitación. Las reservas de
+  una misma habitación se serializan y las de habitaciones distintas van en paralelo.
+  En PostgreSQL la restricción de exclusión de la migración 0005 rechaza además cualquier
+  solapamiento que llegue por otro camino (SQL directo, bulk_create).
+
+Este módulo agrega el reintento cuando SQLite no obtiene el bloqueo a tiempo y una
+consulta para auditar solapamientos (usada por el comando `stress_reservas`).
+"""
+import time
+
+from django.db import OperationalError, connection, transaction
+from django.db.models import Exists, OuterRef
+
+from .models import Reserva
+
+ESTADOS_ACTIVOS = ('pendiente', 'confirmada')
+REINTENTOS = 5
+ESPERA_INICIAL = 0.05
+
+
+def guardar(reserva, reintentos=REINTENTOS, ademas=None):
+    """
+    Guarda (crea o modifica) la reserva. Lanza ValidationError si la habitación no está
+    libre en el rango; si la base está ocupada reintenta con espera exponencial.
+    `ademas(reserva)`, si se pasa, corre en la misma transacción que el guardado (por
+    ejemplo, encolar el correo de confirmación).
+    """
+    for intento in range(reintentos + 1):
+        try:
+            with transaction.atomic():
+                reserva.save()
+                if ademas:
+                    ademas(reserva)
+            return reserva
+        except OperationalError as error:
+            # Dentro de una transacción ajena no se puede reintentar sin romperla
+            if 'locked' not in str(error) or intento == reintentos or connection.in_atomic_block:
+                raise
+            time.sleep(ESPERA_INICIAL * 2 ** intento)
+
+
+def crear_reserva(habitacion, cliente, fecha_entrada, fecha_salida, numero_huespedes=1,
+                  comentarios='', estado='pendiente'):
+    """Crea una reserva validada y sin solapamientos (ver guardar())."""
+    reserva = Reserva(
+        habitacion=habitacion,
+        cliente=cliente,
+        fecha_entrada=fecha_entrada,
+        fecha_salida=fecha_salida,
+        numero_huespedes=numero_huespedes,
+        comentarios=comentarios,
+        estado=estado,
+    )
+    return guardar(reserva)
+
+
+def reservas_solapadas(reservas=None):
+    """Reservas activas que se cruzan con otra reserva activa de la misma habitación."""
+    reservas = Reserva.objects.all() if reservas is None else reservas
+    otra = Reserva.objects.filter(
+        habitacion=OuterRef('habitacion'),
+        estado__in=ESTADOS_ACTIVOS,
+        fecha_entrada__lt=OuterRef('fecha_salida'),
+        fecha_salida__gt=OuterRef('fecha_entrada'),
+    ).exclude(pk=OuterRef('pk'))
+    return reservas.filter(estado__in=ESTADOS_ACTIVOS).filter(Exists(otra))
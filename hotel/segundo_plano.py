@@ -0,0 +1,81 @@
+"""
+Pool acotado de hilos para el trabajo bloqueante que no tiene por qué retener a quien
+atiende el pedido: los recálculos pesados de las vistas async (búsquedas de
+disponibilidad, validar y guardar una reserva). Los correos no pasan por acá: van a la
+bandeja de salida (correos.py) y los envía el worker enviar_correos.
+
+- en_segundo_plano(funcion, ...): encola y vuelve enseguida; los errores van al log.
+- await ejecutar(funcion, ...): corre la función en el pool sin bloquear el event loop
+  y devuelve su resultado.
+
+HOTEL_HILOS_BLOQUEANTES fija cuántos hilos tiene el pool (por proceso): es el tope de
+trabajo bloqueante en paralelo, lo que ya esté ocupado espera su turno en la cola. Cada
+tarea cierra al terminar las conexiones a la base que haya abierto su hilo.
+
+Con 0 no hay pool: en_segundo_plano() ejecuta en el mismo hilo y ejecutar() usa
+sync_to_async, el hilo de Django para el pedido. Es el modo de los tests, porque otros
+hilos no ven la transacción abierta de un TestCase.
+"""
+import asyncio
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_hilos = None
+_candado = threading.Lock()
+
+
+def hilos():
+    return getattr(settings, 'HOTEL_HILOS_BLOQUEANTES', 4)
+
+
+def _obtener_pool():
+    global _pool, _pool_hilos
+    with _candado:
+        # Un cambio de HOTEL_HILOS_BLOQUEANTES (override_settings) arma un pool nuevo
+        if _pool is None or _pool_hilos != hilos():
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ThreadPoolExecutor(max_workers=hilos(), thread_name_prefix='hotel-bloqueante')
+            _pool_hilos = hilos()
+        return _pool
+
+
+def _en_hilo(funcion, args, kwargs):
+    try:
+        return funcion(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+def _registrar_error(futuro):
+    error = futuro.exception()
+    if error is not None:
+        logger.error('Falló una tarea en segundo plano', exc_info=error)
+
+
+def en_segundo_plano(funcion, *args, **kwargs):
+    """Ejecuta funcion(*args, **kwargs) en el pool sin esperar el resultado."""
+    if not hilos():
+        try:
+            funcion(*args, **kwargs)
+        except Exception:
+            logger.exception('Falló una tarea en segundo plano')
+        return
+    _obtener_pool().submit(_en_hilo, funcion, args, kwargs).add_done_callback(_registrar_error)
+
+
+async def ejecutar(funcion, *args, **kwargs):
+    """Resultado de funcion(*args, **kwargs), calculado en el pool."""
+    if not hilos():
+        return await sync_to_async(funcion)(*args, **kwargs)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_obtener_pool(), functools.partial(_en_hilo, funcion, args, kwargs))
@@ -0,0 +1,99 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from . import cache_disponibilidad, condicional, portada, tarifas, tarjetas
+from .indice_reservas import indice
+from .models import DescuentoEstadia, Habitacion, Reserva, Tarifa, TipoHabitacion
+from .ocupacion import calendario
+
+# bulk_create/bulk_update/QuerySet.update no emiten post_save: quien escriba reservas o
+# habitaciones en masa envía esta señal (sender=Reserva o Habitacion) con
+# habitacion_ids (None = todas) y el rango [desde, hasta) afectado, si se conoce.
+cambios_masivos = Signal()
+
+
+@receiver(post_save, sender=Reserva)
+def reserva_guardada(sender, instance, **kwargs):
+    indice.registrar_cambio(instance)
+    calendario.registrar_reserva(instance)
+    cache_disponibilidad.invalidar_reserva(instance)
+    portada.invalidar_reserva(instance)
+    tarjetas.invalidar_reserva(instance)
+    condicional.registrar_reserva(instance)
+
+
+@receiver(post_delete, sender=Reserva)
+def reserva_eliminada(sender, instance, **kwargs):
+    indice.registrar_cambio(instance, eliminada=True)
+    calendario.registrar_reserva(instance, eliminada=True)
+    cache_disponibilidad.invalidar_reserva(instance)
+    portada.invalidar_reserva(instance, eliminada=True)
+    tarjetas.invalidar_reserva(instance)
+    condicional.registrar_reserva(instance)
+
+
+@receiver(post_save, sender=Habitacion)
+def habitacion_guardada(sender, instance, update_fields=None, **kwargs):
+    calendario.registrar_habitacion(instance)
+    cache_disponibilidad.invalidar_habitacion(instance, update_fields)
+    portada.invalidar()
+    tarjetas.invalidar_habitaciones([instance.pk])
+    condicional.registrar_general()
+
+
+@receiver(post_delete, sender=Habitacion)
+def habitacion_eliminada(sender, instance, **kwargs):
+    calendario.registrar_habitacion(instance, eliminada=True)
+    cache_disponibilidad.invalidar_habitacion(instance)
+    portada.invalidar()
+    tarjetas.invalidar_habitaciones([instance.pk])
+    condicional.registrar_general()
+
+
+@receiver(post_save, sender=TipoHabitacion)
+@receiver(post_delete, sender=TipoHabitacion)
+def tipo_habitacion_modificado(sender, instance, **kwargs):
+    cache_disponibilidad.invalidar_tipos()
+    portada.invalidar()
+    tarjetas.invalidar_tipo(instance.pk)
+    tarifas.invalidar()
+    condicional.registrar_general()
+
+
+@receiver(post_save, sender=Tarifa)
+@receiver(post_delete, sender=Tarifa)
+@receiver(post_save, sender=DescuentoEstadia)
+@receiver(post_delete, sender=DescuentoEstadia)
+def plan_tarifas_modificado(sender, instance, **kwargs):
+    # Cambian los totales de búsquedas, cotizaciones de la API y reservas nuevas
+    tarifas.invalidar()
+    condicional.registrar_general()
+
+
+@receiver(cambios_masivos)
+def cambios_masivos_aplicados(sender, habitacion_ids=None, desde=None, hasta=None, **kwargs):
+    if habitacion_ids is not None:
+        habitacion_ids = set(habitacion_ids)
+    tipo_ids = None
+    if habitacion_ids is not None and len(habitacion_ids) <= 500:
+        tipo_ids = set(Habitacion.objects.filter(pk__in=habitacion_ids).values_list('tipo_id', flat=True))
+
+    def descartar_en_memoria():
+        indice.invalidar(habitacion_ids)
+        calendario.invalidar()
+
+    # Ahora y otra vez al confirmar: otro hilo podría recargar antes del commit
+    descartar_en_memoria()
+    transaction.on_commit(descartar_en_memoria)
+    cache_disponibilidad.invalidar_masivo(tipo_ids)
+    portada.invalidar()
+    if habitacion_ids is None:
+        tarjetas.invalidar_todas()
+    else:
+        tarjetas.invalidar_habitaciones(habitacion_ids)
+    if sender is Reserva:
+        condicional.registrar_rango(desde, hasta)
+    else:
+        # Cambios de habitaciones (p. ej. estados recalculados): no tienen rango de fechas
+        condicional.registrar_general()
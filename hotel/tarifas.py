@@ -0,0 +1,220 @@
+"""
+Motor de tarifas: precio de una estadía según el plan de tarifas (modelos Tarifa y
+DescuentoEstadia) sobre el precio base de cada tipo de habitación.
+
+Para cada tipo se arma de una vez el vector de precios por noche del horizonte
+[hoy, hoy + HOTEL_TARIFAS_DIAS): se parte del precio base y cada regla activa, en orden
+de prioridad, se aplica sobre el tramo del vector que cubre su rango (cada siete
+posiciones si filtra días de la semana). El vector se guarda como sumas acumuladas en
+centavos, así el subtotal de cualquier estadía del horizonte es una resta,
+acumulado[salida] - acumulado[entrada], y el descuento por duración una búsqueda binaria:
+cotizar miles de (habitación, rango) para una búsqueda no consulta la base ni recorre
+noches.
+
+El tarifario (vectores y descuentos de todos los tipos) se guarda en la caché, y cada
+proceso conserva además el último que usó, bajo una clave con el día y dos sellos que
+cambian con cualquier escritura de Tarifa, DescuentoEstadia o TipoHabitacion (signals.py):
+- la marca general de MarcaCambio (condicional.py), que está en la base y la ven todos
+  los procesos: con una caché por proceso (LocMem, varios workers) un cambio de tarifas
+  hecho en otro worker se nota en la próxima cotización, no al día siguiente. Leerla es
+  una consulta diminuta por tarifario(); los precios que se guardan en las reservas
+  salen de acá, así que no se saltea;
+- una versión en la caché que sube ahora y otra vez al confirmar, como en portada.py:
+  la marca se escribe recién después del commit, y el proceso que cambia las tarifas
+  tiene que verlas ya, también dentro de su transacción.
+Las estadías
+fuera del horizonte (reservas viejas que se editan, fechas muy lejanas) se calculan en el
+momento con las mismas reglas.
+"""
+import time
+from bisect import bisect_right
+from datetime import date, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from itertools import accumulate
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from . import condicional
+
+PREFIJO = 'tarifas'
+# La clave lleva el día: al cambiar la fecha se arma otro tarifario y el viejo vence solo
+TTL = 24 * 60 * 60
+
+_local = None  # (clave, Tarifario) del último tarifario que usó este proceso
+
+
+def habilitado():
+    return getattr(settings, 'HOTEL_CACHE_TARIFAS', True)
+
+
+def dias():
+    return getattr(settings, 'HOTEL_TARIFAS_DIAS', 730)
+
+
+def centavos(precio):
+    return int((Decimal(precio) * 100).to_integral_value(ROUND_HALF_UP))
+
+
+def _redondear(valor):
+    return int(valor.to_integral_value(ROUND_HALF_UP))
+
+
+class Tarifario:
+    """
+    Precios por noche de cada tipo desde `inicio`, como sumas acumuladas en centavos
+    ({tipo_id: [0, p0, p0 + p1, ...]}), y los descuentos por duración de cada tipo como
+    (noches mínimas, mejor porcentaje hasta ahí), de menor a mayor.
+    """
+
+    def __init__(self, inicio, acumulados, descuentos):
+        self.inicio = inicio
+        self.acumulados = acumulados
+        self.descuentos = descuentos
+
+    def cubre(self, tipo_id, entrada, salida):
+        acumulado = self.acumulados.get(tipo_id)
+        return acumulado is not None and entrada >= self.inicio and (salida - self.inicio).days < len(acumulado)
+
+    def descuento(self, tipo_id, noches):
+        """Porcentaje de descuento por duración para una estadía de `noches` noches."""
+        noches_minimas, porcentajes = self.descuentos.get(tipo_id, ((), ()))
+        posicion = bisect_right(noches_minimas, noches)
+        return porcentajes[posicion - 1] if posicion else Decimal('0')
+
+    def total_centavos(self, tipo_id, entrada, salida):
+        """Total en centavos, descuento incluido, o None si la estadía sale del horizonte."""
+        if salida <= entrada:
+            return 0
+        if not self.cubre(tipo_id, entrada, salida):
+            return None
+        acumulado = self.acumulados[tipo_id]
+        subtotal = acumulado[(salida - self.inicio).days] - acumulado[(entrada - self.inicio).days]
+        descuento = self.descuento(tipo_id, (salida - entrada).days)
+        if descuento:
+            subtotal = _redondear(subtotal * (100 - descuento) / 100)
+        return subtotal
+
+    def total(self, tipo_id, entrada, salida):
+        """Precio de la estadía [entrada, salida) en un tipo, con el descuento por duración."""
+        centavos_totales = self.total_centavos(tipo_id, entrada, salida)
+        if centavos_totales is None:
+            return _fuera_de_horizonte(tipo_id, entrada, salida)
+        return Decimal(centavos_totales).scaleb(-2)
+
+
+def _aplicar(vector, inicio, regla):
+    """Aplica una Tarifa sobre `vector` (precios en centavos de las noches desde `inicio`)."""
+    primera = 0 if regla.desde is None else max((regla.desde - inicio).days, 0)
+    ultima = len(vector) if regla.hasta is None else min((regla.hasta - inicio).days + 1, len(vector))
+    if primera >= ultima:
+        return
+    dias_semana = regla.dias()
+    if dias_semana is None:
+        tramos = [range(primera, ultima)]
+    else:
+        dia_primera = (inicio + timedelta(days=primera)).weekday()
+        tramos = [range(primera + (dia - dia_primera) % 7, ultima, 7) for dia in dias_semana]
+    fijo = None if regla.precio_por_noche is None else centavos(regla.precio_por_noche)
+    factor = (100 + regla.porcentaje) / 100
+    for tramo in tramos:
+        for i in tramo:
+            precio = vector[i] if fijo is None else fijo
+            vector[i] = _redondear(precio * factor) if regla.porcentaje else precio
+
+
+def _tabla_descuentos(descuentos):
+    """[(noches_minimas, porcentaje)] -> (noches mínimas, mejor porcentaje acumulado), ordenadas."""
+    noches_minimas, porcentajes = [], []
+    mejor = Decimal('0')
+    for noches, porcentaje in sorted(descuentos):
+        mejor = max(mejor, porcentaje)
+        noches_minimas.append(noches)
+        porcentajes.append(mejor)
+    return noches_minimas, porcentajes
+
+
+def armar(inicio, cantidad_dias, tipo_ids=None):
+    """Tarifario de [inicio, inicio + cantidad_dias) para los tipos pedidos (o todos). Tres consultas."""
+    from .models import DescuentoEstadia, Tarifa, TipoHabitacion
+
+    fin = inicio + timedelta(days=cantidad_dias)
+    tipos = TipoHabitacion.objects.values_list('pk', 'precio_por_noche')
+    if tipo_ids is not None:
+        tipos = tipos.filter(pk__in=tipo_ids)
+    reglas = list(Tarifa.objects.filter(
+        Q(desde__isnull=True) | Q(desde__lt=fin), Q(hasta__isnull=True) | Q(hasta__gte=inicio), activa=True,
+    ).order_by('prioridad', 'id'))
+    descuentos = list(DescuentoEstadia.objects.filter(activo=True).values_list('tipo_id', 'noches_minimas', 'porcentaje'))
+
+    acumulados, tablas = {}, {}
+    for tipo_id, precio_base in tipos:
+        vector = [centavos(precio_base)] * cantidad_dias
+        for regla in reglas:
+            if regla.tipo_id in (None, tipo_id):
+                _aplicar(vector, inicio, regla)
+        acumulados[tipo_id] = list(accumulate(vector, initial=0))
+        tablas[tipo_id] = _tabla_descuentos([(n, p) for tipo, n, p in descuentos if tipo in (None, tipo_id)])
+    return Tarifario(inicio, acumulados, tablas)
+
+
+def _fuera_de_horizonte(tipo_id, entrada, salida):
+    from .models import TipoHabitacion
+
+    tarifario = armar(entrada, (salida - entrada).days, [tipo_id])
+    if tipo_id not in tarifario.acumulados:
+        raise TipoHabitacion.DoesNotExist(f'No existe el tipo de habitación {tipo_id}.')
+    return tarifario.total(tipo_id, entrada, salida)
+
+
+def version():
+    clave = f'{PREFIJO}:version'
+    valor = cache.get(clave)
+    if valor is None:
+        cache.add(clave, time.time_ns(), None)
+        valor = cache.get(clave, 0)
+    return valor
+
+
+def tarifario():
+    """
+    El tarifario vigente desde hoy: de la memoria del proceso, de la caché o recién armado.
+    Una consulta (la marca general) si ya estaba armado.
+    """
+    global _local
+    hoy = date.today()
+    if not habilitado():
+        return armar(hoy, dias())
+    marca = condicional.ultima()
+    sello = int(marca.timestamp() * 1_000_000) if marca else 0
+    clave = f'{PREFIJO}:{version()}:{sello}:{hoy.isoformat()}:{dias()}'
+    local = _local
+    if local is not None and local[0] == clave:
+        return local[1]
+    valor = cache.get(clave)
+    if valor is None:
+        valor = armar(hoy, dias())
+        cache.set(clave, valor, TTL)
+    _local = (clave, valor)
+    return valor
+
+
+def cotizar(tipo_id, entrada, salida):
+    """Precio de la estadía [entrada, salida) en una habitación del tipo, según el plan de tarifas."""
+    return tarifario().total(tipo_id, entrada, salida)
+
+
+# ---- invalidación (llamada desde signals.py) ----
+
+def invalidar():
+    def subir():
+        try:
+            cache.incr(f'{PREFIJO}:version')
+        except ValueError:
+            cache.set(f'{PREFIJO}:version', time.time_ns(), None)
+
+    # Ahora y otra vez al confirmar: otro hilo podría armar el tarifario antes del commit
+    subir()
+    transaction.on_commit(subir)
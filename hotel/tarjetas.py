@@ -0,0 +1,113 @@
+"""
+Versión por habitación para cachear el HTML de su tarjeta en los listados.
+
+Los templates envuelven cada tarjeta en {% cache %} con `habitacion.version_tarjeta`
+en la clave (más lo que varíe por pedido: sesión, fechas, día). `versionar()` la
+asigna a todas las habitaciones de un listado con un solo get_many; así un listado de
+mil habitaciones es, en el caso común, mil fragmentos ya armados.
+
+La versión de una tarjeta combina tres contadores en la caché:
+- el de la habitación, que sube con cada escritura de la habitación o de sus reservas;
+- el de su tipo (nombre, precio, capacidad se muestran en la tarjeta);
+- uno general, para escrituras masivas sin lista de habitaciones.
+Como en cache_disponibilidad, se suben al escribir y otra vez al confirmar, y con una
+caché por proceso (LocMem) sólo en el worker que escribe: en los demás la tarjeta vive
+hasta su TTL, que por eso es corto (HOTEL_CACHE_TARJETAS_TTL, ver settings.py).
+Al confirmar, cada contador sube una sola vez por transacción (al_confirmar.py); con la
+caché de tarjetas apagada no sube nada.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .al_confirmar import Pendientes
+
+PREFIJO = 'tarjeta'
+# Por encima de esta cantidad de habitaciones, una escritura masiva sube la versión general
+MAXIMO_INDIVIDUALES = 500
+
+
+def habilitado():
+    return getattr(settings, 'HOTEL_CACHE_TARJETAS', True)
+
+
+def ttl():
+    """Segundos que vive cada fragmento (0 si la caché de tarjetas está apagada)."""
+    return getattr(settings, 'HOTEL_CACHE_TARJETAS_TTL', 30) if habilitado() else 0
+
+
+def _clave_general():
+    return f'{PREFIJO}:v'
+
+
+def _clave_tipo(tipo_id):
+    return f'{PREFIJO}:v:tipo:{tipo_id}'
+
+
+def _clave_habitacion(habitacion_id):
+    return f'{PREFIJO}:v:hab:{habitacion_id}'
+
+
+def versionar(habitaciones):
+    """Asigna `version_tarjeta` a cada habitación (con tipo_id cargado). Devuelve la lista."""
+    habitaciones = list(habitaciones)
+    if not habitaciones or not habilitado():
+        return habitaciones
+    claves = {_clave_general()}
+    for habitacion in habitaciones:
+        claves.add(_clave_tipo(habitacion.tipo_id))
+        claves.add(_clave_habitacion(habitacion.pk))
+    versiones = cache.get_many(list(claves))
+    faltantes = {clave: time.time_ns() for clave in claves if clave not in versiones}
+    if faltantes:
+        for clave, valor in faltantes.items():
+            cache.add(clave, valor, None)
+        versiones.update(cache.get_many(list(faltantes)))
+
+    general = versiones.get(_clave_general(), 0)
+    for habitacion in habitaciones:
+        habitacion.version_tarjeta = (
+            f'{general}.{versiones.get(_clave_tipo(habitacion.tipo_id), 0)}'
+            f'.{versiones.get(_clave_habitacion(habitacion.pk), 0)}'
+        )
+    return habitaciones
+
+
+def _subir_ya(claves):
+    for clave in sorted(claves):
+        try:
+            cache.incr(clave)
+        except ValueError:
+            cache.set(clave, time.time_ns(), None)
+
+
+_pendientes = Pendientes(_subir_ya)
+
+
+def _subir(claves):
+    # Ahora (la misma transacción puede volver a pintar la tarjeta) y otra vez al confirmar
+    if habilitado():
+        _pendientes.agregar(claves)
+        _subir_ya(claves)
+
+
+def invalidar_habitaciones(habitacion_ids):
+    habitacion_ids = {pk for pk in habitacion_ids if pk is not None}
+    if len(habitacion_ids) > MAXIMO_INDIVIDUALES:
+        invalidar_todas()
+    elif habitacion_ids:
+        _subir(sorted(_clave_habitacion(pk) for pk in habitacion_ids))
+
+
+def invalidar_reserva(reserva):
+    originales = reserva.valores_originales() or {}
+    invalidar_habitaciones({reserva.habitacion_id, originales.get('habitacion_id')})
+
+
+def invalidar_tipo(tipo_id):
+    _subir([_clave_tipo(tipo_id)])
+
+
+def invalidar_todas():
+    _subir([_clave_general()])
@@ -39,6 +39,8 @@ class ModelTests(TestCase):
     def test_reserva_actual_actualiza_estado(self):
         entrada = date.today()
         salida = entrada + timedelta(days=2)
-        r = Reserva.objects.create(cliente=self.user, habitacion=self.hab, fecha_entrada=entrada, fecha_salida=salida, numero_huespedes=1, estado='confirmada')
+        # El estado se recalcula al confirmar la transacción (estado_habitaciones.programar)
+        with self.captureOnCommitCallbacks(execute=True):
+            r = Reserva.objects.create(cliente=self.user, habitacion=self.hab, fecha_entrada=entrada, fecha_salida=salida, numero_huespedes=1, estado='confirmada')
         self.hab.refresh_from_db()
         self.assertEqual(self.hab.estado, 'ocupada')
@@ -1,9 +1,34 @@
-from django.test import TestCase
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils import timezone
 from datetime import date, timedelta
 from decimal import Decimal
-from .models import TipoHabitacion, Habitacion, Reserva
+from .models import TipoHabitacion, Habitacion, Reserva, PerfilUsuario, CorreoPendiente, Tarifa, DescuentoEstadia, ResumenDiario
+from . import avisos, cache_disponibilidad, condicional, correos, email_utils, estado_habitaciones, portada, reportes, segundo_plano, tarifas, vencimientos
+from . import reservas as servicio_reservas
+from .benchmarks import SMTPLocal
+from .reservas import reservas_solapadas
+from .signals import cambios_masivos
+from .management.commands import stress_reservas
+from .disponibilidad import busqueda_flexible, combinaciones_para_grupo, habitaciones_libres, tipos_disponibles
+from .indice_reservas import indice
+from .ocupacion import calendario, construir, para_rango
+import asyncio
+import csv
+import os
+import tempfile
+import threading
 import time
+from io import StringIO
+from unittest import mock
 
 # -------------------------
 # Tests unitarios existentes
@@ -43,7 +68,9 @@ class ModelTests(TestCase):
     def test_reserva_actual_actualiza_estado(self):
         entrada = date.today()
         salida = entrada + timedelta(days=2)
-        r = Reserva.objects.create(cliente=self.user, habitacion=self.hab, fecha_entrada=entrada, fecha_salida=salida, numero_huespedes=1, estado='confirmada')
+        # El estado se recalcula al confirmar la transacción (estado_habitaciones.programar)
+        with self.captureOnCommitCallbacks(execute=True):
+            r = Reserva.objects.create(cliente=self.user, habitacion=self.hab, fecha_entrada=entrada, fecha_salida=salida, numero_huespedes=1, estado='confirmada')
         self.hab.refresh_from_db()
         self.assertEqual(self.hab.estado, 'ocupada')
 
@@ -107,3 +134,1596 @@ class PerformanceTests(TestCase):
 
         self.assertLess(duration, 0.5, "La consulta de próximas reservas es demasiado lenta.")
         self.assertEqual(len(reservas), 3, "Debe devolver las 3 próximas reservas.")
+
+
+# -------------------------
+# Servicio de disponibilidad
+# -------------------------
+class DisponibilidadServiceTests(TestCase):
+    def setUp(self):
+        self.doble = TipoHabitacion.objects.create(
+            nombre='doble', precio_por_noche=Decimal('25000.00'), capacidad_maxima=2
+        )
+        self.suite = TipoHabitacion.objects.create(
+            nombre='suite', precio_por_noche=Decimal('50000.00'), capacidad_maxima=4
+        )
+        self.user = User.objects.create_user(username='cliente', password='pass')
+        self.habitaciones = [
+            Habitacion.objects.create(numero=str(100 + i), tipo=self.doble if i % 2 else self.suite, piso=1)
+            for i in range(6)
+        ]
+        self.entrada = date.today() + timedelta(days=5)
+        self.salida = self.entrada + timedelta(days=3)
+        # Conflicto real, reserva cancelada (no bloquea) y reserva contigua (no se solapa)
+        Reserva.objects.create(cliente=self.user, habitacion=self.habitaciones[0], fecha_entrada=self.entrada,
+                               fecha_salida=self.salida, numero_huespedes=1, estado='confirmada')
+        Reserva.objects.create(cliente=self.user, habitacion=self.habitaciones[1], fecha_entrada=self.entrada,
+                               fecha_salida=self.salida, numero_huespedes=1, estado='cancelada')
+        Reserva.objects.create(cliente=self.user, habitacion=self.habitaciones[2], fecha_entrada=self.salida,
+                               fecha_salida=self.salida + timedelta(days=2), numero_huespedes=1)
+        Habitacion.objects.filter(pk=self.habitaciones[3].pk).update(estado='mantenimiento')
+
+    def test_coincide_con_esta_disponible(self):
+        esperadas = {h.pk for h in Habitacion.objects.all() if h.esta_disponible(self.entrada, self.salida)}
+        obtenidas = set(habitaciones_libres(self.entrada, self.salida).values_list('pk', flat=True))
+        self.assertEqual(obtenidas, esperadas)
+        self.assertNotIn(self.habitaciones[0].pk, obtenidas)
+        self.assertNotIn(self.habitaciones[3].pk, obtenidas)
+
+    def test_filtros_tipo_y_huespedes(self):
+        libres = habitaciones_libres(self.entrada, self.salida, huespedes=3)
+        self.assertTrue(all(h.tipo == self.suite for h in libres))
+        libres = habitaciones_libres(self.entrada, self.salida, tipo='doble')
+        self.assertTrue(all(h.tipo == self.doble for h in libres))
+
+    def test_agrupacion_por_tipo_con_consultas_constantes(self):
+        with self.assertNumQueries(2):
+            tipos = list(tipos_disponibles(self.entrada, self.salida))
+            conteos = {t.nombre: (t.libres, len(t.habitaciones_libres)) for t in tipos}
+        self.assertEqual(conteos, {'doble': (2, 2), 'suite': (2, 2)})
+
+        for i in range(20):
+            Habitacion.objects.create(numero=f'9{i:02d}', tipo=self.doble, piso=9)
+        with self.assertNumQueries(2):
+            tipos = list(tipos_disponibles(self.entrada, self.salida))
+            [h.tipo.precio_por_noche for t in tipos for h in t.habitaciones_libres]
+
+
+# -------------------------
+# Índice en memoria de reservas
+# -------------------------
+@override_settings(HOTEL_INDICE_RESERVAS=True, HOTEL_INDICE_RESERVAS_TTL=None)
+class IndiceReservasTests(TestCase):
+    def setUp(self):
+        indice.invalidar()
+        self.addCleanup(indice.invalidar)
+        self.tipo = TipoHabitacion.objects.create(
+            nombre='doble', precio_por_noche=Decimal('25000.00'), capacidad_maxima=2
+        )
+        self.hab = Habitacion.objects.create(numero='101', tipo=self.tipo, piso=1)
+        self.user = User.objects.create_user(username='cliente', password='pass')
+        self.entrada = date.today() + timedelta(days=10)
+        self.salida = self.entrada + timedelta(days=3)
+
+    def reservar(self, entrada, salida, estado='confirmada'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Reserva.objects.create(cliente=self.user, habitacion=self.hab, fecha_entrada=entrada,
+                                          fecha_salida=salida, numero_huespedes=1, estado=estado)
+
+    def test_consulta_sin_sql_y_actualizada_por_senales(self):
+        self.reservar(self.entrada, self.salida)
+        self.assertFalse(self.hab.esta_disponible(self.entrada, self.salida))  # carga perezosa
+        with self.assertNumQueries(0):
+            self.assertFalse(self.hab.esta_disponible(self.entrada + timedelta(days=2), self.salida + timedelta(days=5)))
+            self.assertTrue(self.hab.esta_disponible(self.salida, self.salida + timedelta(days=2)))
+            self.assertTrue(self.hab.esta_disponible(self.entrada - timedelta(days=3), self.entrada))
+
+        reserva = Reserva.objects.get(habitacion=self.hab)
+        with self.captureOnCommitCallbacks(execute=True):
+            reserva.estado = 'cancelada'
+            reserva.save()
+        with self.assertNumQueries(0):
+            self.assertTrue(self.hab.esta_disponible(self.entrada, self.salida))
+
+    def test_reserva_larga_solapada_se_detecta(self):
+        # Reservas antiguas que se solapan entre sí no deben engañar a la búsqueda binaria
+        r = self.reservar(self.entrada, self.entrada + timedelta(days=30))
+        Reserva.objects.bulk_create([Reserva(
+            cliente=self.user, habitacion=self.hab, fecha_entrada=self.entrada + timedelta(days=1),
+            fecha_salida=self.entrada + timedelta(days=2), numero_huespedes=1, estado='pendiente',
+        )])
+        indice.invalidar([self.hab.pk])
+        dia = self.entrada + timedelta(days=20)
+        self.assertFalse(self.hab.esta_disponible(dia, dia + timedelta(days=1)))
+        self.assertTrue(self.hab.esta_disponible(r.fecha_salida, r.fecha_salida + timedelta(days=1)))
+
+    def test_transaccion_en_curso_usa_sql(self):
+        self.assertTrue(self.hab.esta_disponible(self.entrada, self.salida))  # índice cargado sin reservas
+        Reserva.objects.create(cliente=self.user, habitacion=self.hab, fecha_entrada=self.entrada,
+                               fecha_salida=self.salida, numero_huespedes=1, estado='confirmada')
+        # Sin commit la habitación queda "sucia" y se consulta por SQL
+        self.assertFalse(indice.usable_para(self.hab.pk))
+        self.assertFalse(self.hab.esta_disponible(self.entrada, self.salida))
+
+    def test_verificar_detecta_y_repara_desvios(self):
+        self.reservar(self.entrada, self.salida)
+        self.assertFalse(self.hab.esta_disponible(self.entrada, self.salida))
+        self.assertEqual(indice.verificar(), [])
+
+        Reserva.objects.filter(habitacion=self.hab).update(estado='cancelada')  # sin señales
+        self.assertEqual(indice.verificar(reparar=True), [self.hab.pk])
+        self.assertEqual(indice.verificar(), [])
+        self.assertTrue(self.hab.esta_disponible(self.entrada, self.salida))
+
+    @override_settings(HOTEL_INDICE_RESERVAS=False)
+    def test_desactivado_usa_sql(self):
+        self.reservar(self.entrada, self.salida)
+        with self.assertNumQueries(1):
+            self.assertFalse(self.hab.esta_disponible(self.entrada, self.salida))
+
+
+# -------------------------
+# Calendario de ocupación en bits
+# -------------------------
+class CalendarioOcupacionTests(TestCase):
+    def setUp(self):
+        calendario.invalidar()
+        self.addCleanup(calendario.invalidar)
+        self.doble = TipoHabitacion.objects.create(
+            nombre='doble', precio_por_noche=Decimal('25000.00'), capacidad_maxima=2
+        )
+        self.suite = TipoHabitacion.objects.create(
+            nombre='suite', precio_por_noche=Decimal('50000.00'), capacidad_maxima=4
+        )
+        self.user = User.objects.create_user(username='cliente', password='pass')
+        self.hoy = date.today()
+        self.habs = [
+            Habitacion.objects.create(numero=str(100 + i), tipo=self.doble if i < 3 else self.suite, piso=1)
+            for i in range(5)
+        ]
+        # hab 0: ocupada días 2-5; hab 1: días 0-10; hab 3: días 4-6 (cancelada) y 6-8
+        self.reservar(self.habs[0], 2, 5)
+        self.reservar(self.habs[1], 0, 10, estado='pendiente')
+        self.reservar(self.habs[3], 4, 6, estado='cancelada')
+        self.reservar(self.habs[3], 6, 8)
+
+    def reservar(self, habitacion, desde, hasta, estado='confirmada'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Reserva.objects.create(
+                cliente=self.user, habitacion=habitacion, numero_huespedes=1, estado=estado,
+                fecha_entrada=self.hoy + timedelta(days=desde), fecha_salida=self.hoy + timedelta(days=hasta),
+            )
+
+    def dia(self, n):
+        return self.hoy + timedelta(days=n)
+
+    def test_libres_coincide_con_sql(self):
+        cal = construir(self.hoy, 30)
+        for a in range(0, 12):
+            for b in range(a + 1, 14):
+                esperadas = set(habitaciones_libres(self.dia(a), self.dia(b)).values_list('pk', flat=True))
+                self.assertEqual(set(cal.libres(self.dia(a), self.dia(b))), esperadas, (a, b))
+
+    def test_libres_por_noche_y_por_tipo(self):
+        cal = construir(self.hoy, 30)
+        noches = dict(cal.libres_por_noche(self.dia(0), self.dia(8), tipo_ids=[self.doble.pk]))
+        self.assertEqual(noches[self.dia(0)], 2)   # hab 1 ocupada
+        self.assertEqual(noches[self.dia(3)], 1)   # hab 0 y 1 ocupadas
+        total = dict(cal.libres_por_noche(self.dia(0), self.dia(8)))
+        self.assertEqual(total[self.dia(6)], 3)    # hab 1 y 3 ocupadas
+
+    def test_primer_hueco(self):
+        cal = construir(self.hoy, 30)
+        self.assertEqual(cal.primer_hueco(3, habitacion_id=self.habs[0].pk), (self.dia(5), [self.habs[0].pk]))
+        self.assertEqual(cal.primer_hueco(2, habitacion_id=self.habs[1].pk)[0], self.dia(10))
+        fecha, ids = cal.primer_hueco(7, tipo_ids=[self.suite.pk])
+        self.assertEqual((fecha, ids), (self.dia(0), [self.habs[4].pk]))
+        Habitacion.objects.filter(pk=self.habs[4].pk).update(estado='mantenimiento')
+        cal = construir(self.hoy, 30)
+        self.assertEqual(cal.primer_hueco(5, tipo_ids=[self.suite.pk])[0], self.dia(0))
+        self.assertEqual(cal.primer_hueco(7, tipo_ids=[self.suite.pk]), (self.dia(8), [self.habs[3].pk]))
+
+    @override_settings(HOTEL_CALENDARIO_OCUPACION=True, HOTEL_CALENDARIO_OCUPACION_TTL=None)
+    def test_actualizacion_incremental_igual_a_reconstruir(self):
+        cal = calendario.obtener()
+        reserva = Reserva.objects.get(habitacion=self.habs[0])
+        with self.captureOnCommitCallbacks(execute=True):
+            reserva.fecha_entrada, reserva.fecha_salida = self.dia(12), self.dia(15)
+            reserva.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            Reserva.objects.get(habitacion=self.habs[3], estado='confirmada').delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.habs[2].estado = 'mantenimiento'
+            self.habs[2].save()
+        self.reservar(self.habs[4], 1, 3)
+
+        self.assertIs(calendario.obtener(), cal)
+        nuevo = construir(self.hoy, cal.dias)
+        self.assertEqual(cal.noches, nuevo.noches)
+        with self.assertNumQueries(0):
+            libres = set(cal.libres(self.dia(2), self.dia(4)))
+        self.assertEqual(libres, set(nuevo.libres(self.dia(2), self.dia(4))))
+        self.assertEqual(libres, {self.habs[0].pk, self.habs[3].pk})
+
+    def test_calendario_mensual_json(self):
+        respuesta = self.client.get(f'/calendario/{self.hoy.year}/{self.hoy.month}/')
+        self.assertEqual(respuesta.status_code, 200)
+        datos = respuesta.json()
+        self.assertEqual(len(datos['noches']), len(datos['total']))
+        self.assertEqual(set(datos['tipos']), {'doble', 'suite'})
+
+        for url in ('/calendario/9999/12/', '/calendario/2024/13/', '/calendario/0/1/'):
+            self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class CacheDisponibilidadTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        # Marcas de escrituras de tests anteriores (el TestCase nunca confirma)
+        cache_disponibilidad._cambios.actuales().clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.doble = TipoHabitacion.objects.create(
+                nombre='doble', precio_por_noche=Decimal('25000.00'), capacidad_maxima=2
+            )
+            self.suite = TipoHabitacion.objects.create(
+                nombre='suite', precio_por_noche=Decimal('60000.00'), capacidad_maxima=4
+            )
+            self.hab_doble = Habitacion.objects.create(numero='101', tipo=self.doble, piso=1)
+            self.hab_suite = Habitacion.objects.create(numero='301', tipo=self.suite, piso=3)
+        self.user = User.objects.create_user(username='cliente', password='pass')
+        hoy = date.today()
+        self.mes_siguiente = (hoy.replace(day=1) + timedelta(days=32)).replace(day=1)
+        self.entrada = self.mes_siguiente + timedelta(days=2)
+        self.salida = self.entrada + timedelta(days=3)
+
+    def reservar(self, habitacion, entrada, salida):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Reserva.objects.create(cliente=self.user, habitacion=habitacion, fecha_entrada=entrada,
+                                          fecha_salida=salida, numero_huespedes=1, estado='confirmada')
+
+    def buscar(self, tipo=None, entrada=None, salida=None):
+        return set(habitaciones_libres(entrada or self.entrada, salida or self.salida, tipo))
+
+    def test_busqueda_repetida_es_acierto(self):
+        self.assertEqual(self.buscar(), {self.hab_doble, self.hab_suite})
+        self.assertEqual(self.buscar(), {self.hab_doble, self.hab_suite})
+        stats = cache_disponibilidad.estadisticas()
+        self.assertEqual((stats['aciertos'], stats['fallos']), (1, 1))
+        self.assertEqual(stats['tasa_aciertos'], 0.5)
+
+    def test_reserva_invalida_solo_su_tipo_y_mes(self):
+        mas_adelante = self.entrada + timedelta(days=62)
+        self.buscar('doble')
+        self.buscar('suite')
+        self.buscar('doble', mas_adelante, mas_adelante + timedelta(days=2))
+        cache_disponibilidad.reiniciar_estadisticas()
+
+        self.reservar(self.hab_doble, self.entrada, self.salida)
+
+        self.assertEqual(self.buscar('doble'), set())
+        self.assertEqual(self.buscar('suite'), {self.hab_suite})
+        self.assertEqual(self.buscar('doble', mas_adelante, mas_adelante + timedelta(days=2)), {self.hab_doble})
+        stats = cache_disponibilidad.estadisticas()
+        self.assertEqual((stats['aciertos'], stats['fallos']), (2, 1))
+
+    def test_mover_reserva_invalida_la_ventana_anterior(self):
+        reserva = self.reservar(self.hab_doble, self.entrada, self.salida)
+        self.assertEqual(self.buscar('doble'), set())
+
+        reserva = Reserva.objects.get(pk=reserva.pk)
+        reserva.fecha_entrada += timedelta(days=40)
+        reserva.fecha_salida += timedelta(days=40)
+        with self.captureOnCommitCallbacks(execute=True):
+            reserva.save()
+        self.assertEqual(self.buscar('doble'), {self.hab_doble})
+
+    def test_cambio_de_estado_de_habitacion_invalida(self):
+        self.assertIn(self.hab_suite, self.buscar())
+        self.hab_suite.estado = 'mantenimiento'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hab_suite.save()
+        self.assertNotIn(self.hab_suite, self.buscar())
+
+    def test_transaccion_sin_confirmar_no_usa_cache(self):
+        self.buscar()
+        Reserva.objects.create(cliente=self.user, habitacion=self.hab_doble, fecha_entrada=self.entrada,
+                               fecha_salida=self.salida, numero_huespedes=1, estado='confirmada')
+        self.assertFalse(cache_disponibilidad.usable())
+        self.assertEqual(self.buscar(), {self.hab_suite})
+
+    @override_settings(HOTEL_CACHE_DISPONIBILIDAD=False)
+    def test_deshabilitada_no_cuenta(self):
+        self.buscar()
+        self.buscar()
+        self.assertEqual(cache_disponibilidad.estadisticas()['fallos'], 0)
+
+
+class BusquedaFlexibleTests(TestCase):
+    def setUp(self):
+        calendario.invalidar()
+        self.addCleanup(calendario.invalidar)
+        self.doble = TipoHabitacion.objects.create(
+            nombre='doble', precio_por_noche=Decimal('25000.00'), capacidad_maxima=2
+        )
+        self.suite = TipoHabitacion.objects.create(
+            nombre='suite', precio_por_noche=Decimal('60000.00'), capacidad_maxima=4
+        )
+        self.dobles = [Habitacion.objects.create(numero=f'10{i}', tipo=self.doble, piso=1) for i in range(2)]
+        self.hab_suite = Habitacion.objects.create(numero='301', tipo=self.suite, piso=3)
+        self.user = User.objects.create_user(username='cliente', password='pass')
+        self.base = date.today() + timedelta(days=20)
+        for hab, desde, hasta in [(self.dobles[0], 0, 4), (self.dobles[1], 2, 3), (self.hab_suite, -2, 1)]:
+            Reserva.objects.create(cliente=self.user, habitacion=hab, fecha_entrada=self.dia(desde),
+                                   fecha_salida=self.dia(hasta), numero_huespedes=1, estado='confirmada')
+        # El plan de tarifas ya armado, como en régimen: la búsqueda sólo lee su marca
+        tarifas.tarifario()
+
+    def dia(self, n):
+        return self.base + timedelta(days=n)
+
+    def test_coincide_con_busquedas_individuales(self):
+        with self.assertNumQueries(4):
+            tipos, filas = busqueda_flexible(self.base, 2, 3)
+        self.assertEqual(tipos, [self.doble, self.suite])
+        self.assertEqual([f['fecha_entrada'] for f in filas], [self.dia(n) for n in range(-3, 4)])
+        for fila in filas:
+            esperadas = set(habitaciones_libres(fila['fecha_entrada'], fila['fecha_salida']))
+            self.assertEqual(fila['libres'], len(esperadas))
+            self.assertEqual(fila['por_tipo'], [
+                sum(1 for h in esperadas if h.tipo_id == t.pk) for t in tipos
+            ])
+
+        por_fecha = {f['fecha_entrada']: f for f in filas}
+        self.assertEqual(por_fecha[self.dia(-3)]['por_tipo'], [2, 0])
+        self.assertEqual(por_fecha[self.dia(1)]['por_tipo'], [0, 1])
+        self.assertEqual(por_fecha[self.dia(1)]['precio_minimo'], Decimal('120000.00'))
+        self.assertEqual(por_fecha[self.dia(1)]['tipo_mas_barato'], self.suite)
+        self.assertEqual(por_fecha[self.dia(3)]['precio_minimo'], Decimal('50000.00'))
+
+    def test_no_ofrece_fechas_pasadas(self):
+        _, filas = busqueda_flexible(date.today() + timedelta(days=1), 2, 3)
+        self.assertEqual(filas[0]['fecha_entrada'], date.today())
+
+    def test_vista_muestra_matriz(self):
+        url = reverse('habitaciones_disponibles', args=[self.base.isoformat(), self.dia(2).isoformat()])
+        response = self.client.get(url, {'flexible': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['flexible_filas']), 5)
+        self.assertContains(response, 'Fechas flexibles')
+
+
+@override_settings(HOTEL_CACHE_DISPONIBILIDAD=False)
+class CombinacionesGrupoTests(TestCase):
+    def setUp(self):
+        self.tipos = {
+            nombre: TipoHabitacion.objects.create(nombre=nombre, precio_por_noche=Decimal(precio), capacidad_maxima=capacidad)
+            for nombre, precio, capacidad in [('individual', '20000.00', 1), ('doble', '30000.00', 2), ('familiar', '70000.00', 4)]
+        }
+        self.entrada = date.today() + timedelta(days=5)
+        self.salida = self.entrada + timedelta(days=2)
+
+    def crear(self, nombre, cantidad):
+        inicio = Habitacion.objects.count()
+        Habitacion.objects.bulk_create([
+            Habitacion(numero=f'{nombre[0]}{inicio + i}', tipo=self.tipos[nombre], piso=1) for i in range(cantidad)
+        ])
+
+    def test_mas_barata_y_menos_habitaciones(self):
+        self.crear('doble', 3)
+        self.crear('familiar', 2)
+        tarifas.tarifario()
+        with self.assertNumQueries(3):
+            opciones = combinaciones_para_grupo(self.entrada, self.salida, 8)
+        por_criterio = {o['criterio']: o for o in opciones}
+
+        barata = por_criterio['mas_barata']
+        self.assertEqual({t['tipo__nombre']: n for t, n in barata['tipos']}, {'doble': 2, 'familiar': 1})
+        self.assertEqual(barata['precio_total'], Decimal('260000.00'))
+        self.assertEqual(len(barata['habitaciones']), 3)
+
+        pocas = por_criterio['menos_habitaciones']
+        self.assertEqual(pocas['cantidad'], 2)
+        self.assertEqual(pocas['capacidad'], 8)
+
+        url = reverse('habitaciones_disponibles', args=[self.entrada.isoformat(), self.salida.isoformat()])
+        response = self.client.get(url, {'huespedes': 8})
+        self.assertEqual(len(response.context['opciones_grupo']), 2)
+        self.assertContains(response, 'Opciones para 8 huéspedes')
+
+    def test_respeta_disponibilidad(self):
+        self.crear('doble', 2)
+        user = User.objects.create_user(username='cliente', password='pass')
+        Reserva.objects.create(cliente=user, habitacion=Habitacion.objects.first(), fecha_entrada=self.entrada,
+                               fecha_salida=self.salida, numero_huespedes=1, estado='confirmada')
+        self.assertEqual(combinaciones_para_grupo(self.entrada, self.salida, 3), [])
+        self.assertEqual(combinaciones_para_grupo(self.entrada, self.salida, 2)[0]['cantidad'], 1)
+
+    def test_hotel_grande_y_grupo_numeroso(self):
+        self.crear('individual', 150)
+        self.crear('doble', 150)
+        self.crear('familiar', 50)
+        inicio = time.time()
+        opciones = combinaciones_para_grupo(self.entrada, self.salida, 45)
+        self.assertLess(time.time() - inicio, 1)
+        por_criterio = {o['criterio']: o for o in opciones}
+        # 45 personas: 22 dobles (lo más barato por persona) y una individual
+        self.assertEqual(por_criterio['mas_barata']['precio_total'], Decimal('1360000.00'))
+        self.assertEqual(str(por_criterio['mas_barata']['precio_total']), '1360000.00')
+        self.assertEqual(por_criterio['menos_habitaciones']['cantidad'], 12)
+
+
+class ImportarReservasTests(TestCase):
+    def setUp(self):
+        doble = TipoHabitacion.objects.create(nombre='doble', precio_por_noche=Decimal('25000.00'), capacidad_maxima=2)
+        self.h1 = Habitacion.objects.create(numero='101', tipo=doble, piso=1)
+        self.h2 = Habitacion.objects.create(numero='102', tipo=doble, piso=1)
+        self.user = User.objects.create_user(username='ana', password='pass')
+        self.hoy = date.today()
+        Reserva.objects.create(cliente=self.user, habitacion=self.h2, fecha_entrada=self.dia(10),
+                               fecha_salida=self.dia(12), numero_huespedes=1, estado='confirmada')
+        self.directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directorio.cleanup)
+
+    def dia(self, n):
+        return (self.hoy + timedelta(days=n)).isoformat()
+
+    def importar(self, filas, *args):
+        ruta = os.path.join(self.directorio.name, 'reservas.csv')
+        with open(ruta, 'w', newline='') as archivo:
+            escritor = csv.writer(archivo)
+            escritor.writerow(['habitacion', 'cliente', 'fecha_entrada', 'fecha_salida', 'numero_huespedes', 'estado'])
+            escritor.writerows(filas)
+        call_command('importar_reservas', ruta, *args, stdout=StringIO())
+        with open(ruta + '.rechazos.csv', newline='') as archivo:
+            return [(int(f['linea']), f['motivo']) for f in csv.DictReader(archivo)]
+
+    def test_importa_y_rechaza_solapamientos_e_invalidas(self):
+        rechazos = self.importar([
+            ['101', 'ana', self.dia(1), self.dia(4), 2, 'confirmada'],
+            ['101', 'ana', self.dia(3), self.dia(5), 1, ''],            # pisa la fila anterior
+            ['101', 'ana', self.dia(4), self.dia(6), 1, ''],            # empieza el día que sale la primera
+            ['102', 'ana', self.dia(11), self.dia(13), 1, ''],          # pisa una reserva existente
+            ['102', 'ana', self.dia(11), self.dia(13), 1, 'cancelada'], # cancelada: no ocupa
+            ['999', 'ana', self.dia(1), self.dia(2), 1, ''],
+            ['101', 'nadie', self.dia(8), self.dia(9), 1, ''],
+            ['101', 'ana', self.dia(9), self.dia(8), 1, ''],
+            ['101', 'ana', self.dia(8), self.dia(9), 3, ''],
+        ])
+
+        self.assertEqual(sorted(linea for linea, _ in rechazos), [3, 5, 7, 8, 9, 10])
+        self.assertIn('existente', dict(rechazos)[5])
+        self.assertEqual(Reserva.objects.count(), 4)
+        self.assertFalse(reservas_solapadas().exists())
+        primera = Reserva.objects.get(habitacion=self.h1, fecha_entrada=self.dia(1))
+        self.assertEqual(primera.precio_total, Decimal('75000.00'))
+        self.assertEqual(Reserva.objects.get(habitacion=self.h1, fecha_entrada=self.dia(4)).estado, 'pendiente')
+        # El índice se entera de las escrituras masivas
+        self.assertTrue(indice.hay_conflicto(self.h1.pk, self.hoy + timedelta(days=2), self.hoy + timedelta(days=3)))
+
+    def test_precio_sale_del_plan_de_tarifas(self):
+        # +20% en dos noches del horizonte y en una temporada de hace dos años (fuera de él)
+        pasado = self.hoy.replace(month=1, day=10, year=self.hoy.year - 2)
+        Tarifa.objects.create(nombre='Alta', desde=self.hoy + timedelta(days=20), hasta=self.hoy + timedelta(days=21),
+                              porcentaje=Decimal('20'))
+        Tarifa.objects.create(nombre='Alta pasada', desde=pasado, hasta=pasado, porcentaje=Decimal('20'))
+        self.importar([
+            ['101', 'ana', self.dia(20), self.dia(22), 1, ''],
+            ['101', 'ana', pasado.isoformat(), (pasado + timedelta(days=2)).isoformat(), 1, 'completada'],
+        ])
+        self.assertEqual(Reserva.objects.get(habitacion=self.h1, fecha_entrada=self.dia(20)).precio_total,
+                         Decimal('60000.00'))
+        self.assertEqual(Reserva.objects.get(habitacion=self.h1, fecha_entrada=pasado).precio_total,
+                         Decimal('55000.00'))
+
+    def test_simular_no_escribe_y_crear_clientes(self):
+        filas = [['101', 'nuevo@hotel.cl', self.dia(1), self.dia(2), 1, '']]
+        self.assertEqual(self.importar(filas, '--crear-clientes', '--simular'), [])
+        self.assertEqual(Reserva.objects.count(), 1)
+
+        self.importar(filas, '--crear-clientes')
+        nuevo = User.objects.get(username='nuevo@hotel.cl')
+        self.assertFalse(nuevo.has_usable_password())
+        self.assertEqual(Reserva.objects.filter(cliente=nuevo).count(), 1)
+
+    def test_lote_fallido_avisa_lo_ya_escrito(self):
+        bulk_create = Reserva.objects.bulk_create
+        llamadas = []
+
+        def fallar_en_el_segundo(*args, **kwargs):
+            llamadas.append(1)
+            if len(llamadas) == 2:
+                raise DatabaseError('falla simulada')
+            return bulk_create(*args, **kwargs)
+
+        with mock.patch.object(Reserva.objects, 'bulk_create', side_effect=fallar_en_el_segundo), \
+                mock.patch.object(cambios_masivos, 'send', wraps=cambios_masivos.send) as enviar:
+            with self.assertRaises(DatabaseError):
+                self.importar([
+                    ['101', 'ana', self.dia(0), self.dia(2), 1, 'confirmada'],
+                    ['102', 'ana', self.dia(20), self.dia(21), 1, 'confirmada'],
+                ], '--lote', '1')
+
+        # El primer lote quedó escrito: la habitación pasa a ocupada y la señal masiva lo cubre
+        self.assertTrue(Reserva.objects.filter(habitacion=self.h1).exists())
+        self.assertFalse(Reserva.objects.filter(habitacion=self.h2, fecha_entrada=self.dia(20)).exists())
+        self.h1.refresh_from_db()
+        self.assertEqual(self.h1.estado, 'ocupada')
+        enviar.assert_called_once()
+        self.assertEqual(enviar.call_args.kwargs['habitacion_ids'], {self.h1.pk})
+        self.assertEqual(enviar.call_args.kwargs['hasta'], self.hoy + timedelta(days=2))
+
+
+class PoblarEscalaTests(TestCase):
+    def poblar(self, *args):
+        call_command('poblar_datos', '--escala', '--pisos', '3', '--habitaciones-por-piso', '5',
+                     '--usuarios', '20', '--reservas', '400', *args, stdout=StringIO())
+        return list(Reserva.objects.order_by('habitacion__numero', 'fecha_entrada').values_list(
+            'habitacion__numero', 'cliente__username', 'fecha_entrada', 'fecha_salida', 'estado', 'numero_huespedes'
+        ))
+
+    def test_genera_escala_sin_solapamientos(self):
+        reservas = self.poblar()
+
+        self.assertEqual(Habitacion.objects.filter(numero__startswith='E').count(), 15)
+        self.assertEqual(PerfilUsuario.objects.filter(usuario__username__startswith='escala_').count(), 20)
+        self.assertEqual(len(reservas), 400)
+        self.assertFalse(reservas_solapadas().exists())
+        cliente = User.objects.get(username='escala_0000000')
+        self.assertTrue(cliente.check_password('escala123'))
+        with self.assertRaises(CommandError):
+            self.poblar()
+
+    def test_misma_semilla_mismos_datos(self):
+        primera = self.poblar('--semilla', '7')
+        Reserva.objects.all().delete()
+        Habitacion.objects.filter(numero__startswith='E').delete()
+        self.assertEqual(self.poblar('--semilla', '7'), primera)
+
+    def test_precios_del_plan_de_tarifas(self):
+        Tarifa.objects.create(nombre='Fin de semana', dias_semana='4,5', porcentaje=Decimal('15'))
+        DescuentoEstadia.objects.create(nombre='Semana', noches_minimas=7, porcentaje=Decimal('10'))
+        self.poblar()
+
+        reservas = Reserva.objects.select_related('habitacion__tipo')
+        for reserva in reservas:
+            noches = (reserva.fecha_salida - reserva.fecha_entrada).days
+            esperado = tarifas.armar(reserva.fecha_entrada, noches).total(
+                reserva.habitacion.tipo_id, reserva.fecha_entrada, reserva.fecha_salida)
+            self.assertEqual(reserva.precio_total, esperado)
+        self.assertTrue(any(r.precio_total != r.habitacion.tipo.precio_por_noche * (r.fecha_salida - r.fecha_entrada).days
+                            for r in reservas))
+
+
+class ListaHabitacionesTests(TestCase):
+    def setUp(self):
+        self.doble = TipoHabitacion.objects.create(nombre='doble', precio_por_noche=Decimal('25000.00'), capacidad_maxima=2)
+        self.user = User.objects.create_user(username='ana', password='pass')
+        admin = User.objects.create_user(username='admin', password='pass', is_staff=True)
+        self.client.force_login(admin)
+        self.hoy = date.today()
+        self.creadas = 0
+
+    def agregar_habitaciones(self, cantidad):
+        for _ in range(cantidad):
+            self.creadas += 1
+            habitacion = Habitacion.objects.create(numero=str(100 + self.creadas), tipo=self.doble, piso=1)
+            for desde, hasta in ((0, 2), (3, 5), (6, 8), (9, 10)):
+                Reserva.objects.create(
+                    cliente=self.user, habitacion=habitacion, numero_huespedes=1, estado='confirmada',
+                    fecha_entrada=self.hoy + timedelta(days=desde), fecha_salida=self.hoy + timedelta(days=hasta),
+                )
+
+    def consultas(self, **filtros):
+        with CaptureQueriesContext(connection) as contexto:
+            response = self.client.get(reverse('lista_habitaciones'), filtros)
+        self.assertEqual(response.status_code, 200)
+        return len(contexto), response
+
+    def test_consultas_constantes(self):
+        self.agregar_habitaciones(2)
+        con_dos, response = self.consultas()
+        self.assertContains(response, 'Ocupada actualmente hasta', count=2)
+
+        self.agregar_habitaciones(6)
+        con_ocho, response = self.consultas()
+        self.assertEqual(con_ocho, con_dos)
+        self.assertEqual(len(response.context['habitaciones']), 8)
+        habitacion = response.context['habitaciones'][0]
+        self.assertEqual(len(habitacion.proximas_reservas()), 3)
+        self.assertFalse(habitacion.esta_disponible())
+
+    def test_filtro_disponibilidad(self):
+        self.agregar_habitaciones(1)
+        Habitacion.objects.create(numero='900', tipo=self.doble, piso=9)
+        _, response = self.consultas(disponibilidad='disponible')
+        self.assertEqual([h.numero for h in response.context['habitaciones']], ['900'])
+        _, response = self.consultas(disponibilidad='reservada')
+        self.assertEqual([h.numero for h in response.context['habitaciones']], ['101'])
+
+
+class GestionarReservasTests(TestCase):
+    def setUp(self):
+        doble = TipoHabitacion.objects.create(nombre='doble', precio_por_noche=Decimal('25000.00'), capacidad_maxima=2)
+        self.h101 = Habitacion.objects.create(numero='101', tipo=doble, piso=1)
+        self.h102 = Habitacion.objects.create(numero='102', tipo=doble, piso=1)
+        self.user = User.objects.create_user(username='ana', password='pass')
+        admin = User.objects.create_user(username='admin', password='pass', is_staff=True)
+        self.client.force_login(admin)
+        self.hoy = date.today()
+
+    def crear(self, cantidad, habitacion=None, estado='confirmada'):
+        # bulk_create: mismo fecha_reserva para casi todas, el id desempata
+        Reserva.objects.bulk_create([
+            Reserva(cliente=self.user, habitacion=habitacion or self.h101, numero_huespedes=1, estado=estado,
+                    fecha_entrada=self.hoy + timedelta(days=2 * i), fecha_salida=self.hoy + timedelta(days=2 * i + 1))
+            for i in range(cantidad)
+        ])
+
+    def pagina(self, **parametros):
+        response = self.client.get(reverse('gestionar_reservas'), parametros)
+        self.assertEqual(response.status_code, 200)
+        return response.context['pagina']
+
+    def test_recorre_todas_sin_repetir_hacia_adelante_y_atras(self):
+        self.crear(120)
+        paginas = [self.pagina()]
+        while paginas[-1].siguiente:
+            paginas.append(self.pagina(despues=paginas[-1].siguiente))
+        self.assertEqual([len(p) for p in paginas], [50, 50, 20])
+        ids = [r.id for p in paginas for r in p]
+        self.assertEqual(ids, list(Reserva.objects.order_by('-fecha_reserva', '-id').values_list('id', flat=True)))
+
+        atras = self.pagina(antes=paginas[2].anterior)
+        self.assertEqual([r.id for r in atras], [r.id for r in paginas[1]])
+        primera = self.pagina(antes=atras.anterior)
+        self.assertEqual([r.id for r in primera], [r.id for r in paginas[0]])
+        self.assertIsNone(primera.anterior)
+
+    def test_contadores_y_filtros(self):
+        self.crear(3)
+        self.crear(2, estado='cancelada', habitacion=self.h102)
+        response = self.client.get(reverse('gestionar_reservas'), {'estado': 'cancelada'})
+        self.assertEqual(response.context['contadores'],
+                         {'total': 5, 'confirmadas': 3, 'completadas': 0, 'canceladas': 2})
+        self.assertEqual(len(response.context['pagina']), 2)
+
+        self.assertEqual(len(self.pagina(habitacion='101')), 3)
+        self.assertEqual(len(self.pagina(desde=(self.hoy + timedelta(days=2)).isoformat(),
+                                         hasta=(self.hoy + timedelta(days=4)).isoformat())), 3)
+
+    def test_consultas_constantes_y_cursor_invalido(self):
+        self.crear(5)
+        with CaptureQueriesContext(connection) as pocas:
+            self.pagina()
+        self.crear(60, habitacion=self.h102)
+        with CaptureQueriesContext(connection) as muchas:
+            self.pagina()
+        self.assertEqual(len(muchas), len(pocas))
+
+        self.assertEqual([r.id for r in self.pagina(despues='basura')], [r.id for r in self.pagina()])
+
+
+class MisReservasTests(TestCase):
+    def setUp(self):
+        doble = TipoHabitacion.objects.create(nombre='doble', precio_por_noche=Decimal('25000.00'), capacidad_maxima=2)
+        self.habitacion = Habitacion.objects.create(numero='101', tipo=doble, piso=1)
+        self.user = User.objects.create_user(username='ana', password='pass')
+        otro = User.objects.create_user(username='otro', password='pass')
+        self.client.force_login(self.user)
+        self.hoy = date.today()
+        # 30 estadías pasadas y 25 futuras de una noche, más una ajena
+        Reserva.objects.bulk_create([
+            Reserva(cliente=self.user, habitacion=self.habitacion, numero_huespedes=1, estado='confirmada',
+                    fecha_entrada=self.hoy + timedelta(days=2 * i), fecha_salida=self.hoy + timedelta(days=2 * i + 1))
+            for i in range(-30, 25)
+        ] + [Reserva(cliente=otro, habitacion=self.habitacion, numero_huespedes=1, estado='confirmada',
+                     fecha_entrada=self.hoy + timedelta(days=1), fecha_salida=self.hoy + timedelta(days=2))])
+
+    def test_proximas_por_defecto_y_en_orden(self):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(reverse('mis_reservas'))
+        pagina = response.context['pagina']
+        self.assertEqual(response.context['vista'], 'proximas')
+        self.assertEqual([r.fecha_entrada for r in pagina], [self.hoy + timedelta(days=2 * i) for i in range(20)])
+        self.assertIsNotNone(pagina.siguiente)
+        # Sesión, usuario y la página (con habitación y tipo en el mismo JOIN)
+        self.assertLessEqual(len(consultas), 3)
+
+        resto = self.client.get(reverse('mis_reservas'), {'vista': 'proximas', 'despues': pagina.siguiente})
+        self.assertEqual(len(resto.context['pagina']), 5)
+        self.assertIsNone(resto.context['pagina'].siguiente)
+
+    def test_estadia_en_curso_va_en_proximas(self):
+        otra = Habitacion.objects.create(numero='102', tipo=self.habitacion.tipo, piso=1)
+        en_curso, = Reserva.objects.bulk_create([
+            Reserva(cliente=self.user, habitacion=otra, numero_huespedes=1, estado='confirmada',
+                    fecha_entrada=self.hoy - timedelta(days=1), fecha_salida=self.hoy + timedelta(days=1))])
+        proximas = self.client.get(reverse('mis_reservas')).context['pagina']
+        # Sale mañana, igual que la que entra hoy: las dos encabezan la lista
+        self.assertIn(en_curso.pk, [r.pk for r in proximas.objetos[:2]])
+        historial = self.client.get(reverse('mis_reservas'), {'vista': 'historial'}).context['pagina']
+        self.assertNotIn(en_curso.pk, [r.pk for r in historial])
+
+    def test_historial_de_la_mas_reciente_hacia_atras(self):
+        response = self.client.get(reverse('mis_reservas'), {'vista': 'historial'})
+        fechas = [r.fecha_entrada for r in response.context['pagina']]
+        self.assertEqual(fechas[0], self.hoy - timedelta(days=2))
+        self.assertEqual(fechas, sorted(fechas, reverse=True))
+
+    def test_api_json_recorre_todo(self):
+        ids, despues = [], ''
+        while True:
+            datos = self.client.get(reverse('mis_reservas_pagina'), {'vista': 'historial', 'despues': despues}).json()
+            ids += [r['id'] for r in datos['reservas']]
+            if not datos['siguiente']:
+                break
+            despues = datos['siguiente']
+        self.assertEqual(len(ids), 30)
+        self.assertEqual(len(set(ids)), 30)
+        self.assertEqual(datos['reservas'][0]['habitacion'], '101')
+
+    def test_pagina_por_indice_sin_ordenar(self):
+        indice, = [i.name for i in Reserva._meta.indexes if i.fields == ['cliente', 'fecha_salida', 'id']]
+        primera = self.client.get(reverse('mis_reservas_pagina'), {'vista': 'historial'}).json()
+        for pedido in ({}, {'vista': 'historial'}, {'vista': 'historial', 'despues': primera['siguiente']}):
+            with CaptureQueriesContext(connection) as consultas:
+                self.client.get(reverse('mis_reservas_pagina'), pedido)
+            sql, = [c['sql'] for c in consultas if c['sql'].startswith('SELECT "hotel_reserva"')]
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plan = ' | '.join(fila[-1] for fila in cursor.fetchall())
+            self.assertIn(f'USING INDEX {indice}', plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+
+
+class PortadaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        doble = TipoHabitacion.objects.create(nombre='doble', precio_por_noche=Decimal('25000.00'), capacidad_maxima=2)
+        self.habitaciones = [Habitacion.objects.create(numero=str(101 + i), tipo=doble, piso=1) for i in range(8)]
+        self.user = User.objects.create_user(username='ana', password='pass')
+        self.hoy = date.today()
+
+    def destacadas(self):
+        response = self.client.get(reverse('inicio'))
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_caliente_no_consulta_la_base(self):
+        response = self.destacadas()
+        self.assertContains(response, 'Habitación 101')
+        self.assertNotContains(response, 'Habitación 107')
+        with self.assertNumQueries(0):
+            response = self.destacadas()
+        self.assertContains(response, 'Habitación 106')
+
+    def test_reserva_en_destacada_y_liberacion_invalidan(self):
+        self.destacadas()
+        with self.captureOnCommitCallbacks(execute=True):
+            reserva = Reserva.objects.create(
+                cliente=self.user, habitacion=self.habitaciones[0], numero_huespedes=1, estado='confirmada',
+                fecha_entrada=self.hoy + timedelta(days=3), fecha_salida=self.hoy + timedelta(days=5),
+            )
+        response = self.destacadas()
+        self.assertNotContains(response, 'Habitación 101')
+        self.assertContains(response, 'Habitación 107')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reserva.estado = 'cancelada'
+            reserva.save()
+        self.assertContains(self.destacadas(), 'Habitación 101')
+
+    def test_reserva_fuera_de_destacadas_no_invalida(self):
+        self.destacadas()
+        version = portada.version()
+        Reserva.objects.create(
+            cliente=self.user, habitacion=self.habitaciones[7], numero_huespedes=1, estado='confirmada',
+            fecha_entrada=self.hoy + timedelta(days=3), fecha_salida=self.hoy + timedelta(days=5),
+        )
+        self.assertEqual(portada.version(), version)
+
+    def test_cambio_de_habitacion_invalida(self):
+        self.destacadas()
+        self.habitaciones[1].estado = 'mantenimiento'
+        self.habitaciones[1].save()
+        self.assertNotContains(self.destacadas(), 'Habitación 102')
+
+
+class TarjetasHabitacionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.doble = TipoHabitacion.objects.create(nombre='doble', precio_por_noche=Decimal('25000.00'), capacidad_maxima=2)
+        self.habitacion = Habitacion.objects.create(numero='101', tipo=self.doble, piso=1, descripcion='Vista al mar')
+        self.otra = Habitacion.objects.create(numero='102', tipo=self.doble, piso=1, descripcion='Vista al patio')
+        self.user = User.objects.create_user(username='ana', password='pass')
+
+    def listado(self):
+        response = self.client.get(reverse('lista_habitaciones'))
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_tarjeta_cacheada_hasta_que_cambia_la_habitacion(self):
+        self.assertContains(self.listado(), 'Vista al mar')
+        # QuerySet.update no avisa: la tarjeta sigue saliendo de la caché
+        Habitacion.objects.filter(pk=self.habitacion.pk).update(descripcion='Vista a la montaña')
+        self.assertContains(self.listado(), 'Vista al mar')
+
+        self.habitacion.refresh_from_db()
+        self.habitacion.save()
+        response = self.listado()
+        self.assertContains(response, 'Vista a la montaña')
+        self.assertContains(response, 'Vista al patio')
+
+    def test_reserva_y_tipo_invalidan(self):
+        con_reservas = '<i class="fas fa-calendar me-1"></i>Con reservas'
+        self.assertNotContains(self.listado(), con_reservas)
+        Reserva.objects.create(
+            cliente=self.user, habitacion=self.habitacion, numero_huespedes=1, estado='confirmada',
+            fecha_entrada=date.today() + timedelta(days=3), fecha_salida=date.today() + timedelta(days=5),
+        )
+        self.assertContains(self.listado(), con_reservas, count=1)
+
+        self.doble.precio_por_noche = Decimal('30000.00')
+        self.doble.save()
+        self.assertContains(self.listado(), '$30000,00/noche', count=2)
+
+    @override_settings(HOTEL_CACHE_TARJETAS=False)
+    def test_deshabilitada_no_cachea(self):
+        self.listado()
+        Habitacion.objects.filter(pk=self.habitacion.pk).update(descripcion='Vista a la montaña')
+        self.assertContains(self.listado(), 'Vista a la montaña')
+
+
+class GetCondicionalTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        # Las marcas de MarcaCambio se escriben al confirmar (condicional.py)
+        with self.captureOnCommitCallbacks(execute=True):
+            doble = TipoHabitacion.objects.create(nombre='doble', precio_por_noche=Decimal('25000.00'), capacidad_maxima=2)
+            self.habitacion = Habitacion.objects.create(numero='101', tipo=doble, piso=1)
+        self.user = User.objects.create_user(username='ana', password='pass')
+        self.entrada = date.today() + timedelta(days=10)
+        self.url = reverse('habitaciones_disponibles', args=[
+            self.entrada.isoformat(), (self.entrada + timedelta(days=2)).isoformat()])
+
+    def reservar(self, desde, hasta):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Reserva.objects.create(
+                cliente=self.user, habitacion=self.habitacion, numero_huespedes=1, estado='confirmada',
+                fecha_entrada=self.entrada + timedelta(days=desde), fecha_salida=self.entrada + timedelta(days=hasta),
+            )
+
+    def revalidar(self, url, etag):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_304_sin_cambios_con_una_consulta(self):
+        for url in (reverse('lista_habitaciones'), self.url):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.has_header('ETag') and response.has_header('Last-Modified'))
+            with self.assertNumQueries(1):
+                self.assertEqual(self.revalidar(url, response['ETag']).status_code, 304)
+
+    def test_cambios_en_la_ventana_invalidan(self):
+        etag = self.client.get(self.url)['ETag']
+        lejana = self.reservar(120, 122)
+        self.assertEqual(self.revalidar(self.url, etag).status_code, 304)
+
+        # Moverla dentro de la ventana cambia la versión; eliminarla también
+        lejana.fecha_entrada, lejana.fecha_salida = self.entrada, self.entrada + timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            lejana.save()
+        response = self.revalidar(self.url, etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            lejana.delete()
+        self.assertEqual(self.revalidar(self.url, etag).status_code, 200)
+
+    def test_la_marca_se_escribe_al_confirmar(self):
+        # Nada queda escrito (ni bloqueado) en MarcaCambio mientras la reserva está abierta
+        antes = condicional.ultima(self.entrada, self.entrada + timedelta(days=1))
+        with self.captureOnCommitCallbacks() as al_confirmar:
+            Reserva.objects.create(cliente=self.user, habitacion=self.habitacion, numero_huespedes=1,
+                                   fecha_entrada=self.entrada, fecha_salida=self.entrada + timedelta(days=1))
+            self.assertEqual(condicional.ultima(self.entrada, self.entrada + timedelta(days=1)), antes)
+        for callback in al_confirmar:
+            callback()
+        self.assertGreater(condicional.ultima(self.entrada, self.entrada + timedelta(days=1)), antes)
+
+    def test_cambio_de_habitacion_invalida_todo(self):
+        etag = self.client.get(reverse('lista_habitaciones'))['ETag']
+        self.habitacion.estado = 'mantenimiento'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.habitacion.save()
+        self.assertEqual(self.revalidar(reverse('lista_habitaciones'), etag).status_code, 200)
+
+    def test_etag_depende_del_usuario(self):
+        etag = self.client.get(self.url)['ETag']
+        self.client.force_login(self.user)
+        self.assertEqual(self.revalidar(self.url, etag).status_code, 200)
+
+
+class ApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.doble = TipoHabitacion.objects.create(nombre='doble', precio_por_noche=Decimal('25000.00'), capacidad_maxima=2)
+        self.suite = TipoHabitacion.objects.create(nombre='suite', precio_por_noche=Decimal('60000.00'), capacidad_maxima=4)
+        self.h101 = Habitacion.objects.create(numero='101', tipo=self.doble, piso=1)
+        self.h102 = Habitacion.objects.create(numero='102', tipo=self.doble, piso=1)
+        self.h201 = Habitacion.objects.create(numero='201', tipo=self.suite, piso=2)
+        self.user = User.objects.create_user(username='ana', password='pass')
+        self.entrada = date.today() + timedelta(days=5)
+        self.rango = {'entrada': self.entrada.isoformat(), 'salida': (self.entrada + timedelta(days=2)).isoformat()}
+
+    def test_tipos(self):
+        response = self.client.get(reverse('api_tipos'))
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn('public', response['Cache-Control'])
+        self.assertEqual([t['nombre'] for t in response.json()['tipos']], ['doble', 'suite'])
+        self.assertEqual(response.json()['tipos'][0]['precio_por_noche'], '25000.00')
+
+    def test_disponibilidad_agrupada_y_cacheada(self):
+        Reserva.objects.create(
+            cliente=self.user, habitacion=self.h101, numero_huespedes=1, estado='confirmada',
+            fecha_entrada=self.entrada, fecha_salida=self.entrada + timedelta(days=1),
+        )
+        datos = self.client.get(reverse('api_disponibilidad'), self.rango).json()
+        self.assertEqual(datos['noches'], 2)
+        self.assertEqual(datos['libres'], 2)
+        por_tipo = {t['nombre']: t for t in datos['tipos']}
+        self.assertEqual(por_tipo['doble']['habitaciones'], [[self.h102.pk, '102', 1]])
+        self.assertEqual(por_tipo['suite']['total'], '120000.00')
+
+        # Repetido: una sola consulta (el sello de cambios), y 304 con el ETag
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('api_disponibilidad'), self.rango)
+        self.assertEqual(response.json(), datos)
+        response = self.client.get(reverse('api_disponibilidad'), self.rango, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Reserva.objects.create(
+                cliente=self.user, habitacion=self.h201, numero_huespedes=1, estado='pendiente',
+                fecha_entrada=self.entrada, fecha_salida=self.entrada + timedelta(days=1),
+            )
+        self.assertEqual(self.client.get(reverse('api_disponibilidad'), self.rango).json()['libres'], 1)
+
+    def test_cotizacion(self):
+        datos = self.client.get(reverse('api_cotizacion'), {**self.rango, 'habitacion': self.h101.pk}).json()
+        self.assertEqual((datos['total'], datos['disponible'], datos['motivo']), ('50000.00', True, None))
+        datos = self.client.get(reverse('api_cotizacion'), {**self.rango, 'habitacion': self.h101.pk, 'huespedes': 3}).json()
+        self.assertEqual((datos['disponible'], datos['motivo']), (False, 'capacidad'))
+
+        self.h102.estado = 'mantenimiento'
+        self.h102.save()
+        datos = self.client.get(reverse('api_cotizacion'), {**self.rango, 'habitacion': self.h102.pk}).json()
+        self.assertEqual((datos['disponible'], datos['motivo']), (False, 'no_disponible'))
+
+    def test_errores(self):
+        self.assertEqual(self.client.get(reverse('api_disponibilidad'), {'entrada': 'mañana'}).status_code, 400)
+        response = self.client.get(reverse('api_disponibilidad'), {'entrada': self.rango['salida'], 'salida': self.rango['entrada']})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.json())
+        self.assertEqual(self.client.get(reverse('api_cotizacion'), self.rango).status_code, 400)
+        self.assertEqual(self.client.get(reverse('api_cotizacion'), {**self.rango, 'habitacion': 9999}).status_code, 404)
+        self.assertEqual(self.client.post(reverse('api_tipos')).status_code, 405)
+
+    def test_cotizaciones_en_lote(self):
+        Reserva.objects.create(
+            cliente=self.user, habitacion=self.h101, numero_huespedes=1, estado='confirmada',
+            fecha_entrada=self.entrada, fecha_salida=self.entrada + timedelta(days=1),
+        )
+        salida = self.entrada + timedelta(days=2)
+        rango = {'entrada': self.rango['entrada'], 'salida': self.rango['salida']}
+        despues = {'entrada': salida.isoformat(), 'salida': (salida + timedelta(days=3)).isoformat()}
+        elementos = [
+            {'tipo': 'doble', **rango},
+            {'habitacion': self.h101.pk, **rango},
+            {'habitacion': self.h101.pk, **despues, 'huespedes': 2},
+            {'tipo': 'suite', **rango, 'huespedes': 5},
+            {'tipo': 'familiar', **rango},
+            {'tipo': 'doble', 'entrada': 'mañana', 'salida': self.rango['salida']},
+        ] * 50
+        tarifas.tarifario()
+        # Tipos, calendario de la ventana y marca del tarifario, sin importar cuántos elementos traiga el lote
+        with self.assertNumQueries(4):
+            response = self.client.post(reverse('api_cotizaciones'), {'cotizaciones': elementos},
+                                        content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        resultados = response.json()['cotizaciones']
+        self.assertEqual(len(resultados), 300)
+        doble, h101, h101_despues, suite, familiar, invalida = resultados[:6]
+        self.assertEqual((doble['libres'], doble['disponible'], doble['total']), (1, True, '50000.00'))
+        self.assertEqual((h101['libres'], h101['motivo'], h101['tipo']), (0, 'no_disponible', 'doble'))
+        self.assertEqual((h101_despues['disponible'], h101_despues['noches'], h101_despues['total']),
+                         (True, 3, '75000.00'))
+        self.assertEqual((suite['motivo'], suite['total']), ('capacidad', '120000.00'))
+        self.assertEqual(familiar, {'error': 'No existe el tipo "familiar".'})
+        self.assertIn('AAAA-MM-DD', invalida['error'])
+        self.assertEqual(resultados[6:12], resultados[:6])
+
+        # Respuestas iguales a las de la cotización individual
+        individual = self.client.get(reverse('api_cotizacion'), {**despues, 'habitacion': self.h101.pk}).json()
+        self.assertEqual((individual['total'], individual['disponible']), (h101_despues['total'], True))
+
+        url = reverse('api_cotizaciones')
+        self.assertEqual(self.client.post(url, 'no es json', content_type='application/json').status_code, 400)
+        self.assertEqual(self.client.post(url, {'cotizaciones': [{}] * 1001},
+                                          content_type='application/json').status_code, 400)
+        self.assertEqual(self.client.get(url).status_code, 405)
+
+    def test_entrada_fuera_del_horizonte(self):
+        lejos = {'entrada': '9999-11-01', 'salida': '9999-11-03'}
+        response = self.client.get(reverse('api_disponibilidad'), lejos)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('anterior a', response.json()['error'])
+
+        # En un lote sólo ese elemento falla; el calendario cubre nada más que los válidos
+        with mock.patch('hotel.ocupacion.para_rango', wraps=para_rango) as calendario_lote:
+            resultados = self.client.post(reverse('api_cotizaciones'), {'cotizaciones': [
+                {'tipo': 'doble', **self.rango}, {'tipo': 'doble', **lejos},
+            ]}, content_type='application/json').json()['cotizaciones']
+        self.assertEqual(resultados[0]['libres'], 2)
+        self.assertIn('error', resultados[1])
+        self.assertEqual(calendario_lote.call_args.args, (date.fromisoformat(self.rango['entrada']),
+                                                     date.fromisoformat(self.rango['salida'])))
+
+
+@override_settings(HOTEL_HILOS_BLOQUEANTES=0)
+class VistasAsyncTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.doble = TipoHabitacion.objects.create(nombre='doble', precio_por_noche=Decimal('25000.00'), capacidad_maxima=2)
+        self.h101 = Habitacion.objects.create(numero='101', tipo=self.doble, piso=1)
+        self.h102 = Habitacion.objects.create(numero='102', tipo=self.doble, piso=1)
+        self.user = User.objects.create_user(username='ana', password='pass', email='ana@example.com')
+        self.entrada = date.today() + timedelta(days=5)
+        self.salida = self.entrada + timedelta(days=2)
+        self.rango = {'entrada': self.entrada.isoformat(), 'salida': self.salida.isoformat()}
+        Reserva.objects.create(
+            cliente=self.user, habitacion=self.h101, numero_huespedes=1, estado='confirmada',
+            fecha_entrada=self.entrada, fecha_salida=self.salida,
+        )
+
+    async def test_api_async_igual_a_la_sincrona(self):
+        response = await self.async_client.get(reverse('api_disponibilidad'), self.rango)
+        self.assertEqual(response.resolver_match.func.__name__, 'adisponibilidad_rango')
+        datos = response.json()
+        self.assertEqual(datos['libres'], 1)
+        self.assertEqual(datos['tipos'][0]['habitaciones'], [[self.h102.pk, '102', 1]])
+
+        # Misma clave de caché y mismo ETag que la vista síncrona
+        sincrona = await sync_to_async(self.client.get)(reverse('api_disponibilidad'), self.rango)
+        self.assertEqual(sincrona.resolver_match.func.__name__, 'disponibilidad_rango')
+        self.assertEqual(sincrona['ETag'], response['ETag'])
+        self.assertEqual(sincrona.json(), datos)
+        response = await self.async_client.get(
+            reverse('api_disponibilidad'), self.rango, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+        cotizacion = await self.async_client.get(reverse('api_cotizacion'), {**self.rango, 'habitacion': self.h101.pk})
+        self.assertEqual(cotizacion.json()['motivo'], 'no_disponible')
+        tipos = await self.async_client.get(reverse('api_tipos'))
+        self.assertEqual([t['nombre'] for t in tipos.json()['tipos']], ['doble'])
+
+        lote = await self.async_client.post(
+            reverse('api_cotizaciones'), {'cotizaciones': [{'tipo': 'doble', **self.rango}]},
+            content_type='application/json')
+        self.assertEqual(lote.resolver_match.func.__name__, 'acotizaciones')
+        self.assertEqual(lote.json()['cotizaciones'][0]['libres'], 1)
+
+    async def test_disponibles_async_y_get_condicional(self):
+        url = reverse('habitaciones_disponibles', args=[self.entrada.isoformat(), self.salida.isoformat()])
+        response = await self.async_client.get(url)
+        self.assertEqual(response.resolver_match.func.__name__, 'ahabitaciones_disponibles')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Habitación 102')
+        self.assertNotContains(response, 'Habitación 101')
+
+        response = await self.async_client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+        response = await self.async_client.get(reverse('habitaciones_disponibles', args=['2020-01-01', 'x']))
+        self.assertRedirects(response, reverse('buscar_habitaciones'), fetch_redirect_response=False)
+
+    async def test_reserva_async(self):
+        url = reverse('hacer_reserva', args=[self.h102.pk])
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 302)  # login_required
+
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(url)
+        self.assertEqual(response.resolver_match.func.__name__, 'ahacer_reserva')
+        self.assertEqual(response.status_code, 200)
+
+        datos = {
+            'fecha_entrada': self.entrada.isoformat(), 'fecha_salida': self.salida.isoformat(),
+            'numero_huespedes': 2, 'comentarios': '',
+        }
+        response = await self.async_client.post(url, datos)
+        self.assertRedirects(response, reverse('mis_reservas'), fetch_redirect_response=False)
+        self.assertTrue(await Reserva.objects.filter(habitacion=self.h102, cliente=self.user).aexists())
+
+        # Ya ocupada para esas fechas: vuelve a la búsqueda
+        response = await self.async_client.get(
+            reverse('hacer_reserva_con_fechas', args=[self.h102.pk, self.entrada.isoformat(), self.salida.isoformat()]))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(await Reserva.objects.acount(), 2)
+
+    def test_wsgi_sigue_con_las_vistas_sincronas(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('hacer_reserva', args=[self.h102.pk]))
+        self.assertEqual(response.resolver_match.func.__name__, 'hacer_reserva')
+
+
+class CorreosTests(TestCase):
+    def setUp(self):
+        tipo = TipoHabitacion.objects.create(nombre='doble', precio_por_noche=Decimal('25000.00'), capacidad_maxima=2)
+        self.habitacion = Habitacion.objects.create(numero='101', tipo=tipo, piso=1)
+        self.user = User.objects.create_user(username='ana', password='pass', email='ana@example.com')
+        self.admin = User.objects.create_user(username='admin', password='pass', is_staff=True)
+        entrada = date.today() + timedelta(days=5)
+        self.reserva = Reserva.objects.create(
+            cliente=self.user, habitacion=self.habitacion, numero_huespedes=1,
+            fecha_entrada=entrada, fecha_salida=entrada + timedelta(days=2),
+        )
+
+    def test_confirmar_encola_y_el_worker_envia(self):
+        self.client.force_login(self.admin)
+        self.client.post(reverse('cambiar_estado_reserva', args=[self.reserva.pk]), {'nuevo_estado': 'confirmada'})
+        self.assertEqual(len(mail.outbox), 0)
+        correo = CorreoPendiente.objects.get()
+        self.assertEqual((correo.destinatario, correo.estado), ('ana@example.com', 'pendiente'))
+        self.assertIn(f'#{self.reserva.pk}', correo.asunto)
+
+        salida = StringIO()
+        call_command('enviar_correos', stdout=salida)
+        self.assertIn('1 enviados', salida.getvalue())
+        self.assertEqual(mail.outbox[0].to, ['ana@example.com'])
+        correo.refresh_from_db()
+        self.assertEqual((correo.estado, correo.intentos), ('enviado', 1))
+        self.assertIsNotNone(correo.enviado)
+
+    def test_sin_correo_si_la_transaccion_se_revierte(self):
+        def fallar(reserva):
+            raise ValidationError('no')
+
+        self.reserva.estado = 'confirmada'
+        with self.assertRaises(ValidationError):
+            servicio_reservas.guardar(self.reserva, ademas=lambda r: (email_utils.enviar_confirmacion_reserva(
+                r.cliente.email, 'Ana', r.pk), fallar(r)))
+        self.assertFalse(CorreoPendiente.objects.exists())
+        self.assertEqual(Reserva.objects.get(pk=self.reserva.pk).estado, 'pendiente')
+
+    def test_registro_encola_bienvenida(self):
+        self.client.post(reverse('registrarse'), {
+            'username': 'beto', 'email': 'beto@example.com', 'first_name': 'Beto', 'last_name': 'Paz',
+            'password1': 'UnaClaveLarga123', 'password2': 'UnaClaveLarga123',
+        })
+        self.assertEqual(CorreoPendiente.objects.get().destinatario, 'beto@example.com')
+
+    @override_settings(HOTEL_CORREOS_INTENTOS=3, HOTEL_CORREOS_ESPERA=10)
+    def test_reintentos_con_espera_y_fallido(self):
+        correo = correos.encolar('ana@example.com', 'Hola', 'Cuerpo')
+        conexion = mock.Mock()
+        conexion.send_messages.side_effect = OSError('SMTP caído')
+
+        self.assertEqual(correos.enviar_lote(conexion=conexion)['reintentos'], 1)
+        correo.refresh_from_db()
+        self.assertEqual((correo.estado, correo.intentos), ('pendiente', 1))
+        self.assertIn('SMTP caído', correo.ultimo_error)
+        espera = correo.proximo_intento - timezone.now()
+        self.assertTrue(timedelta(seconds=8) < espera <= timedelta(seconds=10))
+
+        # Todavía no vence: el lote no lo toma
+        self.assertEqual(correos.enviar_lote(conexion=conexion)['reintentos'], 0)
+
+        # La espera se duplica y el tercer fallo lo deja como fallido
+        CorreoPendiente.objects.update(proximo_intento=timezone.now())
+        correos.enviar_lote(conexion=conexion)
+        correo.refresh_from_db()
+        self.assertGreater(correo.proximo_intento - timezone.now(), timedelta(seconds=18))
+        CorreoPendiente.objects.update(proximo_intento=timezone.now())
+        self.assertEqual(correos.enviar_lote(conexion=conexion)['fallidos'], 1)
+        correo.refresh_from_db()
+        self.assertEqual((correo.estado, correo.intentos), ('fallido', 3))
+
+        self.assertEqual(correos.reintentar(CorreoPendiente.objects.all()), 1)
+        self.assertEqual(correos.enviar_lote()['enviados'], 1)
+
+    def test_lote_por_una_sola_conexion_smtp(self):
+        for i in range(3):
+            correos.encolar(f'cliente{i}@example.com', f'Asunto {i}', 'Cuerpo')
+        with SMTPLocal() as smtp, override_settings(**smtp.ajustes()):
+            self.assertEqual(correos.enviar_lote()['enviados'], 3)
+        self.assertEqual(smtp.conexiones, 1)
+        self.assertEqual(len(smtp.mensajes), 3)
+        self.assertIn('Subject: Asunto 0', smtp.mensajes[0])
+        self.assertEqual(CorreoPendiente.objects.filter(estado='enviado').count(), 3)
+
+
+class AvisosTests(TestCase):
+    def setUp(self):
+        tipo = TipoHabitacion.objects.create(nombre='doble', precio_por_noche=Decimal('25000.00'), capacidad_maxima=2)
+        self.habitaciones = [Habitacion.objects.create(numero=str(100 + i), tipo=tipo, piso=1) for i in range(6)]
+        self.ana = User.objects.create_user(username='ana', password='pass', email='ana@example.com', first_name='Ana')
+        self.sin_correo = User.objects.create_user(username='beto', password='pass')
+        self.hoy = date.today()
+
+    def _reserva(self, habitacion, entrada, noches=2, estado='confirmada', cliente=None):
+        return Reserva.objects.create(
+            cliente=cliente or self.ana, habitacion=habitacion, numero_huespedes=1, estado=estado,
+            fecha_entrada=self.hoy + timedelta(days=entrada),
+            fecha_salida=self.hoy + timedelta(days=entrada + noches),
+        )
+
+    def test_avisos_de_llegada_y_salida_sin_duplicados(self):
+        h = self.habitaciones
+        llega_manana = self._reserva(h[0], 1)
+        self._reserva(h[1], 5)                                # todavía falta
+        self._reserva(h[2], 1, estado='pendiente')            # no confirmada
+        self._reserva(h[3], 1, cliente=self.sin_correo)       # sin correo
+        salio_ayer = Reserva.objects.create(
+            cliente=self.ana, habitacion=h[4], numero_huespedes=1, estado='completada',
+            fecha_entrada=self.hoy - timedelta(days=3), fecha_salida=self.hoy - timedelta(days=1),
+        )
+        Reserva.objects.create(
+            cliente=self.ana, habitacion=h[5], numero_huespedes=1, estado='completada',
+            fecha_entrada=self.hoy - timedelta(days=20), fecha_salida=self.hoy - timedelta(days=15),
+        )
+
+        salida = StringIO()
+        call_command('enviar_avisos', stdout=salida)
+        self.assertIn('1 avisos de llegada, 1 avisos de salida', salida.getvalue())
+        llegada = CorreoPendiente.objects.get(asunto__startswith='Te esperamos')
+        self.assertIn(f'#{llega_manana.pk}', llegada.asunto)
+        self.assertIn('Hola Ana', llegada.cuerpo)
+        self.assertIn('Habitación: 100', llegada.cuerpo)
+        self.assertIn(f'#{salio_ayer.pk}', CorreoPendiente.objects.get(asunto__startswith='Gracias').asunto)
+        llega_manana.refresh_from_db()
+        self.assertIsNotNone(llega_manana.aviso_llegada)
+
+        # La marca evita repetirlos en la próxima corrida
+        call_command('enviar_avisos', stdout=StringIO())
+        self.assertEqual(CorreoPendiente.objects.count(), 2)
+
+    def test_lotes_por_clave_y_envio(self):
+        for habitacion in self.habitaciones[:5]:
+            self._reserva(habitacion, 2)
+        self.assertEqual(avisos.encolar_avisos('llegada', tamano=2), 5)
+        self.assertEqual(
+            sorted(CorreoPendiente.objects.values_list('asunto', flat=True)),
+            sorted(f'Te esperamos el {(self.hoy + timedelta(days=2)):%d/%m/%Y} - Reserva #{pk}'
+                   for pk in Reserva.objects.values_list('pk', flat=True)),
+        )
+        self.assertFalse(avisos.pendientes('llegada').exists())
+
+        call_command('enviar_avisos', '--enviar', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 5)
+
+
+class TarifasTests(TestCase):
+    def setUp(self):
+        self.doble = TipoHabitacion.objects.create(nombre='doble', precio_por_noche=Decimal('100.00'), capacidad_maxima=2)
+        self.suite = TipoHabitacion.objects.create(nombre='suite', precio_por_noche=Decimal('200.00'), capacidad_maxima=4)
+        self.habitacion = Habitacion.objects.create(numero='101', tipo=self.doble, piso=1)
+        self.user = User.objects.create_user(username='cliente', password='pass')
+        hoy = date.today() + timedelta(days=10)
+        self.lunes = hoy + timedelta(days=-hoy.weekday() % 7)
+        # Temporada alta dos semanas (+20%), viernes y sábado de la doble +10% más, precio fijo
+        # el miércoles de la primera semana; 5% desde 3 noches y 10% desde 7
+        Tarifa.objects.create(nombre='Temporada alta', desde=self.lunes, hasta=self.dia(13), porcentaje=Decimal('20'))
+        Tarifa.objects.create(nombre='Fin de semana', tipo=self.doble, dias_semana='4,5', porcentaje=Decimal('10'), prioridad=1)
+        Tarifa.objects.create(nombre='Congreso', tipo=self.doble, desde=self.dia(2), hasta=self.dia(2),
+                              precio_por_noche=Decimal('300.00'), prioridad=10)
+        DescuentoEstadia.objects.create(nombre='Semana', noches_minimas=7, porcentaje=Decimal('10'))
+        DescuentoEstadia.objects.create(nombre='Corta', noches_minimas=3, porcentaje=Decimal('5'))
+
+    def dia(self, n):
+        return self.lunes + timedelta(days=n)
+
+    def test_reglas_y_precio_guardado(self):
+        # 120 + 120 + 300 + 120 + 132 + 132 + 120 = 1044, menos 10% por la semana
+        self.assertEqual(tarifas.cotizar(self.doble.pk, self.lunes, self.dia(7)), Decimal('939.60'))
+        self.assertEqual(tarifas.cotizar(self.suite.pk, self.lunes, self.dia(3)), Decimal('684.00'))
+        self.assertEqual(tarifas.cotizar(self.doble.pk, self.dia(14), self.dia(16)), Decimal('200.00'))
+        self.assertEqual(tarifas.cotizar(self.doble.pk, self.dia(18), self.dia(20)), Decimal('220.00'))
+
+        reserva = Reserva.objects.create(cliente=self.user, habitacion=self.habitacion, fecha_entrada=self.lunes,
+                                         fecha_salida=self.dia(7), numero_huespedes=1)
+        self.assertEqual(reserva.precio_total, Decimal('939.60'))
+
+        # Fuera del horizonte se calcula en el momento, con el mismo resultado
+        with override_settings(HOTEL_TARIFAS_DIAS=5):
+            self.assertEqual(tarifas.cotizar(self.doble.pk, self.lunes, self.dia(7)), Decimal('939.60'))
+
+    def test_cotizar_en_memoria_e_invalidacion(self):
+        tarifas.tarifario()
+        # Sólo la marca general, para enterarse de cambios hechos por otros procesos
+        with self.assertNumQueries(1):
+            tarifario = tarifas.tarifario()
+            totales = [tarifario.total(tipo.pk, self.dia(i), self.dia(i + n))
+                       for tipo in (self.doble, self.suite) for i in range(100) for n in range(1, 11)]
+        self.assertEqual(len(totales), 2000)
+        self.assertEqual(totales[0], Decimal('120.00'))
+
+        Tarifa.objects.create(nombre='Cierre', tipo=self.doble, desde=self.lunes, hasta=self.lunes,
+                              precio_por_noche=Decimal('1000.00'), prioridad=20)
+        self.assertEqual(tarifas.cotizar(self.doble.pk, self.lunes, self.dia(1)), Decimal('1000.00'))
+
+        # Cambio hecho por otro worker: su caché (LocMem) no es la nuestra, sólo vemos la
+        # marca general que deja en la base al confirmar
+        Tarifa.objects.bulk_create([Tarifa(nombre='Cierre 2', tipo=self.doble, desde=self.dia(1), hasta=self.dia(1),
+                                           precio_por_noche=Decimal('2000.00'), prioridad=20)])
+        self.assertEqual(tarifas.cotizar(self.doble.pk, self.dia(1), self.dia(2)), Decimal('120.00'))
+        time.sleep(0.001)
+        with self.captureOnCommitCallbacks(execute=True):
+            condicional.registrar_general()
+        self.assertEqual(tarifas.cotizar(self.doble.pk, self.dia(1), self.dia(2)), Decimal('2000.00'))
+
+    def test_vistas_y_api_usan_el_motor(self):
+        self.client.login(username='cliente', password='pass')
+        respuesta = self.client.get(reverse('hacer_reserva_con_fechas', args=[
+            self.habitacion.pk, self.lunes.isoformat(), self.dia(7).isoformat()]))
+        self.assertEqual(respuesta.context['precio_estimado'], Decimal('939.60'))
+
+        respuesta = self.client.get(reverse('api_cotizacion'), {
+            'habitacion': self.habitacion.pk, 'entrada': self.lunes.isoformat(), 'salida': self.dia(7).isoformat()})
+        self.assertEqual(respuesta.json()['total'], '939.60')
+
+        respuesta = self.client.get(reverse('habitaciones_disponibles', args=[self.lunes.isoformat(), self.dia(3).isoformat()]))
+        self.assertEqual({t.nombre: t.precio_estadia for t in respuesta.context['tipos_disponibles']},
+                         {'doble': Decimal('513.00')})
+
+
+class ReportesTests(TestCase):
+    def setUp(self):
+        self.doble = TipoHabitacion.objects.create(nombre='doble', precio_por_noche=Decimal('100.00'), capacidad_maxima=2)
+        self.suite = TipoHabitacion.objects.create(nombre='suite', precio_por_noche=Decimal('250.00'), capacidad_maxima=4)
+        self.h1 = Habitacion.objects.create(numero='101', tipo=self.doble, piso=1)
+        self.h2 = Habitacion.objects.create(numero='102', tipo=self.doble, piso=1)
+        self.h3 = Habitacion.objects.create(numero='201', tipo=self.suite, piso=2)
+        self.user = User.objects.create_user(username='cliente', password='pass')
+        self.base = date(date.today().year - 1, 3, 1)
+        # Historia: bulk_create no valida fechas pasadas ni recalcula precios
+        self.crear([
+            (self.h1, 0, 3, 'completada', '300.00'),
+            (self.h2, 1, 2, 'pendiente', '150.00'),
+            (self.h3, 2, 4, 'completada', '500.00'),
+            (self.h2, 2, 5, 'cancelada', '999.00'),
+            (self.h2, -2, 1, 'completada', '90.00'),  # empezó antes del rango: cuenta sólo su última noche
+        ])
+
+    def dia(self, n):
+        return self.base + timedelta(days=n)
+
+    def crear(self, filas):
+        Reserva.objects.bulk_create([
+            Reserva(cliente=self.user, habitacion=habitacion, fecha_entrada=self.dia(entrada),
+                    fecha_salida=self.dia(salida), numero_huespedes=1, estado=estado, precio_total=Decimal(precio))
+            for habitacion, entrada, salida, estado, precio in filas
+        ])
+
+    def test_reconstruir_y_resumen(self):
+        self.assertEqual(reportes.reconstruir(self.dia(0), self.dia(5)), 10)
+        filas = {(f.tipo_id, (f.fecha - self.base).days): (f.vendidas, f.ingresos, f.llegadas)
+                 for f in ResumenDiario.objects.all()}
+        self.assertEqual([filas[(self.doble.pk, n)] for n in range(5)], [
+            (2, Decimal('130.00'), 1), (2, Decimal('250.00'), 1), (1, Decimal('100.00'), 0),
+            (0, Decimal('0.00'), 0), (0, Decimal('0.00'), 0)])
+        self.assertEqual([filas[(self.suite.pk, n)][0] for n in range(5)], [0, 0, 1, 1, 0])
+        self.assertEqual({f.habitaciones for f in ResumenDiario.objects.filter(tipo=self.doble)}, {2})
+
+        totales = reportes.resumen(self.dia(0), self.dia(5), agrupar=None)[0]
+        self.assertEqual((totales['habitaciones'], totales['vendidas'], totales['ingresos']), (15, 7, Decimal('980.00')))
+        self.assertEqual((totales['ocupacion'], totales['adr'], totales['revpar']), (46.7, Decimal('140.00'), Decimal('65.33')))
+
+        por_tipo = {f['tipo_nombre']: (f['ocupacion'], f['adr'], f['revpar'])
+                    for f in reportes.resumen(self.dia(0), self.dia(5), agrupar=None, por_tipo=True)}
+        self.assertEqual(por_tipo, {'doble': (50.0, Decimal('96.00'), Decimal('48.00')),
+                                    'suite': (40.0, Decimal('250.00'), Decimal('100.00'))})
+        self.assertEqual([f['vendidas'] for f in reportes.resumen(self.dia(0), self.dia(5), 'dia')], [2, 2, 2, 1, 0])
+        self.assertEqual(sum(f['vendidas'] for f in reportes.resumen(self.dia(0), self.dia(5), 'semana')), 7)
+
+        interanual = reportes.interanual([self.base.year], tipo_ids=[self.suite.pk])
+        self.assertEqual(interanual[self.base.year][2]['vendidas'], 2)
+        self.assertIsNone(interanual[self.base.year][3])
+
+    @override_settings(HOTEL_RESUMENES_DIAS_RECIENTES=3, HOTEL_RESUMENES_DIAS_FUTUROS=10)
+    def test_actualizar_solo_lo_reciente(self):
+        hoy = self.dia(20)
+        desde, hasta, _ = reportes.actualizar(hoy=hoy)
+        self.assertEqual((desde, hasta), (self.dia(-2), self.dia(30)))
+
+        # Una reserva tardía reciente entra; una corrección vieja espera a --completo
+        self.crear([(self.h1, 18, 19, 'completada', '100.00'), (self.h3, 0, 1, 'completada', '250.00')])
+        desde, _, _ = reportes.actualizar(hoy=hoy)
+        self.assertEqual(desde, self.dia(17))
+        vendidas = dict(ResumenDiario.objects.filter(tipo=self.suite).values_list('fecha', 'vendidas'))
+        self.assertEqual(vendidas[self.dia(0)], 0)
+        self.assertEqual(ResumenDiario.objects.get(tipo=self.doble, fecha=self.dia(18)).vendidas, 1)
+
+        call_command('actualizar_resumenes', completo=True, stdout=StringIO())
+        vendidas = dict(ResumenDiario.objects.filter(tipo=self.suite).values_list('fecha', 'vendidas'))
+        self.assertEqual(vendidas[self.dia(0)], 1)
+
+    def test_vistas_leen_solo_los_resumenes(self):
+        reportes.reconstruir(self.dia(0), self.dia(5))
+        parametros = {'desde': self.dia(0).isoformat(), 'hasta': self.dia(4).isoformat(),
+                      'agrupar': 'dia', 'anios': 2}
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('reporte_ocupacion'), parametros).status_code, 302)
+
+        admin = User.objects.create_user(username='admin', password='pass', is_staff=True)
+        self.client.force_login(admin)
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(reverse('reporte_ocupacion'), parametros)
+            datos = self.client.get(reverse('reporte_ocupacion_datos'), parametros).json()
+        self.assertFalse([q['sql'] for q in consultas if Reserva._meta.db_table in q['sql']])
+        self.assertEqual(respuesta.context['totales']['vendidas'], 7)
+        self.assertEqual(len(respuesta.context['meses']), 12)
+        self.assertEqual(datos['totales']['revpar'], '65.33')
+        self.assertEqual([p['vendidas'] for p in datos['periodos']], [2, 2, 2, 1, 0])
+        self.assertEqual(datos['interanual'][str(self.base.year)][2]['vendidas'], 7)
+
+        datos = self.client.get(reverse('reporte_ocupacion_datos'), {'desde': '0001-01-01', 'hasta': '9999-12-31'}).json()
+        self.assertEqual(datos['hasta'], f'{date.today().year + 10}-12-31')
+        self.assertEqual(datos['totales']['vendidas'], 7)
+
+        datos = self.client.get(reverse('reporte_ocupacion_datos'), {**parametros, 'tipo': 'suite'}).json()
+        self.assertEqual((datos['totales']['vendidas'], [t['tipo_nombre'] for t in datos['tipos']]), (2, ['suite']))
+
+
+class SegundoPlanoTests(TestCase):
+    @override_settings(HOTEL_HILOS_BLOQUEANTES=2)
+    async def test_pool_acotado(self):
+        nombres = await asyncio.gather(
+            *[segundo_plano.ejecutar(lambda: threading.current_thread().name) for _ in range(6)])
+        self.assertTrue(all(nombre.startswith('hotel-bloqueante') for nombre in nombres))
+        self.assertLessEqual(len(set(nombres)), 2)
+
+    @override_settings(HOTEL_HILOS_BLOQUEANTES=0)
+    def test_sin_pool_y_errores_al_log(self):
+        with self.assertLogs('hotel.segundo_plano', level='ERROR'):
+            segundo_plano.en_segundo_plano(lambda: 1 / 0)
+        self.assertEqual(async_to_sync(segundo_plano.ejecutar)(sum, [1, 2]), 3)
+
+
+class ReservasVencidasTests(TestCase):
+    def setUp(self):
+        doble = TipoHabitacion.objects.create(nombre='doble', precio_por_noche=Decimal('25000.00'), capacidad_maxima=2)
+        self.h1 = Habitacion.objects.create(numero='101', tipo=doble, piso=1)
+        self.h2 = Habitacion.objects.create(numero='102', tipo=doble, piso=1)
+        self.user = User.objects.create_user(username='ana', password='pass')
+        self.hoy = date.today()
+
+    def reservar(self, habitacion, desde, hasta):
+        return Reserva.objects.create(
+            cliente=self.user, habitacion=habitacion, numero_huespedes=1, estado='confirmada',
+            fecha_entrada=self.hoy + timedelta(days=desde), fecha_salida=self.hoy + timedelta(days=hasta),
+        )
+
+    def test_completa_vencidas_y_avanza_la_marca(self):
+        vencida = self.reservar(self.h1, -5, -2)
+        en_curso = self.reservar(self.h2, -3, 1)
+        Habitacion.objects.filter(pk=self.h1.pk).update(estado='ocupada')
+
+        self.assertEqual(vencimientos.completar_vencidas(), (1, 1))
+        vencida.refresh_from_db()
+        en_curso.refresh_from_db()
+        self.h1.refresh_from_db()
+        self.assertEqual((vencida.estado, en_curso.estado), ('completada', 'confirmada'))
+        self.assertEqual(self.h1.estado, 'disponible')
+        self.assertEqual(vencimientos.marca(), self.hoy)
+
+        # Salidas anteriores a la marca sólo las ve una corrida completa
+        atrasada = self.reservar(self.h1, -10, -8)
+        self.assertEqual(vencimientos.completar_vencidas(), (0, 0))
+        self.assertEqual(vencimientos.completar_vencidas(completo=True), (1, 1))
+        atrasada.refresh_from_db()
+        self.assertEqual(atrasada.estado, 'completada')
+
+        # Dos días después vence la que estaba en curso y la habitación se libera
+        pasado_manana = self.hoy + timedelta(days=2)
+        self.assertEqual(vencimientos.completar_vencidas(hoy=pasado_manana), (1, 1))
+        self.h2.refresh_from_db()
+        self.assertEqual(self.h2.estado, 'disponible')
+        self.assertEqual(vencimientos.marca(), pasado_manana)
+
+    def test_no_saca_de_mantenimiento(self):
+        self.reservar(self.h1, -5, -2)
+        Habitacion.objects.filter(pk=self.h1.pk).update(estado='mantenimiento')
+        call_command('completar_reservas_vencidas', stdout=StringIO())
+        self.h1.refresh_from_db()
+        self.assertEqual(self.h1.estado, 'mantenimiento')
+
+    def test_lista_habitaciones_no_escribe(self):
+        vencida = self.reservar(self.h1, -5, -2)
+        admin = User.objects.create_user(username='admin', password='pass', is_staff=True)
+        self.client.force_login(admin)
+        response = self.client.get(reverse('lista_habitaciones'))
+        self.assertEqual(response.status_code, 200)
+        vencida.refresh_from_db()
+        self.assertEqual(vencida.estado, 'confirmada')
+
+
+class EstadoHabitacionesTests(TestCase):
+    def setUp(self):
+        doble = TipoHabitacion.objects.create(nombre='doble', precio_por_noche=Decimal('25000.00'), capacidad_maxima=2)
+        self.h1 = Habitacion.objects.create(numero='101', tipo=doble, piso=1)
+        self.h2 = Habitacion.objects.create(numero='102', tipo=doble, piso=1, estado='ocupada')
+        self.h3 = Habitacion.objects.create(numero='103', tipo=doble, piso=1, estado='mantenimiento')
+        self.user = User.objects.create_user(username='ana', password='pass')
+        self.hoy = date.today()
+
+    def reservar(self, habitacion, desde, hasta, estado='confirmada'):
+        return Reserva.objects.create(
+            cliente=self.user, habitacion=habitacion, numero_huespedes=1, estado=estado,
+            fecha_entrada=self.hoy + timedelta(days=desde), fecha_salida=self.hoy + timedelta(days=hasta),
+        )
+
+    def estados(self):
+        return dict(Habitacion.objects.order_by('numero').values_list('numero', 'estado'))
+
+    def test_recalcula_un_conjunto_en_una_lectura(self):
+        self.reservar(self.h1, 0, 2)
+        self.reservar(self.h3, 0, 2)
+
+        cambios = estado_habitaciones.recalcular()
+        self.assertEqual(cambios, {self.h1.pk: 'ocupada', self.h2.pk: 'disponible'})
+        self.assertEqual(self.estados(), {'101': 'ocupada', '102': 'disponible', '103': 'mantenimiento'})
+        # Sin cambios: sólo la lectura (más el savepoint de la transacción)
+        with self.assertNumQueries(3):
+            self.assertEqual(estado_habitaciones.recalcular(), {})
+
+    def test_una_pasada_por_transaccion(self):
+        with mock.patch.object(estado_habitaciones, 'recalcular', wraps=estado_habitaciones.recalcular) as recalcular:
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    self.reservar(self.h1, 0, 2)
+                    self.reservar(self.h1, 3, 5)
+                    self.reservar(self.h2, 4, 6, estado='pendiente')
+                    recalcular.assert_not_called()
+        recalcular.assert_called_once()
+        # Puede arrastrar habitaciones de transacciones revertidas (las de otros tests)
+        self.assertLessEqual({self.h1.pk, self.h2.pk}, recalcular.call_args.args[0])
+        self.assertEqual(self.estados()['101'], 'ocupada')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Reserva.objects.filter(habitacion=self.h1).first().delete()
+            Reserva.objects.filter(habitacion=self.h1).first().delete()
+        self.assertEqual(self.estados()['101'], 'disponible')
+
+    def test_cambio_de_dia(self):
+        self.reservar(self.h1, 1, 3)
+        Habitacion.objects.filter(pk=self.h2.pk).update(estado='disponible')
+        manana = (self.hoy + timedelta(days=1)).isoformat()
+        call_command('recalcular_estado_habitaciones', '--hoy', manana, stdout=StringIO())
+        self.assertEqual(self.estados(), {'101': 'ocupada', '102': 'disponible', '103': 'mantenimiento'})
+
+
+class ReservasConcurrentesTests(TransactionTestCase):
+    """Muchos hilos reservando las mismas habitaciones a la vez: ninguna reserva solapada."""
+
+    def setUp(self):
+        tipo = TipoHabitacion.objects.create(nombre='doble', precio_por_noche=Decimal('25000.00'), capacidad_maxima=2)
+        self.habitaciones = [Habitacion.objects.create(numero=f'10{i}', tipo=tipo, piso=1) for i in range(3)]
+        User.objects.create_user(username=stress_reservas.USUARIO, password='pass')
+
+    def test_sin_solapamientos_bajo_concurrencia(self):
+        pedidos = stress_reservas.generar_pedidos(
+            300, [h.pk for h in self.habitaciones], dias=15, semilla=7
+        )
+        conteo = stress_reservas.ejecutar_pedidos(pedidos, hilos=12)
+
+        self.assertEqual(conteo['errores'], 0)
+        self.assertGreater(conteo['rechazadas'], 0)
+        self.assertEqual(conteo['creadas'], Reserva.objects.count())
+        self.assertFalse(reservas_solapadas().exists())
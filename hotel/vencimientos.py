@@ -0,0 +1,57 @@
+"""
+Cierre de reservas vencidas como tarea programada (comando `completar_reservas_vencidas`).
+
+Antes lo hacía la vista lista_habitaciones en cada carga, guardando reserva por reserva.
+Ahora es un UPDATE por conjuntos:
+
+- Las reservas confirmadas cuya fecha_salida ya pasó pasan a 'completada' en un solo UPDATE.
+- MarcaTarea guarda hasta qué fecha se procesó: cada corrida sólo mira las salidas
+  posteriores a la marca (índice (estado, fecha_salida)), no todo el historial.
+  Con `completo=True` se ignora la marca (p. ej. si se confirmó tarde una reserva ya vencida).
+- El estado de las habitaciones afectadas se recalcula por conjuntos con
+  estado_habitaciones.recalcular().
+- QuerySet.update no emite post_save: al final se envía signals.cambios_masivos.
+"""
+from datetime import date
+
+from django.db import transaction
+from django.db.models import Max, Min
+
+from . import estado_habitaciones
+
+TAREA = 'completar_reservas_vencidas'
+
+
+def marca():
+    """Fecha hasta la que ya se completaron las reservas (None si nunca corrió)."""
+    from .models import MarcaTarea
+
+    return MarcaTarea.objects.filter(nombre=TAREA).values_list('fecha', flat=True).first()
+
+
+@transaction.atomic
+def completar_vencidas(hoy=None, completo=False):
+    """
+    Marca como completadas las reservas confirmadas con fecha_salida anterior a `hoy`
+    (y posterior o igual a la marca, salvo `completo`). Devuelve (reservas, habitaciones).
+    """
+    from .models import MarcaTarea, Reserva
+    from .signals import cambios_masivos
+
+    hoy = hoy or date.today()
+    vencidas = Reserva.objects.filter(estado='confirmada', fecha_salida__lt=hoy)
+    desde = None if completo else marca()
+    if desde is not None:
+        vencidas = vencidas.filter(fecha_salida__gte=desde)
+
+    habitacion_ids = set(vencidas.order_by().values_list('habitacion_id', flat=True).distinct())
+    rango = vencidas.order_by().aggregate(desde=Min('fecha_entrada'), hasta=Max('fecha_salida'))
+    completadas = vencidas.update(estado='completada') if habitacion_ids else 0
+    if habitacion_ids:
+        estado_habitaciones.recalcular(habitacion_ids, hoy)
+        cambios_masivos.send(sender=Reserva, habitacion_ids=habitacion_ids,
+                             desde=rango['desde'], hasta=rango['hasta'])
+
+    MarcaTarea.objects.update_or_create(nombre=TAREA, defaults={'fecha': max(hoy, desde or hoy)})
+    return completadas, len(habitacion_ids)
+
@@ -1,16 +1,22 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
+from django.http import JsonResponse, Http404
 from django.contrib.auth import login, authenticate
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib import messages
-from django.db.models import Q
-from django.utils import timezone
-from django.core.mail import send_mail
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Q
+from django.db import transaction
 from datetime import datetime, date, timedelta
 from django.urls import reverse
+from django.utils.functional import SimpleLazyObject
+from urllib.parse import urlencode
 from .models import Habitacion, Reserva, TipoHabitacion, PerfilUsuario
 from .forms import ReservaForm, HabitacionForm, TipoHabitacionForm, RegistroUsuarioForm
-from .email_utils import enviar_confirmacion_reserva
+from .email_utils import enviar_bienvenida, enviar_confirmacion_reserva
+from . import cache_disponibilidad, condicional, disponibilidad, ocupacion, paginacion, portada, reportes, segundo_plano, tarifas, tarjetas
+from . import reservas as servicio_reservas
 
 
 
@@ -18,41 +24,21 @@ def es_administrador(user):
     return user.is_staff or user.is_superuser
 
 def inicio(request):
-    # Solo mostrar habitaciones realmente disponibles (sin reservas pendientes/confirmadas)
-    habitaciones_disponibles = []
-    todas_habitaciones = Habitacion.objects.filter(estado='disponible')
-
-    for habitacion in todas_habitaciones:
-        if habitacion.esta_disponible():
-            habitaciones_disponibles.append(habitacion)
-
-    # Limitar a 6 para la página de inicio
-    habitaciones_disponibles = habitaciones_disponibles[:6]
-
-    tipos_habitacion = TipoHabitacion.objects.all()
-
+    # Destacadas y tipos salen de portada.datos() (precalculado y en caché), y sólo se
+    # leen si algún fragmento cacheado del template no está: con la caché caliente la
+    # portada no consulta la base de datos
+    datos = SimpleLazyObject(portada.datos)
     contexto = {
-        'habitaciones_disponibles': habitaciones_disponibles,
-        'tipos_habitacion': tipos_habitacion,
+        'habitaciones_destacadas': SimpleLazyObject(lambda: tarjetas.versionar(datos['destacadas'])),
+        'tipos_habitacion': SimpleLazyObject(lambda: datos['tipos']),
+        'portada_version': portada.version(),
+        'portada_ttl': portada.ttl(),
+        'tarjetas_ttl': tarjetas.ttl(),
         'es_admin': es_administrador(request.user) if request.user.is_authenticated else False,
         'hoy': date.today().isoformat(),  # Para el formulario de búsqueda
     }
     return render(request, 'hotel/inicio.html', contexto)
 
-def actualizar_reservas_vencidas():
-    ahora = timezone.now()
-    vencidas = Reserva.objects.filter(fecha_salida__lt=ahora, estado="confirmada")
-
-    for r in vencidas:
-        if r.habitacion:
-            r.estado = "completada"
-            r.habitacion.disponible = True
-            r.habitacion.save()
-        else:
-            print(f"⚠️ Reserva sin habitación: ID {r.id}")
-        r.save()
-
-
 # NUEVA VISTA: Búsqueda inicial de habitaciones por fechas
 def buscar_habitaciones(request):
     """Vista inicial donde el cliente selecciona las fechas de su estadía"""
@@ -90,14 +76,23 @@ def buscar_habitaciones(request):
                 'hoy': date.today().isoformat()
             })
 
-        # Obtener tipo (opcional) y redirigir a la vista de habitaciones disponibles
+        # Obtener tipo y fechas flexibles (opcionales) y redirigir a la vista de habitaciones disponibles
+        parametros = {}
         tipo = request.POST.get('tipo')
+        if tipo:
+            parametros['tipo'] = tipo
+        margen = _margen_flexible(request.POST.get('flexible'))
+        if margen:
+            parametros['flexible'] = margen
+        huespedes = _huespedes_grupo(request.POST.get('huespedes'))
+        if huespedes:
+            parametros['huespedes'] = huespedes
         url = reverse('habitaciones_disponibles', kwargs={
             'fecha_entrada': fecha_entrada_str,
             'fecha_salida': fecha_salida_str,
         })
-        if tipo:
-            url = f"{url}?tipo={tipo}"
+        if parametros:
+            url = f"{url}?{urlencode(parametros)}"
         return redirect(url)
 
     return render(request, 'hotel/buscar_habitaciones.html', {
@@ -105,74 +100,168 @@ def buscar_habitaciones(request):
     })
 
 
-# NUEVA VISTA: Mostrar habitaciones disponibles según fechas
-def habitaciones_disponibles(request, fecha_entrada, fecha_salida):
-    """Muestra solo las habitaciones disponibles para el rango de fechas especificado"""
+MARGEN_FLEXIBLE_MAXIMO = 7
+
+
+def _margen_flexible(valor):
+    """Días de flexibilidad pedidos (0 si no es un número válido), con tope de una semana."""
+    try:
+        return min(max(int(valor), 0), MARGEN_FLEXIBLE_MAXIMO)
+    except (TypeError, ValueError):
+        return 0
+
+
+MAXIMO_HUESPEDES_GRUPO = 200
+
+
+def _huespedes_grupo(valor):
+    """Cantidad de huéspedes pedida (0 si no es un número válido)."""
     try:
-        fecha_entrada_obj = date.fromisoformat(fecha_entrada)
-        fecha_salida_obj = date.fromisoformat(fecha_salida)
+        return min(max(int(valor), 0), MAXIMO_HUESPEDES_GRUPO)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _rango_busqueda(fecha_entrada, fecha_salida):
+    """(entrada, salida, error) a partir de las fechas de la URL; error es None si sirven."""
+    try:
+        entrada = date.fromisoformat(fecha_entrada)
+        salida = date.fromisoformat(fecha_salida)
     except ValueError:
-        messages.error(request, 'Fechas inválidas')
-        return redirect('buscar_habitaciones')
+        return None, None, 'Fechas inválidas'
 
     # Validar fechas nuevamente (por si acceden directamente a la URL)
-    if fecha_entrada_obj < date.today() or fecha_entrada_obj >= fecha_salida_obj:
-        messages.error(request, 'Rango de fechas inválido')
-        return redirect('buscar_habitaciones')
+    if entrada < date.today() or entrada >= salida:
+        return None, None, 'Rango de fechas inválido'
+    return entrada, salida, None
+
+
+def _contexto_disponibles(fecha_entrada_obj, fecha_salida_obj, parametros):
+    """Búsqueda de habitaciones_disponibles (sin los datos del usuario que la pide)."""
+    tipo_filtro = parametros.get('tipo')
 
-    # Obtener todas las habitaciones
-    todas_habitaciones = Habitacion.objects.select_related('tipo').all()
-
-    # Filtrar solo las disponibles para estas fechas
-    habitaciones_disponibles_list = []
-    for habitacion in todas_habitaciones:
-        if habitacion.esta_disponible(fecha_entrada_obj, fecha_salida_obj):
-            habitaciones_disponibles_list.append(habitacion)
-
-    # Agrupar por tipo para mejor presentación
-    tipos_disponibles = {}
-    for habitacion in habitaciones_disponibles_list:
-        tipo_nombre = habitacion.tipo.get_nombre_display()
-        if tipo_nombre not in tipos_disponibles:
-            tipos_disponibles[tipo_nombre] = {
-                'tipo': habitacion.tipo,
-                'habitaciones': []
-            }
-        tipos_disponibles[tipo_nombre]['habitaciones'].append(habitacion)
+    # Tipos con habitaciones libres, agrupados y contados en la base de datos
+    tipos_disponibles = list(disponibilidad.tipos_disponibles(
+        fecha_entrada_obj, fecha_salida_obj, tipo=tipo_filtro
+    ))
+    total_disponibles = sum(tipo.libres for tipo in tipos_disponibles)
+    tarjetas.versionar(habitacion for tipo in tipos_disponibles for habitacion in tipo.habitaciones_libres)
+
+    # Total de la estadía por tipo según el plan de tarifas (temporadas, fines de semana...)
+    tarifario = tarifas.tarifario()
+    for tipo in tipos_disponibles:
+        tipo.precio_estadia = tarifario.total(tipo.pk, fecha_entrada_obj, fecha_salida_obj)
 
     # Calcular número de noches
     noches = (fecha_salida_obj - fecha_entrada_obj).days
 
-    # Aplicar filtros adicionales si existen
-    tipo_filtro = request.GET.get('tipo')
-    if tipo_filtro:
-        habitaciones_disponibles_list = [
-            h for h in habitaciones_disponibles_list
-            if h.tipo.nombre == tipo_filtro
-        ]
+    # Fechas flexibles: misma duración, entrando hasta N días antes o después
+    margen_flexible = _margen_flexible(parametros.get('flexible'))
+    flexible_tipos, flexible_filas = [], []
+    if margen_flexible:
+        flexible_tipos, flexible_filas = disponibilidad.busqueda_flexible(
+            fecha_entrada_obj, noches, margen_flexible, tipo=tipo_filtro
+        )
 
-    contexto = {
+    # Grupos: combinaciones de varias habitaciones que alojan a todos
+    huespedes = _huespedes_grupo(parametros.get('huespedes'))
+    opciones_grupo = []
+    if huespedes:
+        opciones_grupo = disponibilidad.combinaciones_para_grupo(fecha_entrada_obj, fecha_salida_obj, huespedes)
+
+    return {
         'fecha_entrada': fecha_entrada_obj,
         'fecha_salida': fecha_salida_obj,
-        'fecha_entrada_str': fecha_entrada,
-        'fecha_salida_str': fecha_salida,
         'noches': noches,
         'tipos_disponibles': tipos_disponibles,
-        'habitaciones_disponibles': habitaciones_disponibles_list,
+        'total_disponibles': total_disponibles,
+        'tarjetas_ttl': tarjetas.ttl(),
         'todos_tipos': TipoHabitacion.objects.all(),
         'tipo_seleccionado': tipo_filtro,
-        'es_admin': es_administrador(request.user) if request.user.is_authenticated else False,
+        'margen_flexible': margen_flexible,
+        'flexible_tipos': flexible_tipos,
+        'flexible_filas': flexible_filas,
+        'huespedes': huespedes,
+        'opciones_grupo': opciones_grupo,
     }
 
+
+# NUEVA VISTA: Mostrar habitaciones disponibles según fechas
+@condicional.disponibles
+def habitaciones_disponibles(request, fecha_entrada, fecha_salida):
+    """Muestra solo las habitaciones disponibles para el rango de fechas especificado"""
+    fecha_entrada_obj, fecha_salida_obj, error = _rango_busqueda(fecha_entrada, fecha_salida)
+    if error:
+        messages.error(request, error)
+        return redirect('buscar_habitaciones')
+
+    contexto = _contexto_disponibles(fecha_entrada_obj, fecha_salida_obj, request.GET)
+    contexto.update({
+        'fecha_entrada_str': fecha_entrada,
+        'fecha_salida_str': fecha_salida,
+        'es_admin': es_administrador(request.user) if request.user.is_authenticated else False,
+    })
     return render(request, 'hotel/habitaciones_disponibles.html', contexto)
 
 
+@condicional.disponibles
+async def ahabitaciones_disponibles(request, fecha_entrada, fecha_salida):
+    """
+    habitaciones_disponibles para el despliegue ASGI: la búsqueda corre en el pool acotado
+    de segundo_plano, sin ocupar el event loop.
+    """
+    fecha_entrada_obj, fecha_salida_obj, error = _rango_busqueda(fecha_entrada, fecha_salida)
+    if error:
+        messages.error(request, error)
+        return redirect('buscar_habitaciones')
+
+    usuario = await request.auser()
+    contexto = await segundo_plano.ejecutar(_contexto_disponibles, fecha_entrada_obj, fecha_salida_obj, request.GET)
+    contexto.update({
+        'fecha_entrada_str': fecha_entrada,
+        'fecha_salida_str': fecha_salida,
+        'es_admin': es_administrador(usuario) if usuario.is_authenticated else False,
+    })
+    return await sync_to_async(render)(request, 'hotel/habitaciones_disponibles.html', contexto)
+
+
+def calendario_ocupacion(request, anio, mes):
+    """Habitaciones libres por noche y por tipo para un mes, para calendarios en el cliente"""
+    try:
+        desde, hasta = ocupacion.rango_mes(anio, mes)
+    except (ValueError, OverflowError):
+        # OverflowError: diciembre del año 9999 (el mes siguiente no existe)
+        raise Http404('Mes inválido')
+
+    calendario = ocupacion.para_rango(desde, hasta)
+    noches = calendario.libres_por_noche(desde, hasta)
+    por_tipo = {
+        tipo.nombre: [libres for _, libres in calendario.libres_por_noche(desde, hasta, [tipo.id])]
+        for tipo in TipoHabitacion.objects.all()
+    }
+    return JsonResponse({
+        'desde': desde.isoformat(),
+        'hasta': hasta.isoformat(),
+        'noches': [fecha.isoformat() for fecha, _ in noches],
+        'total': [libres for _, libres in noches],
+        'tipos': por_tipo,
+    })
+
+
+@user_passes_test(es_administrador)
+def estadisticas_cache_disponibilidad(request):
+    """Aciertos y fallos de la caché de búsquedas de disponibilidad"""
+    return JsonResponse(cache_disponibilidad.estadisticas())
+
+
 # MODIFICADA: Lista de habitaciones (para admin)
+@condicional.listado
 def lista_habitaciones(request):
     """Vista de administración para ver todas las habitaciones"""
-    actualizar_reservas_vencidas()
-
-    habitaciones = Habitacion.objects.all().order_by('numero')
+    # Sólo lectura: las reservas vencidas las cierra `manage.py completar_reservas_vencidas`
+    es_admin = es_administrador(request.user) if request.user.is_authenticated else False
+    # Tipo, reservas activas y reserva en curso vienen en la misma consulta (sin N+1 en la plantilla)
+    habitaciones = disponibilidad.listado_habitaciones(proximas=3 if es_admin else 0).order_by('numero')
     tipos = TipoHabitacion.objects.all()
 
     # Filtros
@@ -185,24 +274,18 @@ def lista_habitaciones(request):
     if estado_filtro:
         habitaciones = habitaciones.filter(estado=estado_filtro)
 
-    # Filtro por disponibilidad real
+    # Filtro por disponibilidad real, resuelto en la misma consulta
     if disponibilidad_filtro == 'disponible':
-        habitaciones_filtradas = []
-        for habitacion in habitaciones:
-            if habitacion.esta_disponible():
-                habitaciones_filtradas.append(habitacion)
-        habitaciones = habitaciones_filtradas
+        habitaciones = habitaciones.filter(disponibilidad.condicion_libre())
     elif disponibilidad_filtro == 'reservada':
-        habitaciones_filtradas = []
-        for habitacion in habitaciones:
-            if not habitacion.esta_disponible():
-                habitaciones_filtradas.append(habitacion)
-        habitaciones = habitaciones_filtradas
+        habitaciones = habitaciones.exclude(disponibilidad.condicion_libre())
 
     contexto = {
-        'habitaciones': habitaciones,
+        'habitaciones': tarjetas.versionar(habitaciones),
+        'tarjetas_ttl': tarjetas.ttl(),
+        'hoy': date.today().isoformat(),
         'tipos': tipos,
-        'es_admin': es_administrador(request.user) if request.user.is_authenticated else False,
+        'es_admin': es_admin,
         'tipo_seleccionado': tipo_filtro,
         'estado_seleccionado': estado_filtro,
         'disponibilidad_seleccionada': disponibilidad_filtro,
@@ -210,116 +293,63 @@ def lista_habitaciones(request):
     return render(request, 'hotel/habitaciones.html', contexto)
 
 
-# MODIFICADA: Hacer reserva ahora acepta fechas desde la URL
-@login_required
-def hacer_reserva(request, habitacion_id, fecha_entrada=None, fecha_salida=None):
-    habitacion = get_object_or_404(Habitacion, id=habitacion_id)
+def _reservar(datos, habitacion, cliente):
+    """
+    Valida el formulario de reserva y guarda la reserva. Devuelve (form, guardada, error):
+    error es el mensaje a mostrar, o None si la reserva se guardó o el formulario tiene
+    errores propios.
+    """
+    # La instancia ya lleva habitación y cliente para que Reserva.clean() pueda validar
+    form = ReservaForm(datos, instance=Reserva(habitacion=habitacion, cliente=cliente))
+    if not form.is_valid():
+        return form, False, None
+    reserva = form.save(commit=False)
+
+    # Validaciones manuales antes de guardar
+    if reserva.fecha_entrada < date.today():
+        return form, False, 'La fecha de entrada no puede ser anterior a hoy.'
+    if reserva.fecha_salida <= reserva.fecha_entrada:
+        return form, False, 'La fecha de salida debe ser posterior a la fecha de entrada.'
+
+    # Verificar disponibilidad en el rango solicitado
+    if not disponibilidad.esta_libre(habitacion, reserva.fecha_entrada, reserva.fecha_salida):
+        return form, False, 'La habitación no está disponible en esas fechas.'
+
+    # Validar capacidad
+    capacidad_max = habitacion.tipo.capacidad_maxima
+    if reserva.numero_huespedes > capacidad_max:
+        return form, False, f'Esta habitación tiene capacidad máxima para {capacidad_max} huéspedes.'
+
+    # Guardar la reserva: la disponibilidad se vuelve a validar con la habitación
+    # bloqueada, por si otra reserva entró entre la verificación y este punto
+    try:
+        servicio_reservas.guardar(reserva)
+    except ValidationError as error:
+        return form, False, ' '.join(error.messages)
+    return form, True, None
 
-    # Convertir fechas si vienen desde la URL
-    fecha_entrada_obj = None
-    fecha_salida_obj = None
 
+def _fechas_reserva(fecha_entrada, fecha_salida):
+    """Fechas preseleccionadas desde la URL: (None, None) si no vienen; ValueError si son inválidas."""
     if fecha_entrada and fecha_salida:
-        try:
-            fecha_entrada_obj = date.fromisoformat(fecha_entrada)
-            fecha_salida_obj = date.fromisoformat(fecha_salida)
-        except ValueError:
-            messages.error(request, 'Fechas inválidas')
-            return redirect('buscar_habitaciones')
-
-        # Verificar disponibilidad para esas fechas específicas
-        if not habitacion.esta_disponible(fecha_entrada_obj, fecha_salida_obj):
-            messages.error(request, 'Esta habitación ya no está disponible para esas fechas.')
-            return redirect('habitaciones_disponibles',
-                        fecha_entrada=fecha_entrada,
-                        fecha_salida=fecha_salida)
-    else:
-        # Verificar disponibilidad general
-        if not habitacion.esta_disponible():
-            messages.error(request, 'Esta habitación no está disponible para reservas.')
-            return redirect('lista_habitaciones')
+        return date.fromisoformat(fecha_entrada), date.fromisoformat(fecha_salida)
+    return None, None
 
-    if request.method == 'POST':
-        form = ReservaForm(request.POST)
 
-        if form.is_valid():
-            reserva = form.save(commit=False)
-            reserva.habitacion = habitacion
-            reserva.cliente = request.user
-
-            # Obtener fechas desde el form
-            fecha_entrada_form = reserva.fecha_entrada
-            fecha_salida_form = reserva.fecha_salida
-
-            # Validaciones manuales antes de guardar
-            if fecha_entrada_form < date.today():
-                messages.error(request, 'La fecha de entrada no puede ser anterior a hoy.')
-                return render(request, 'hotel/hacer_reserva.html', {
-                    'form': form,
-                    'habitacion': habitacion,
-                    'proximas_reservas': habitacion.proximas_reservas(),
-                    'fecha_entrada_preseleccionada': fecha_entrada,
-                    'fecha_salida_preseleccionada': fecha_salida,
-                })
-
-            if fecha_salida_form <= fecha_entrada_form:
-                messages.error(request, 'La fecha de salida debe ser posterior a la fecha de entrada.')
-                return render(request, 'hotel/hacer_reserva.html', {
-                    'form': form,
-                    'habitacion': habitacion,
-                    'proximas_reservas': habitacion.proximas_reservas(),
-                    'fecha_entrada_preseleccionada': fecha_entrada,
-                    'fecha_salida_preseleccionada': fecha_salida,
-                })
-
-            # Verificar disponibilidad en el rango solicitado
-            if not habitacion.esta_disponible(fecha_entrada_form, fecha_salida_form):
-                messages.error(request, 'La habitación no está disponible en esas fechas.')
-                return render(request, 'hotel/hacer_reserva.html', {
-                    'form': form,
-                    'habitacion': habitacion,
-                    'proximas_reservas': habitacion.proximas_reservas(),
-                    'fecha_entrada_preseleccionada': fecha_entrada,
-                    'fecha_salida_preseleccionada': fecha_salida,
-                })
-
-            # Validar capacidad
-            capacidad_max = habitacion.tipo.capacidad_maxima
-            if reserva.numero_huespedes > capacidad_max:
-                messages.error(request, f'Esta habitación tiene capacidad máxima para {capacidad_max} huéspedes.')
-                return render(request, 'hotel/hacer_reserva.html', {
-                    'form': form,
-                    'habitacion': habitacion,
-                    'proximas_reservas': habitacion.proximas_reservas(),
-                    'fecha_entrada_preseleccionada': fecha_entrada,
-                    'fecha_salida_preseleccionada': fecha_salida,
-                })
-
-            # Guardar la reserva
-            reserva.save()
+def _precio_estimado(habitacion, fecha_entrada_obj, fecha_salida_obj):
+    """Precio de la estadía según el plan de tarifas (el mismo que se guardará), si hay fechas."""
+    if fecha_entrada_obj and fecha_salida_obj and fecha_entrada_obj < fecha_salida_obj:
+        return tarifas.cotizar(habitacion.tipo_id, fecha_entrada_obj, fecha_salida_obj)
+    return None
 
-            messages.success(request, '¡Reserva realizada exitosamente! Tu reserva está pendiente de confirmación.')
-            return redirect('mis_reservas')
 
-    else:
-        # Pre-llenar el formulario con las fechas si vienen desde la búsqueda
-        initial_data = {}
-        if fecha_entrada_obj and fecha_salida_obj:
-            initial_data = {
-                'fecha_entrada': fecha_entrada_obj,
-                'fecha_salida': fecha_salida_obj,
-            }
-        form = ReservaForm(initial=initial_data)
-
-    # Calcular precio estimado si hay fechas
-    precio_estimado = None
+def _contexto_reserva(form, habitacion, fecha_entrada, fecha_salida, fecha_entrada_obj, fecha_salida_obj,
+                      precio_estimado):
     noches = None
     if fecha_entrada_obj and fecha_salida_obj:
         noches = (fecha_salida_obj - fecha_entrada_obj).days
-        precio_estimado = habitacion.tipo.precio_por_noche * noches
 
-    # Render inicial
-    contexto = {
+    return {
         'form': form,
         'habitacion': habitacion,
         'proximas_reservas': habitacion.proximas_reservas(),
@@ -329,9 +359,93 @@ def hacer_reserva(request, habitacion_id, fecha_entrada=None, fecha_salida=None)
         'noches': noches,
     }
 
+
+def _formulario_inicial(fecha_entrada_obj, fecha_salida_obj):
+    # Pre-llenar el formulario con las fechas si vienen desde la búsqueda
+    initial_data = {}
+    if fecha_entrada_obj and fecha_salida_obj:
+        initial_data = {
+            'fecha_entrada': fecha_entrada_obj,
+            'fecha_salida': fecha_salida_obj,
+        }
+    return ReservaForm(initial=initial_data)
+
+
+def _no_disponible(request, fecha_entrada, fecha_salida):
+    if fecha_entrada and fecha_salida:
+        messages.error(request, 'Esta habitación ya no está disponible para esas fechas.')
+        return redirect('habitaciones_disponibles', fecha_entrada=fecha_entrada, fecha_salida=fecha_salida)
+    messages.error(request, 'Esta habitación no está disponible para reservas.')
+    return redirect('lista_habitaciones')
+
+
+# MODIFICADA: Hacer reserva ahora acepta fechas desde la URL
+@login_required
+def hacer_reserva(request, habitacion_id, fecha_entrada=None, fecha_salida=None):
+    habitacion = get_object_or_404(Habitacion, id=habitacion_id)
+
+    # Convertir fechas si vienen desde la URL
+    try:
+        fecha_entrada_obj, fecha_salida_obj = _fechas_reserva(fecha_entrada, fecha_salida)
+    except ValueError:
+        messages.error(request, 'Fechas inválidas')
+        return redirect('buscar_habitaciones')
+
+    # Verificar disponibilidad para esas fechas específicas (o la general, sin fechas)
+    if not disponibilidad.esta_libre(habitacion, fecha_entrada_obj, fecha_salida_obj):
+        return _no_disponible(request, fecha_entrada, fecha_salida)
+
+    if request.method == 'POST':
+        form, guardada, error = _reservar(request.POST, habitacion, request.user)
+        if guardada:
+            messages.success(request, '¡Reserva realizada exitosamente! Tu reserva está pendiente de confirmación.')
+            return redirect('mis_reservas')
+        if error:
+            messages.error(request, error)
+    else:
+        form = _formulario_inicial(fecha_entrada_obj, fecha_salida_obj)
+
+    precio_estimado = _precio_estimado(habitacion, fecha_entrada_obj, fecha_salida_obj)
+    contexto = _contexto_reserva(form, habitacion, fecha_entrada, fecha_salida, fecha_entrada_obj, fecha_salida_obj,
+                                 precio_estimado)
     return render(request, 'hotel/hacer_reserva.html', contexto)
 
 
+@login_required
+async def ahacer_reserva(request, habitacion_id, fecha_entrada=None, fecha_salida=None):
+    """
+    hacer_reserva para el despliegue ASGI. Las lecturas van por el ORM async; validar y
+    guardar (transacción con bloqueo y reintentos si la base está ocupada) corren en el
+    pool acotado de segundo_plano, así una base bloqueada no detiene el event loop.
+    """
+    habitacion = await aget_object_or_404(Habitacion.objects.select_related('tipo'), id=habitacion_id)
+
+    try:
+        fecha_entrada_obj, fecha_salida_obj = _fechas_reserva(fecha_entrada, fecha_salida)
+    except ValueError:
+        messages.error(request, 'Fechas inválidas')
+        return redirect('buscar_habitaciones')
+
+    if not await disponibilidad.aesta_libre(habitacion, fecha_entrada_obj, fecha_salida_obj):
+        return _no_disponible(request, fecha_entrada, fecha_salida)
+
+    if request.method == 'POST':
+        form, guardada, error = await segundo_plano.ejecutar(
+            _reservar, request.POST, habitacion, await request.auser())
+        if guardada:
+            messages.success(request, '¡Reserva realizada exitosamente! Tu reserva está pendiente de confirmación.')
+            return redirect('mis_reservas')
+        if error:
+            messages.error(request, error)
+    else:
+        form = _formulario_inicial(fecha_entrada_obj, fecha_salida_obj)
+
+    precio_estimado = await segundo_plano.ejecutar(_precio_estimado, habitacion, fecha_entrada_obj, fecha_salida_obj)
+    contexto = _contexto_reserva(form, habitacion, fecha_entrada, fecha_salida, fecha_entrada_obj, fecha_salida_obj,
+                                 precio_estimado)
+    return await sync_to_async(render)(request, 'hotel/hacer_reserva.html', contexto)
+
+
 @user_passes_test(es_administrador)
 @user_passes_test(es_administrador)
 def cambiar_estado_reserva(request, reserva_id):
@@ -341,10 +455,10 @@ def cambiar_estado_reserva(request, reserva_id):
     if nuevo_estado in ['pendiente', 'confirmada', 'cancelada', 'completada']:
         estado_anterior = reserva.estado
         reserva.estado = nuevo_estado
-        reserva.save()
 
-        # Si se confirma la reserva, enviar correo
-        if nuevo_estado == 'confirmada':
+        # Si se confirma la reserva, el correo se encola en la misma transacción que el
+        # cambio (lo envía el worker enviar_correos, sin hacer esperar a este pedido)
+        def encolar_confirmacion(reserva):
             enviar_confirmacion_reserva(
                 email_cliente=reserva.cliente.email,
                 nombre_cliente=reserva.cliente.first_name or reserva.cliente.username,
@@ -355,6 +469,14 @@ def cambiar_estado_reserva(request, reserva_id):
                 precio_total=reserva.precio_total
             )
 
+        try:
+            servicio_reservas.guardar(
+                reserva, ademas=encolar_confirmacion if nuevo_estado == 'confirmada' else None)
+        except ValidationError as error:
+            # Reactivar una reserva cancelada puede chocar con otra tomada mientras tanto
+            messages.error(request, f'No se pudo cambiar la reserva #{reserva.id}: {" ".join(error.messages)}')
+            return redirect('gestionar_reservas')
+
         messages.success(
             request,
             f'Estado de reserva #{reserva.id} cambiado de "{reserva.get_estado_display()}" '
@@ -393,27 +515,211 @@ def cambiar_estado_habitacion(request, habitacion_id):
     return redirect('lista_habitaciones')
 
 
+TAMANO_MIS_RESERVAS = 20
+
+
 @login_required
 def mis_reservas(request):
-    reservas = Reserva.objects.filter(cliente=request.user).order_by('-fecha_reserva')
-    return render(request, 'hotel/mis_reservas.html', {'reservas': reservas})
+    vista, pagina = _pagina_mis_reservas(request)
+    filtros = urlencode({'vista': vista})
+    return render(request, 'hotel/mis_reservas.html', {
+        'reservas': pagina,
+        'pagina': pagina,
+        'vista': vista,
+        'filtros': filtros,
+    })
+
+
+@login_required
+def mis_reservas_pagina(request):
+    """Una página de Mis reservas en JSON (?vista=, ?despues=, ?antes=), para cargar más sin recargar"""
+    vista, pagina = _pagina_mis_reservas(request)
+    return JsonResponse({
+        'vista': vista,
+        'reservas': [{
+            'id': reserva.id,
+            'habitacion': reserva.habitacion.numero,
+            'tipo': str(reserva.habitacion.tipo),
+            'fecha_entrada': reserva.fecha_entrada.isoformat(),
+            'fecha_salida': reserva.fecha_salida.isoformat(),
+            'noches': reserva.calcular_noches(),
+            'numero_huespedes': reserva.numero_huespedes,
+            'estado': reserva.estado,
+            'estado_display': reserva.get_estado_display(),
+            'precio_total': str(reserva.precio_total) if reserva.precio_total is not None else None,
+            'fecha_reserva': reserva.fecha_reserva.isoformat(),
+        } for reserva in pagina],
+        'siguiente': pagina.siguiente,
+        'anterior': pagina.anterior,
+    })
+
+
+def _pagina_mis_reservas(request):
+    """
+    Próximas estadías (las que todavía no terminaron, fecha_salida > hoy, incluida la que
+    está en curso; de la más cercana en adelante) o historial (las ya terminadas, de la
+    más reciente hacia atrás). Filtran y paginan por (fecha_salida, id), las columnas del
+    índice (cliente, fecha_salida, id): cada página lee sólo sus filas, sin ordenar todas
+    las del cliente, y la vista por defecto no toca el historial.
+    """
+    vista = 'historial' if request.GET.get('vista') == 'historial' else 'proximas'
+    hoy = date.today()
+    reservas = Reserva.objects.filter(cliente=request.user).select_related('habitacion__tipo')
+    if vista == 'proximas':
+        reservas = reservas.filter(fecha_salida__gt=hoy)
+    else:
+        reservas = reservas.filter(fecha_salida__lte=hoy)
+    pagina = paginacion.paginar(
+        reservas,
+        despues=request.GET.get('despues'),
+        antes=request.GET.get('antes'),
+        tamano=TAMANO_MIS_RESERVAS,
+        campos=('fecha_salida', 'id'),
+        descendente=(vista == 'historial'),
+    )
+    return vista, pagina
 
 
 @user_passes_test(es_administrador)
 def gestionar_reservas(request):
-    reservas = Reserva.objects.all().order_by('-fecha_reserva')
+    reservas = Reserva.objects.all()
 
     estado_filtro = request.GET.get('estado')
+    habitacion_filtro = request.GET.get('habitacion', '').strip()
+    desde_filtro = _fecha_o_none(request.GET.get('desde'))
+    hasta_filtro = _fecha_o_none(request.GET.get('hasta'))
+
+    # Filtros respaldados por índices: habitacion (habitacion, fecha_entrada, ...) y fecha_entrada
+    if habitacion_filtro:
+        reservas = reservas.filter(habitacion__numero=habitacion_filtro)
+    if desde_filtro:
+        reservas = reservas.filter(fecha_entrada__gte=desde_filtro)
+    if hasta_filtro:
+        reservas = reservas.filter(fecha_entrada__lte=hasta_filtro)
+
+    # Contadores por estado en una sola consulta (sobre todos los estados, no sólo el filtrado)
+    contadores = reservas.order_by().aggregate(
+        total=Count('id'),
+        confirmadas=Count('id', filter=Q(estado='confirmada')),
+        completadas=Count('id', filter=Q(estado='completada')),
+        canceladas=Count('id', filter=Q(estado='cancelada')),
+    )
+
     if estado_filtro:
         reservas = reservas.filter(estado=estado_filtro)
+    pagina = paginacion.paginar(
+        reservas.select_related('cliente', 'habitacion__tipo'),
+        despues=request.GET.get('despues'),
+        antes=request.GET.get('antes'),
+    )
+
+    # Los enlaces de página conservan los filtros
+    filtros = request.GET.copy()
+    for clave in ('despues', 'antes'):
+        filtros.pop(clave, None)
 
     contexto = {
-        'reservas': reservas,
+        'reservas': pagina,
+        'pagina': pagina,
+        'contadores': contadores,
+        'filtros': filtros.urlencode(),
         'estado_seleccionado': estado_filtro,
+        'habitacion_seleccionada': habitacion_filtro,
+        'desde_seleccionado': desde_filtro.isoformat() if desde_filtro else '',
+        'hasta_seleccionado': hasta_filtro.isoformat() if hasta_filtro else '',
     }
     return render(request, 'hotel/gestionar_reservas.html', contexto)
 
 
+def _fecha_o_none(texto):
+    try:
+        return date.fromisoformat(texto) if texto else None
+    except ValueError:
+        return None
+
+
+REPORTE_ANIOS_ATRAS = 50
+REPORTE_ANIOS_ADELANTE = 10
+
+
+def _parametros_reporte(request):
+    """Rango (última noche incluida), agrupación, tipo y años a comparar, con valores por defecto."""
+    hoy = date.today()
+    desde = _fecha_o_none(request.GET.get('desde')) or hoy.replace(day=1).replace(year=hoy.year - 1)
+    hasta = _fecha_o_none(request.GET.get('hasta')) or hoy
+    if desde > hasta:
+        desde, hasta = hasta, desde
+    # Fechas acotadas (p. ej. 9999-12-31 desbordaría al sumarle un día)
+    minima = date(hoy.year - REPORTE_ANIOS_ATRAS, 1, 1)
+    maxima = date(hoy.year + REPORTE_ANIOS_ADELANTE, 12, 31)
+    desde, hasta = min(max(desde, minima), maxima), min(max(hasta, minima), maxima)
+    agrupar = request.GET.get('agrupar')
+    if agrupar not in reportes.PERIODOS:
+        agrupar = 'mes'
+    try:
+        anios = min(max(int(request.GET.get('anios', 3)), 1), 10)
+    except ValueError:
+        anios = 3
+    return {
+        'desde': desde,
+        'hasta': hasta,
+        'agrupar': agrupar,
+        'tipo': request.GET.get('tipo') or '',
+        'anios': list(range(hoy.year - anios + 1, hoy.year + 1)),
+    }
+
+
+def _datos_reporte(parametros):
+    """Indicadores del reporte, leídos sólo de los resúmenes diarios (ver reportes.py)."""
+    tipo_ids = None
+    if parametros['tipo']:
+        tipo_ids = list(TipoHabitacion.objects.filter(nombre=parametros['tipo']).values_list('pk', flat=True))
+    desde, hasta = parametros['desde'], parametros['hasta'] + timedelta(days=1)
+    return {
+        'actualizado': reportes.marca(),
+        'totales': reportes.resumen(desde, hasta, agrupar=None, tipo_ids=tipo_ids)[0],
+        'periodos': reportes.resumen(desde, hasta, parametros['agrupar'], tipo_ids=tipo_ids),
+        'tipos': reportes.resumen(desde, hasta, agrupar=None, por_tipo=True, tipo_ids=tipo_ids),
+        'interanual': reportes.interanual(parametros['anios'], tipo_ids=tipo_ids),
+    }
+
+
+@user_passes_test(es_administrador)
+def reporte_ocupacion(request):
+    """Ocupación, ADR y RevPAR por periodo y por tipo, y la comparación mes a mes entre años"""
+    parametros = _parametros_reporte(request)
+    datos = _datos_reporte(parametros)
+    anios = parametros['anios']
+    contexto = {
+        **datos,
+        'parametros': parametros,
+        'es_admin': True,
+        'tipos_habitacion': TipoHabitacion.TIPOS_HABITACION,
+        'anios': anios,
+        # Una fila por mes con el valor de cada año, para la tabla interanual
+        'meses': [
+            {'mes': date(2000, mes, 1), 'valores': [datos['interanual'][anio][mes - 1] for anio in anios]}
+            for mes in range(1, 13)
+        ],
+    }
+    return render(request, 'hotel/reporte_ocupacion.html', contexto)
+
+
+@user_passes_test(es_administrador)
+def reporte_ocupacion_datos(request):
+    """Los datos de reporte_ocupacion en JSON, con los mismos parámetros"""
+    parametros = _parametros_reporte(request)
+    datos = _datos_reporte(parametros)
+    return JsonResponse({
+        'desde': parametros['desde'],
+        'hasta': parametros['hasta'],
+        'agrupar': parametros['agrupar'],
+        'tipo': parametros['tipo'] or None,
+        **datos,
+        'interanual': {str(anio): meses for anio, meses in datos['interanual'].items()},
+    })
+
+
 @user_passes_test(es_administrador)
 def agregar_habitacion(request):
     if request.method == 'POST':
@@ -432,40 +738,20 @@ def registrarse(request):
     if request.method == 'POST':
         form = RegistroUsuarioForm(request.POST)
         if form.is_valid():
-            usuario = form.save()
-
-            # Crear perfil del usuario con los datos adicionales
-            perfil, created = PerfilUsuario.objects.get_or_create(usuario=usuario)
-            if 'telefono' in form.cleaned_data:
-                perfil.telefono = form.cleaned_data.get('telefono', '')
-            if 'direccion' in form.cleaned_data:
-                perfil.direccion = form.cleaned_data.get('direccion', '')
-            perfil.save()
-
-            # Enviar email de bienvenida
-            try:
-                nombre_completo = f"{usuario.first_name} {usuario.last_name}"
-                asunto = "Bienvenido a Hotel Manager"
-                mensaje = f"""Hola {nombre_completo},
-
-Tu cuenta ha sido creada exitosamente.
-
-Nombre de usuario: {usuario.username}
-Correo: {usuario.email}
-
-Ya puedes iniciar sesión y comenzar a hacer reservas.
-
-¡Bienvenido a Hotel Manager!"""
-
-                send_mail(
-                    asunto,
-                    mensaje,
-                    None,
-                    [usuario.email],
-                    fail_silently=True
-                )
-            except Exception as e:
-                print(f"Error al enviar email: {e}")
+            # Usuario, perfil y correo de bienvenida en la misma transacción: el correo
+            # queda en la bandeja de salida y lo envía el worker enviar_correos
+            with transaction.atomic():
+                usuario = form.save()
+
+                # Crear perfil del usuario con los datos adicionales
+                perfil, created = PerfilUsuario.objects.get_or_create(usuario=usuario)
+                if 'telefono' in form.cleaned_data:
+                    perfil.telefono = form.cleaned_data.get('telefono', '')
+                if 'direccion' in form.cleaned_data:
+                    perfil.direccion = form.cleaned_data.get('direccion', '')
+                perfil.save()
+
+                enviar_bienvenida(usuario)
 
             username = form.cleaned_data.get('username')
             messages.success(request, f'Cuenta creada para {username}! Te hemos enviado un correo de bienvenida.')